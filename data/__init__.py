@@ -16,8 +16,9 @@ def open_dataset(dataset: Union[DatasetConfig, str], **kwargs):
     Model-derived instance (Nemo, Mercator, Fvcom) with the calculation layer instance
     as an attribute.
 
-    Note: the returned model object will be LRU-cached internally so frequent calls
-    to open the "same" dataset will have minimal overhead.
+    Note: the underlying dataset handles are shared through a process-wide pool
+    (see data.dataset_pool) so frequent calls to open the "same" dataset will have
+    minimal overhead.
 
     Params:
         * dataset -- Either a DatasetConfig object, or a string URL for the dataset
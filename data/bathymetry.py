@@ -0,0 +1,155 @@
+"""
+Bathymetry Rasters
+==================
+
+The ETOPO tile pyramids and the global bathymetry grid are read by every data,
+topography and bathymetry tile and by every map and transect plot, usually for a
+small window. Opening the (compressed) netCDF file for each of those reads costs
+far more than the read itself, so the first time a raster is used it is
+converted to an uncompressed .npy file next to the other caches and from then
+on served memory-mapped: windows are views into the page cache, shared between
+worker processes.
+"""
+
+import hashlib
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+from netCDF4 import Dataset
+
+from oceannavigator.settings import get_settings
+
+# Roughly how much of the source variable is read at a time while converting.
+_CONVERT_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+class BathymetryRaster:
+    """A 2D raster (variable `z` by default) of a netCDF file, memory-mapped
+    from its .npy copy in `cache_dir`.
+
+    `coords` holds the file's 1D coordinate variables (e.g. `x` and `y` for the
+    global bathymetry grid), which are small enough to keep in memory.
+    """
+
+    def __init__(self, path: str, cache_dir: str, variable: str = "z") -> None:
+        self.path: str = path
+        self.variable: str = variable
+        self.mtime_ns: int = os.stat(path).st_mtime_ns
+
+        with Dataset(path, "r") as ds:
+            var = ds.variables[variable]
+            self.fill_value = getattr(var, "_FillValue", None)
+            self.coords: Dict[str, np.ndarray] = {
+                name: np.ma.getdata(v[:])
+                for name, v in ds.variables.items()
+                if name != variable and v.ndim == 1
+            }
+
+            npy = self._npy_path(cache_dir)
+            if not npy.exists():
+                _convert(var, npy)
+
+        self.z: np.ndarray = np.load(npy, mmap_mode="r")
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.z.shape
+
+    def window(self, y0: int, y1: int, x0: int, x1: int) -> np.ndarray:
+        """Returns z[y0:y1, x0:x1] without copying it out of the memory map.
+        Fill values are masked if the variable has any.
+        """
+        data = np.asarray(self.z[y0:y1, x0:x1])
+
+        if self.fill_value is not None:
+            return np.ma.masked_equal(data, self.fill_value, copy=False)
+
+        return data
+
+    def _npy_path(self, cache_dir: str) -> Path:
+        # Keyed on the source file's identity so that replacing the file gets a
+        # fresh copy instead of a stale one.
+        stat = os.stat(self.path)
+        digest = hashlib.sha1(
+            f"{os.path.abspath(self.path)}:{self.variable}:"
+            f"{stat.st_mtime_ns}:{stat.st_size}".encode()
+        ).hexdigest()
+
+        return Path(cache_dir, f"{Path(self.path).stem}-{digest[:16]}.npy")
+
+
+def _convert(var, npy: Path) -> None:
+    """Copies a 2D netCDF variable into an .npy file, a block of rows at a time
+    so that the whole raster never has to fit in memory.
+    """
+    npy.parent.mkdir(parents=True, exist_ok=True)
+    var.set_auto_mask(False)
+
+    rows, cols = var.shape
+    block = max(1, _CONVERT_BLOCK_BYTES // max(1, cols * var.dtype.itemsize))
+
+    # Written under a temporary name and renamed into place, so that other
+    # processes never map a half-written file.
+    tmp = npy.with_name(f"{npy.name}.{os.getpid()}.tmp")
+    out = None
+    try:
+        for start in range(0, rows, block):
+            values = var[start : start + block]
+            if out is None:
+                out = np.lib.format.open_memmap(
+                    tmp, mode="w+", dtype=values.dtype, shape=(rows, cols)
+                )
+            out[start : start + block] = values
+
+        out.flush()
+        del out
+        os.replace(tmp, npy)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+_rasters: Dict[Tuple[str, str], BathymetryRaster] = {}
+_rasters_lock = threading.Lock()
+
+
+def get_bathymetry_raster(path: str, variable: str = "z") -> BathymetryRaster:
+    """Returns the (shared) memory-mapped raster for the given netCDF file,
+    converting it on first use or after the file has been replaced.
+    """
+    mtime_ns = os.stat(path).st_mtime_ns
+
+    with _rasters_lock:
+        raster = _rasters.get((path, variable))
+        if raster is None or raster.mtime_ns != mtime_ns:
+            raster = BathymetryRaster(path, _get_cache_dir(), variable)
+            _rasters[(path, variable)] = raster
+
+    return raster
+
+
+def etopo_window(
+    projection: str, x: int, y: int, z: int, nx: int = 1, ny: int = 1
+) -> np.ndarray:
+    """Returns the ETOPO elevation under the nx by ny block of 256px tiles whose
+    top-left tile is (x, y) at zoom level z.
+    """
+    raster = get_bathymetry_raster(get_settings().etopo_file % (projection, z))
+
+    xpx = x * 256
+    ypx = y * 256
+
+    return raster.window(ypx, ypx + 256 * ny, xpx, xpx + 256 * nx)
+
+
+@lru_cache()
+def _get_cache_dir() -> str:
+    settings = get_settings()
+
+    return settings.bathymetry_cache_dir or os.path.join(
+        settings.cache_dir, "bathymetry"
+    )
@@ -1,3 +1,4 @@
+import dask.array
 import numpy as np
 import xarray as xr
 
@@ -28,6 +29,9 @@ class CalculatedData(NetCDFData):
             self._calculated = {}
 
         self._calculated_variable_list = None
+        # Shared by the calculated variables of this dataset so that variables
+        # and subexpressions common to several of them are computed once.
+        self._memo = data.calculated_parser.parser.new_memo()
 
     def __get_calculated_dims(self, variable_key: str) -> list:
         try:
@@ -61,6 +65,7 @@ class CalculatedData(NetCDFData):
                 self.__get_calculated_dims(key),
                 attrs,
                 self.url,
+                self._memo,
             )
 
         return super().get_dataset_variable(key)
@@ -101,34 +106,30 @@ class CalculatedArray:
     data to the calling method.
     """
 
-    def __init__(self, parent, expression, dims, attrs={}, db_url=""):
+    def __init__(self, parent, expression, dims, attrs={}, db_url="", memo=None):
         """
         Parameters:
         parent -- the underlying dataset
         expression -- the equation to parse
         attrs -- optional, any attributes that the CalculatedArray should have
+        memo -- optional, a memo (see parser.new_memo) shared with other
+                calculated variables of the same dataset
         """
         self._parent = parent
         self._expression: str = expression
-        self._parser = data.calculated_parser.parser.Parser()
-        self._parser.lexer.lexer.input(expression)
+        # Parsed once per process; the compiled expression also knows the list
+        # of underlying variables involved in the calculation.
+        self._compiled = data.calculated_parser.parser.compile_expression(expression)
+        self._memo = memo
         self._dims: list = dims
         self._attrs: dict = attrs
         self._db_url: str = db_url
         self._shape: tuple = self.__calculate_var_shape()
 
-        # This is a bit odd, but necessary. We run the expression through the
-        # lexer so that the lexer variables get populated. This way we know the
-        # list of underlying variables that are involved in the calculation
-        # before we attempt to do any calculations. This is used to provide
-        # information about the variable like shape, dimensions, etc.
-        for _ in self._parser.lexer.lexer:
-            pass
-
     def __getitem__(self, key: str) -> xr.DataArray:
         # This is where the magic happens.
 
-        data_array = self._parser.parse(self._expression, self._parent, key, self._dims)
+        data_array = self._compiled.evaluate(self._parent, key, self._dims, self._memo)
 
         key = self._format_key(key)
         coords = self._calculate_coords(key)
@@ -139,6 +140,107 @@ class CalculatedArray:
 
         return xr.DataArray(data_array, coords=coords, attrs=self.attrs)
 
+    def lazy(self, key, chunks: dict = None) -> xr.DataArray:
+        """Like __getitem__, but returns a dask-backed DataArray that evaluates
+        the expression a chunk at a time when it's computed (or written with
+        to_netcdf), so that memory use is bounded by the chunk size rather than
+        the size of the selection.
+
+        Parameters:
+        key -- a tuple of integers and/or slices; other keys are evaluated
+               eagerly
+        chunks -- optional, chunk sizes by dim. By default the dims along which
+                  the expression can be evaluated piecewise get the chunks of
+                  the underlying dataset, time one step per chunk.
+        """
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),) * (len(self._dims) - len(key))
+
+        if (
+            not self._dims
+            or len(key) != len(self._dims)
+            or not all(isinstance(k, (int, np.integer, slice)) for k in key)
+        ):
+            return self[key]
+
+        ranges = [
+            (
+                range(n)[k : k + 1 or None]
+                if isinstance(k, (int, np.integer))
+                else range(n)[k]
+            )
+            for k, n in zip(key, self.shape)
+        ]
+
+        block_sizes = self.__block_sizes(chunks or {})
+        data_array = dask.array.map_blocks(
+            self.__evaluate_block,
+            ranges,
+            dtype=self.__result_dtype(),
+            chunks=tuple(
+                _split(len(r), block_sizes.get(d, len(r)))
+                for r, d in zip(ranges, self._dims)
+            ),
+            meta=np.array(()),
+        )
+
+        coords = self._calculate_coords([_range_slice(r) for r in ranges])
+        dims = [str(d) for d in self._dims]
+        if not coords:
+            # Without coordinates __getitem__ drops the dims indexed by integers.
+            integer = [isinstance(k, (int, np.integer)) for k in key]
+            data_array = data_array[tuple(0 if i else slice(None) for i in integer)]
+            dims = [d for d, i in zip(dims, integer) if not i]
+
+        return xr.DataArray(
+            data_array,
+            coords=coords,
+            dims=dims if not coords else None,
+            attrs=self.attrs,
+        )
+
+    def __evaluate_block(self, ranges, block_info=None):
+        location = block_info[None]["array-location"]
+        key = tuple(_range_slice(r[a:b]) for r, (a, b) in zip(ranges, location))
+
+        block = self._compiled.evaluate(self._parent, key, self._dims)
+        if np.ma.isMaskedArray(block):
+            block = np.ma.filled(block.astype(np.float64), np.nan)
+
+        return np.reshape(block, tuple(b - a for a, b in location)).astype(
+            block_info[None]["dtype"], copy=False
+        )
+
+    def __block_sizes(self, chunks: dict) -> dict:
+        parent_chunks = getattr(self._parent, "chunks", None) or {}
+        try:
+            parent_chunks = dict(parent_chunks)
+        except (TypeError, ValueError):
+            parent_chunks = {}
+
+        sizes = {}
+        for d in self._compiled.separable_dims(self._dims):
+            if d in chunks:
+                sizes[d] = chunks[d]
+            elif parent_chunks.get(d):
+                sizes[d] = max(parent_chunks[d])
+            elif str(d).startswith("time"):
+                sizes[d] = 1
+
+        return sizes
+
+    def __result_dtype(self) -> np.dtype:
+        # Calculations keep the precision of their inputs (at least float32).
+        return np.result_type(
+            np.float32,
+            *(
+                self._parent.variables[v].dtype
+                for v in self._compiled.variables
+                if v in self._parent.variables
+            ),
+        )
+
     def __calculate_var_shape(self) -> tuple:
         # Determine shape of calculated variable based on its
         # declared dims in datasetconfig.json
@@ -185,11 +287,12 @@ class CalculatedArray:
 
         return self._parent.variables[variable].dimensions
 
-    def isel(self, **kwargs):
+    def isel(self, lazy: bool = False, **kwargs):
         """
         Selects from the array without knowledge of the dimension order
 
         params:
+        lazy -- optional, return a dask-backed DataArray (see lazy)
         key, value pairs where the key the the dimension name and the value is
         the slice to select.
         """
@@ -205,4 +308,20 @@ class CalculatedArray:
         for d in self.dims:
             key.append(keys[d])
 
+        if lazy:
+            return self.lazy(tuple(key))
+
         return self[tuple(key)]
+
+
+def _split(length: int, size: int) -> tuple:
+    # Chunks of at most size elements covering length elements.
+    size = max(1, size)
+    chunks = (size,) * (length // size) + ((length % size,) if length % size else ())
+
+    return chunks or (0,)
+
+
+def _range_slice(r: range) -> slice:
+    # The slice that selects the elements of r from range(n).
+    return slice(r.start, r.stop if r.stop >= 0 else None, r.step)
@@ -1,18 +1,21 @@
 #!/usr/bin/env python
 
-import functools
+import hashlib
+import threading
+from contextvars import ContextVar
 from typing import Union
 
 import metpy.calc
 import numpy as np
 import numpy.ma
-import scipy.signal as spsignal
 import gsw
 import xarray as xr
+from cachetools import LRUCache
 from metpy.units import units
-from pint import UnitRegistry
 
-_ureg = UnitRegistry()
+# Memo of the expression evaluation in progress (see parser.Expression), used to
+# share intermediate results between functions called on the same inputs.
+_memo = ContextVar("calculated_memo", default=None)
 
 # All functions in this file (that do not start with an underscore) will be
 # available to the parser.
@@ -32,6 +35,34 @@ log2 = np.log2
 
 abs = np.abs
 
+# Functions whose result at each point only depends on their arguments at that
+# point, and functions that reduce their arguments to a single value. Used to
+# decide how an expression can be evaluated a chunk at a time (see
+# parser.Expression.separable_dims). sspeed isn't listed because it squeezes its
+# arguments, which breaks on chunks with a single row or column.
+_ELEMENTWISE = frozenset(
+    {
+        "sin",
+        "cos",
+        "tan",
+        "asin",
+        "acos",
+        "atan",
+        "atan2",
+        "ln",
+        "log",
+        "log2",
+        "abs",
+        "magnitude",
+        "bearing",
+        "oxygensaturation",
+        "nitrogensaturation",
+        "density",
+        "heatcap",
+    }
+)
+_REDUCTIONS = frozenset({"max", "min"})
+
 
 def max(arg):
     return np.ravel(arg).max()
@@ -255,6 +286,36 @@ def sspeed(
     return np.squeeze(speed)
 
 
+def _shared_sspeed(depth, latitude, temperature, salinity) -> np.ndarray:
+    """
+    Returns a copy of the speed of sound for the given (unvalidated) arguments,
+    computing it only once per set of argument objects during an expression
+    evaluation. This lets e.g. soniclayerdepth and deepsoundchannel share the
+    sound speed when they are evaluated for the same request.
+    """
+    memo = _memo.get()
+    key = ("sspeed", id(depth), id(latitude), id(temperature), id(salinity))
+
+    cached = memo.get(key) if memo is not None else None
+    if cached is None:
+        speed = sspeed(
+            *__validate_depth_lat_temp_sal(depth, latitude, temperature, salinity)
+        )
+        if memo is None:
+            return speed
+
+        # The arguments are kept alongside the result so that their ids can't
+        # be reused by other objects while the entry is alive.
+        cached = (speed, (depth, latitude, temperature, salinity))
+        try:
+            memo[key] = cached
+        except ValueError:
+            pass
+
+    # Callers modify the sound speed in place.
+    return cached[0].copy()
+
+
 def density(depth, latitude, temperature, salinity) -> np.ndarray:
     """
     Calculates the density of sea water.
@@ -357,11 +418,12 @@ def soniclayerdepth(depth, latitude, temperature, salinity) -> np.ndarray:
         * salinity: Salinity
     """
 
+    sound_speed = _shared_sspeed(depth, latitude, temperature, salinity)
+
     depth, latitude, temperature, salinity = __validate_depth_lat_temp_sal(
         depth, latitude, temperature, salinity
     )
 
-    sound_speed = sspeed(depth, latitude, temperature, salinity)
     if len(sound_speed.shape) > 3:  # if true dims are (time, depth, y, x)
         sound_speed = np.swapaxes(
             sound_speed, 0, 1
@@ -384,11 +446,12 @@ def deepsoundchannel(depth, latitude, temperature, salinity) -> np.ndarray:
         * salinity: Salinity
     """
 
+    sound_speed = _shared_sspeed(depth, latitude, temperature, salinity)
+
     depth, latitude, temperature, salinity = __validate_depth_lat_temp_sal(
         depth, latitude, temperature, salinity
     )
 
-    sound_speed = sspeed(depth, latitude, temperature, salinity)
     if len(sound_speed.shape) > 3:  # if true dims are (time, depth, y, x)
         sound_speed = np.swapaxes(
             sound_speed, 0, 1
@@ -415,14 +478,15 @@ def deepsoundchannelbottom(depth, latitude, temperature, salinity, bathy) -> np.
         * bathy: Model Bathymetry
     """
 
+    # Use masked array to quickly enable/disable data (see below)
+    sound_speed = np.ma.array(
+        _shared_sspeed(depth, latitude, temperature, salinity), fill_value=np.nan
+    )
+
     depth, latitude, temperature, salinity = __validate_depth_lat_temp_sal(
         depth, latitude, temperature, salinity
     )
 
-    # Use masked array to quickly enable/disable data (see below)
-    sound_speed = np.ma.array(
-        sspeed(depth, latitude, temperature, salinity), fill_value=np.nan
-    )
     if len(sound_speed.shape) > 3:  # if true dims are (time, depth, y, x)
         sound_speed = np.swapaxes(
             sound_speed, 0, 1
@@ -501,11 +565,157 @@ def depthexcess(depth, latitude, temperature, salinity, bathy) -> np.ndarray:
     return np.abs(dscb - bathy.data)
 
 
+def __local_maxima(data: np.ndarray):
+    """
+    Vectorized scipy.signal.find_peaks (without any of its conditions) along
+    axis 0 of data.
+
+    Returns a boolean array marking the first sample of every peak (a sample,
+    or a run of equal samples, higher than both of its neighbours) and an array
+    with the index find_peaks reports for the peak (the middle of the run) at
+    the same positions.
+    """
+    n = data.shape[0]
+    peaks = np.zeros(data.shape, dtype=bool)
+    midpoints = np.zeros(data.shape, dtype=np.intp)
+    if n < 3:
+        return peaks, midpoints
+
+    index = np.arange(n).reshape((n,) + (1,) * (data.ndim - 1))
+
+    # next_change[i] is the index of the first sample after i that differs from
+    # its predecessor (n if there is none), i.e. where a run starting at i ends.
+    changed = np.ones(data.shape, dtype=bool)
+    changed[1:] = data[1:] != data[:-1]
+    next_change = np.full(data.shape, n, dtype=np.intp)
+    next_change[:-1] = np.where(changed, index, n)[1:]
+    next_change = np.flip(np.minimum.accumulate(np.flip(next_change, 0), axis=0), 0)
+
+    end = next_change[1:-1]
+    after = np.take_along_axis(data, np.minimum(end, n - 1), axis=0)
+    with np.errstate(invalid="ignore"):
+        peaks[1:-1] = (data[:-2] < data[1:-1]) & (end < n) & (after < data[1:-1])
+    midpoints[1:-1] = (index[1:-1] + end - 1) // 2
+
+    return peaks, midpoints
+
+
+def __first_two_peaks(data: np.ndarray):
+    """
+    Returns the first and second entries (-1 where there are none) of
+    scipy.signal.find_peaks(column)[0] and the number of peaks, for every
+    column along axis 0 of data.
+    """
+    peaks, midpoints = __local_maxima(data)
+    count = peaks.sum(axis=0)
+
+    first_position = np.argmax(peaks, axis=0)[np.newaxis]
+    first = np.take_along_axis(midpoints, first_position, axis=0)[0]
+
+    np.put_along_axis(peaks, first_position, False, axis=0)
+    second = np.take_along_axis(
+        midpoints, np.argmax(peaks, axis=0)[np.newaxis], axis=0
+    )[0]
+
+    return np.where(count > 0, first, -1), np.where(count > 1, second, -1), count
+
+
+def __interp_columns(x: np.ndarray, xp: np.ndarray, fp: np.ndarray) -> np.ndarray:
+    """
+    Equivalent of [np.interp(x[i], xp[:, i], fp) for i in ...] for every column
+    of xp, including numpy's (guess-based binary search) results when the
+    columns aren't increasing, which sound speed profiles usually aren't.
+
+    Required Arguments:
+        * x: The values to interpolate, one per column
+        * xp: The x-coordinates of the data points, along axis 0
+        * fp: The y-coordinates of the data points, shared by every column
+    """
+    n = xp.shape[0]
+    x = np.asarray(x, dtype=np.float64)
+    xp = np.asarray(xp, dtype=np.float64)
+    fp = np.asarray(fp, dtype=np.float64)
+
+    def at(i):
+        return np.take_along_axis(xp, i[np.newaxis], axis=0)[0]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if n <= 4:
+            # Linear search, from the second sample, for the last sample the key
+            # isn't below.
+            below = ~(x[np.newaxis] >= xp[1:])
+            j = np.where(below.any(axis=0), np.argmax(below, axis=0), n - 1)
+        else:
+            # A single key per search, so the guess is always 1.
+            guess = 1
+            cache = 8
+            j = np.zeros(x.shape, dtype=np.intp)
+            imin = np.zeros(x.shape, dtype=np.intp)
+            imax = np.full(x.shape, n, dtype=np.intp)
+            todo = np.ones(x.shape, dtype=bool)
+
+            lt_guess = x < xp[guess]
+            # key >= arr[guess - 1]
+            done = lt_guess & ~(x < xp[guess - 1])
+            j[done] = guess - 1
+            imax[lt_guess & ~done] = guess - 1
+            todo &= ~done
+
+            ge_guess = ~lt_guess
+            done = ge_guess & (x < xp[guess + 1])
+            j[done] = guess
+            todo &= ~done
+            rest = ge_guess & ~done
+            done = rest & (x < xp[guess + 2])
+            j[done] = guess + 1
+            todo &= ~done
+            rest &= ~done
+            imin[rest] = guess + 2
+            if guess < n - cache - 1:
+                imax[rest & (x < xp[guess + cache])] = guess + cache
+
+            while True:
+                active = todo & (imin < imax)
+                if not active.any():
+                    break
+                imid = imin + ((imax - imin) >> 1)
+                ge = x >= at(np.minimum(imid, n - 1))
+                imin = np.where(active & ge, imid + 1, imin)
+                imax = np.where(active & ~ge, imid, imax)
+            j = np.where(todo, imin - 1, j)
+
+        # Keys outside of the range are handled before searching.
+        j = np.where(x < xp[0], -1, j)
+        j = np.where(x > xp[n - 1], n, j)
+
+        jc = np.clip(j, 0, n - 2) if n > 1 else np.zeros_like(j)
+        x0 = at(jc)
+        x1 = at(np.minimum(jc + 1, n - 1))
+        y0 = fp[jc]
+        y1 = fp[np.minimum(jc + 1, n - 1)]
+
+        slope = (y1 - y0) / (x1 - x0)
+        result = slope * (x - x0) + y0
+        # If we get nan in one direction, try the other
+        retry = np.isnan(result)
+        result[retry] = (slope * (x - x1) + y1)[retry]
+        retry &= np.isnan(result) & (y0 == y1)
+        result[retry] = y0[retry]
+
+        result = np.where(x0 == x, y0, result)
+        result = np.where(j == n - 1, fp[n - 1], result)
+        result = np.where(j == n, fp[n - 1], result)
+        result = np.where(j == -1, fp[0], result)
+        result = np.where(np.isnan(x), x, result)
+
+    return result
+
+
 def calculate_del_C(
     depth: np.ndarray,
     soundspeed: np.ndarray,
-    minima: np.ndarray,
-    maxima: np.ndarray,
+    first_minimum: np.ndarray,
+    first_maximum: np.ndarray,
     freq_cutoff: float,
     depth_index: int,
 ) -> np.ndarray:
@@ -514,69 +724,27 @@ def calculate_del_C(
     Required Arguments:
        * depth: The depth(s) in meters
        * soundspeed: Speed of sound in m/s
-       * minima: Minima ndarray of Speed of sound, which contains the index where the
-                 minima occurs
-       * maxima: Maxima ndarray of Speed of sound,  which contains the index where the
-                 maxima occurs
+       * first_minimum: Depth index of the first minimum of the speed of sound
+                        of every profile (-1 if there is none)
+       * first_maximum: Depth index of the first maximum of the speed of sound
+                        of every profile (-1 if there is none)
        * freq_cutoff: Desired frequency cutoff in Hz
+       * depth_index: The depth axis of soundspeed
     Returns the value of ΔC, which will later be used inside the PSSC detection method
     """
+    soundspeed = np.moveaxis(soundspeed, depth_index, 0)
+
     # Getting Cmin from the sound speed profile
-    first_minimum = np.empty_like(minima, dtype="int64")
-    # TODO: need to look at alternative for the following operation
-    it = np.nditer(minima, flags=["refs_ok", "multi_index"])
-    for x in it:
-        array_size = x.tolist().size
-        first_minimum[it.multi_index] = x.tolist()[0] if array_size > 0 else -1
-    if depth_index == 1:
-        Cmin = np.squeeze(
-            np.take_along_axis(
-                soundspeed, first_minimum[:, np.newaxis, :, :], axis=depth_index
-            )
-        )
-    else:
-        Cmin = np.squeeze(
-            np.take_along_axis(
-                soundspeed, first_minimum[np.newaxis, :, :], axis=depth_index
-            )
-        )
+    Cmin = np.take_along_axis(soundspeed, first_minimum[np.newaxis], axis=0)[0]
     Cmin[first_minimum == -1] = np.nan
     # calculating delZ
-    first_maximum = np.empty_like(maxima, dtype="int64")
-    it = np.nditer(maxima, flags=["refs_ok", "multi_index"])
-    for x in it:
-        array_size = x.tolist().size
-        first_maximum[it.multi_index] = x.tolist()[0] if array_size > 0 else -1
     channel_start_depth = depth[first_maximum]
     channel_start_depth[first_maximum == -1] = np.nan
-    if depth_index == 1:
-        Cmax = np.squeeze(
-            np.take_along_axis(
-                soundspeed, first_maximum[:, np.newaxis, :, :], axis=depth_index
-            )
-        )
-    else:
-        Cmax = np.squeeze(
-            np.take_along_axis(
-                soundspeed, first_maximum[np.newaxis, :, :], axis=depth_index
-            )
-        )
+    Cmax = np.take_along_axis(soundspeed, first_maximum[np.newaxis], axis=0)[0]
     Cmax[first_minimum == -1] = np.nan
-    # channel_end_depth = np.apply_along_axis(np.interp,0, Cmax,soundspeed,depth)
-    channel_end_depth = np.empty_like(Cmax, dtype="float")
-    it = np.nditer(Cmax, flags=["refs_ok", "multi_index"])
-    if depth_index == 1:
-        for x in it:
-            channel_end_depth[it.multi_index] = np.interp(
-                x,
-                soundspeed[it.multi_index[0], :, it.multi_index[1], it.multi_index[2]],
-                depth,
-            )
-    else:
-        for x in it:
-            channel_end_depth[it.multi_index] = np.interp(
-                x, soundspeed[:, it.multi_index[0], it.multi_index[1]], depth
-            )
+    channel_end_depth = __interp_columns(
+        Cmax.ravel(), soundspeed.reshape(soundspeed.shape[0], -1), depth
+    ).reshape(Cmax.shape)
 
     del_Z = channel_end_depth - channel_start_depth
     numerator = freq_cutoff * del_Z
@@ -602,22 +770,6 @@ def potentialsubsurfacechannel(
     a sub-surface channel
     """
 
-    def find_point_extrema(sound_speed, depth_index):
-        sound_speed_rolled = np.rollaxis(sound_speed, depth_index)
-        sound_speed_rs = sound_speed_rolled.reshape(sound_speed_rolled.shape[0], -1)
-
-        minima = np.empty(sound_speed_rs.shape[-1], dtype=object)
-        maxima = np.empty(sound_speed_rs.shape[-1], dtype=object)
-
-        for idx, row in enumerate(sound_speed_rs.transpose()):
-            minima[idx] = spsignal.find_peaks(-row)[0]
-            maxima[idx] = spsignal.find_peaks(row)[0]
-
-        minima = minima.reshape(sound_speed_rolled.shape[1:])
-        maxima = maxima.reshape(sound_speed_rolled.shape[1:])
-
-        return minima, maxima
-
     depth, latitude, temperature, salinity = __validate_depth_lat_temp_sal(
         depth, latitude, temperature, salinity
     )
@@ -634,122 +786,113 @@ def potentialsubsurfacechannel(
     sal = np.take(salinity, indices=range(0, depth_length), axis=depth_index)
 
     sound_speed = sspeed(depth, latitude, temp, sal)
-    minima, maxima = find_point_extrema(sound_speed, depth_index)
-
-    delC = calculate_del_C(depth, sound_speed, minima, maxima, freq_cutoff, depth_index)
-    hasPSSC = np.zeros_like(minima, dtype="float")
-
-    it = np.nditer(minima, flags=["refs_ok", "multi_index"])
-    for minima_array in it:
-        minima_list = minima_array.tolist()
-        maxima_list = maxima[it.multi_index].tolist()
-        if len(minima_list) >= 2:
-            p1 = 0
-            p2 = minima[it.multi_index].tolist()[0]
-            if len(maxima_list) >= 2:
-                p1 = maxima_list[0]
-                p3 = maxima_list[1]
-            else:
-                p3 = maxima_list[0]
-            if (
-                p3 > p2
-            ):  # if the only maximum is not higher in the water column than the minima
-                if depth_index == 1:
-                    p1_sound_speed = sound_speed[
-                        it.multi_index[0], p1, it.multi_index[1], it.multi_index[2]
-                    ]
-                    p2_sound_speed = sound_speed[
-                        it.multi_index[0], p2, it.multi_index[1], it.multi_index[2]
-                    ]
-                    p3_sound_speed = sound_speed[
-                        it.multi_index[0], p3, it.multi_index[1], it.multi_index[2]
-                    ]
-                else:
-                    p1_sound_speed = sound_speed[
-                        p1, it.multi_index[0], it.multi_index[1]
-                    ]
-                    p2_sound_speed = sound_speed[
-                        p2, it.multi_index[0], it.multi_index[1]
-                    ]
-                    p3_sound_speed = sound_speed[
-                        p3, it.multi_index[0], it.multi_index[1]
-                    ]
-
-                c1 = abs(p1_sound_speed - p2_sound_speed)
-                c2 = abs(p3_sound_speed - p2_sound_speed)
-
-                if c1 > delC[it.multi_index] and c2 > delC[it.multi_index]:
-                    hasPSSC[it.multi_index] = 1
-
-    return hasPSSC
-
-
-def _metpy(func, data, lat, lon, dim):
-    """Wrapper for MetPy functions
+    profiles = np.moveaxis(sound_speed, depth_index, 0)
 
-    Parameters:
-    func -- the MetPy function
-    data -- the xarray or netcdf variable (already sliced)
-    lat -- an array of latitudes, the shape must match that of data
-    lon -- an array of longitudes, the shape must match that of data
-    dim -- the dimension to return, a string, x or y
+    first_minimum, _, minima_count = __first_two_peaks(-profiles)
+    first_maximum, second_maximum, maxima_count = __first_two_peaks(profiles)
+
+    delC = calculate_del_C(
+        depth, sound_speed, first_minimum, first_maximum, freq_cutoff, depth_index
+    )
+
+    # A channel needs two minima and a maximum below the first one. The first
+    # of two maxima bounds the channel from above, otherwise the surface does.
+    p1 = np.where(maxima_count >= 2, first_maximum, 0)
+    p2 = first_minimum
+    p3 = np.where(maxima_count >= 2, second_maximum, first_maximum)
+    candidate = (minima_count >= 2) & (maxima_count >= 1) & (p3 > p2)
+
+    def speed_at(p):
+        return np.take_along_axis(profiles, np.maximum(p, 0)[np.newaxis], axis=0)[0]
+
+    c1 = abs(speed_at(p1) - speed_at(p2))
+    c2 = abs(speed_at(p3) - speed_at(p2))
+
+    with np.errstate(invalid="ignore"):
+        hasPSSC = candidate & (c1 > delC) & (c2 > delC)
+
+    return hasPSSC.astype("float")
+
+
+def _grid_deltas(lat: np.ndarray, lon: np.ndarray):
+    """
+    Returns metpy.calc.lat_lon_grid_deltas(lon, lat) for (y, x) latitude and
+    longitude arrays. The deltas are cached by grid since every depth and
+    timestamp of a request, and every request for the same area, share them.
+    """
+    lat = np.ascontiguousarray(lat)
+    lon = np.ascontiguousarray(lon)
+
+    h = hashlib.sha1()
+    for a in (lat, lon):
+        h.update(repr((a.shape, a.dtype.str)).encode())
+        h.update(a.tobytes())
+    key = h.hexdigest()
+
+    with _grid_deltas_lock:
+        deltas = _grid_deltas_cache.get(key)
+    if deltas is None:
+        deltas = metpy.calc.lat_lon_grid_deltas(lon, lat)
+        with _grid_deltas_lock:
+            _grid_deltas_cache[key] = deltas
+
+    return deltas
+
+
+_grid_deltas_cache = LRUCache(maxsize=64)
+_grid_deltas_lock = threading.Lock()
+
+
+def _stacked_deltas(deltas, ndim):
+    # MetPy slices the deltas like the data, so they need the same rank; the
+    # leading axes broadcast over the stacked slices.
+    return [d.reshape((1,) * (ndim - d.ndim) + d.shape) for d in deltas]
+
+
+def _yx_last(data, lat, lon):
+    """Returns data with its y and x dimensions moved to the end (in that
+    order), a function restoring the original dimension order of an array
+    shaped like it, and the latitudes and longitudes in (y, x) order.
     """
     if hasattr(data, "dims"):
-        dims = data.dims
+        # xarray calls it dims
+        dims = list(data.dims)
     else:
-        dims = data.dimensions
+        dims = list(data.dimensions)
 
-    dx, dy = metpy.calc.lat_lon_grid_deltas(np.array(lon), np.array(lat))
-    dim_order = "".join([d for d in dims if d in "yx"])
+    order = [i for i, d in enumerate(dims) if d not in ("y", "x")]
+    order += [dims.index("y"), dims.index("x")]
+    restore_axes = np.argsort(order)
 
-    if dim_order == "yx":
-        deltas = [dy, dx]
-    else:
-        deltas = [dx, dy]
-
-    if len(dims) > 2:
-        axes = list(range(0, len(dims)))
-        new_axes = list(axes)
-        new_dims = list(dims)
-        if dim_order == "yx":
-            new_axes += [new_axes.pop(new_dims.index("y"))]
-            new_dims += [new_dims.pop(new_dims.index("y"))]
-            new_axes += [new_axes.pop(new_dims.index("x"))]
-            new_dims += [new_dims.pop(new_dims.index("x"))]
-            restore_axes = [x for _, x in sorted(zip(new_axes, range(0, len(dims))))]
-        else:
-            new_axes += [new_axes.pop(new_dims.index("x"))]
-            new_dims += [new_dims.pop(new_dims.index("x"))]
-            new_axes += [new_axes.pop(new_dims.index("y"))]
-            new_dims += [new_dims.pop(new_dims.index("y"))]
-            restore_axes = [x for _, x in sorted(zip(new_axes, range(0, len(dims))))]
-
-        data = np.transpose(np.array(data), new_axes)
-
-        oshape = data.shape
-        extra_axes = data.shape[:-2]
-        data = np.reshape(
-            data, (functools.reduce(np.multiply, extra_axes), *data.shape[-2:])
-        )
+    lat = np.asarray(lat)
+    lon = np.asarray(lon)
+    if lat.ndim == 2 and dims.index("x") < dims.index("y"):
+        lat = lat.T
+        lon = lon.T
 
-        result = []
-        for j in range(0, len(data)):
-            result.append(
-                func(np.array(data[j]), deltas=deltas, dim_order=dim_order)[
-                    dim_order.index(dim)
-                ].magnitude
-            )
+    def restore(result):
+        return np.transpose(result, restore_axes)
 
-        result = np.array(result)
-        result = np.reshape(result, oshape)
+    return np.transpose(np.asarray(data), order), restore, lat, lon
 
-        result = np.transpose(result, restore_axes)
 
-        return result
-    else:
-        return func(np.array(data), deltas=deltas, dim_order=dim_order)[
-            dim_order.index(dim)
-        ].magnitude
+def _metpy(func, data, lat, lon):
+    """Wrapper for MetPy functions of a scalar field
+
+    The function is called once with all of the data stacked, not once per
+    2D slice, since MetPy's finite differences work on arrays of any rank.
+
+    Parameters:
+    func -- called with the data (y and x as the last two axes), the grid
+            deltas dx and dy, and the latitudes; returns a pint Quantity
+    data -- the xarray or netcdf variable (already sliced)
+    lat -- an array of latitudes, the shape must match that of data
+    lon -- an array of longitudes, the shape must match that of data
+    """
+    data, restore, lat, lon = _yx_last(data, lat, lon)
+    dx, dy = _stacked_deltas(_grid_deltas(lat, lon), data.ndim)
+
+    return restore(np.asarray(func(data, dx, dy, lat).magnitude))
 
 
 def _metpy_uv(func, u, v, lat, lon):
@@ -762,61 +905,21 @@ def _metpy_uv(func, u, v, lat, lon):
     lat -- an array of latitudes, the shape must match that of data
     lon -- an array of longitudes, the shape must match that of data
     """
-    if hasattr(u, "dims"):
-        dims = u.dims
-    else:
-        dims = u.dimensions
-
-    dx, dy = metpy.calc.lat_lon_grid_deltas(np.array(lon), np.array(lat))
-    dim_order = "".join([d for d in dims if d in "yx"])
-
-    if len(dims) > 2:
-        axes = list(range(0, len(dims)))
-        new_axes = list(axes)
-        new_dims = list(dims)
-        if dim_order == "yx":
-            new_axes += [new_axes.pop(new_dims.index("y"))]
-            new_dims += [new_dims.pop(new_dims.index("y"))]
-            new_axes += [new_axes.pop(new_dims.index("x"))]
-            new_dims += [new_dims.pop(new_dims.index("x"))]
-            restore_axes = [x for _, x in sorted(zip(new_axes, range(0, len(dims))))]
-        else:
-            new_axes += [new_axes.pop(new_dims.index("x"))]
-            new_dims += [new_dims.pop(new_dims.index("x"))]
-            new_axes += [new_axes.pop(new_dims.index("y"))]
-            new_dims += [new_dims.pop(new_dims.index("y"))]
-            restore_axes = [x for _, x in sorted(zip(new_axes, range(0, len(dims))))]
-
-        u = np.transpose(np.array(u), new_axes)
-        v = np.transpose(np.array(v), new_axes)
-
-        oshape = u.shape
-        extra_axes = u.shape[:-2]
-        u = np.reshape(u, (functools.reduce(np.multiply, extra_axes), *u.shape[-2:]))
-        v = np.reshape(v, (functools.reduce(np.multiply, extra_axes), *v.shape[-2:]))
-
-        result = []
-        for j in range(0, len(u)):
-            result.append(
-                func(
-                    np.array(u[j]) * units.meter / units.second,
-                    np.array(v[j]) * units.meter / units.second,
-                    dx,
-                    dy,
-                    dim_order=dim_order,
-                ).magnitude
-            )
-
-        result = np.array(result)
-        result = np.reshape(result, oshape)
-
-        result = np.transpose(result, restore_axes)
-
-        return result
-    else:
-        u = np.array(u) * units.meter / units.second
-        v = np.array(v) * units.meter / units.second
-        return func(u, v, dx, dy, dim_order=dim_order).magnitude
+    u, restore, lat, lon = _yx_last(u, lat, lon)
+    v = _yx_last(v, lat, lon)[0]
+    dx, dy = _stacked_deltas(_grid_deltas(lat, lon), u.ndim)
+
+    result = func(
+        u * units.meter / units.second, v * units.meter / units.second, dx=dx, dy=dy
+    )
+
+    return restore(np.asarray(result.magnitude))
+
+
+def _geostrophic_wind(heights, dx, dy, lat):
+    return metpy.calc.geostrophic_wind(
+        heights * units.meter, dx=dx, dy=dy, latitude=np.asarray(lat) * units.degrees
+    )
 
 
 def geostrophic_x(h, lat, lon):
@@ -827,28 +930,7 @@ def geostrophic_x(h, lat, lon):
     lat -- an array of latitudes, the shape must match that of h
     lon -- an array of longitudes, the shape must match that of h
     """
-    if isinstance(lat, xr.Variable):
-        lat = lat.values
-
-    if hasattr(h, "dims"):
-        dims = h.dims
-    else:
-        dims = h.dimensions
-
-    dim_order = "".join([d for d in dims if d in "yx"])
-
-    def f(heights, **kwargs):
-        c = metpy.calc.coriolis_parameter(lat * _ureg.degrees)
-        if dim_order == "yx":
-            dy, dx = kwargs["deltas"]
-        else:
-            dx, dy = kwargs["deltas"]
-
-        return metpy.calc.geostrophic_wind(
-            xr.DataArray(heights), c, dx, dy, dim_order=kwargs["dim_order"]
-        )
-
-    return _metpy(f, h, lat, lon, dim_order[0])
+    return _metpy(lambda *args: _geostrophic_wind(*args)[0], h, lat, lon)
 
 
 def geostrophic_y(h, lat, lon):
@@ -859,28 +941,7 @@ def geostrophic_y(h, lat, lon):
     lat -- an array of latitudes, the shape must match that of h
     lon -- an array of longitudes, the shape must match that of h
     """
-    if isinstance(lat, xr.Variable):
-        lat = lat.values
-
-    if hasattr(h, "dims"):
-        dims = h.dims
-    else:
-        dims = h.dimensions
-
-    dim_order = "".join([d for d in dims if d in "yx"])
-
-    def f(heights, **kwargs):
-        c = metpy.calc.coriolis_parameter(lat * _ureg.degrees)
-        if dim_order == "yx":
-            dy, dx = kwargs["deltas"]
-        else:
-            dx, dy = kwargs["deltas"]
-
-        return metpy.calc.geostrophic_wind(
-            xr.DataArray(heights), c, dx, dy, dim_order=kwargs["dim_order"]
-        )
-
-    return _metpy(f, h, lat, lon, dim_order[1])
+    return _metpy(lambda *args: _geostrophic_wind(*args)[1], h, lat, lon)
 
 
 def vorticity(u, v, lat, lon):
@@ -915,7 +976,12 @@ def gradient_x(d, lat, lon):
     lat -- an array of latitudes, the shape must match that of d
     lon -- an array of longitudes, the shape must match that of d
     """
-    return _metpy(metpy.calc.gradient, d, lat, lon, "x")
+    return _metpy(
+        lambda f, dx, dy, lat: metpy.calc.first_derivative(f, axis=-1, delta=dx),
+        d,
+        lat,
+        lon,
+    )
 
 
 def gradient_y(d, lat, lon):
@@ -926,4 +992,9 @@ def gradient_y(d, lat, lon):
     lat -- an array of latitudes, the shape must match that of d
     lon -- an array of longitudes, the shape must match that of d
     """
-    return _metpy(metpy.calc.gradient, d, lat, lon, "y")
+    return _metpy(
+        lambda f, dx, dy, lat: metpy.calc.first_derivative(f, axis=-2, delta=dy),
+        d,
+        lat,
+        lon,
+    )
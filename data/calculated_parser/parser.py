@@ -1,7 +1,11 @@
 #!/usr/bin/env python
 
+import threading
+from functools import lru_cache
+
 import numpy as np
 import ply.yacc as yacc
+from cachetools import LRUCache
 
 import data.calculated_parser.functions as functions
 import data.calculated_parser.lexer
@@ -23,10 +27,13 @@ class Parser:
             ("left", "POWER"),
             ("right", "UMINUS"),
         )
-        self.parser = yacc.yacc(module=self)
-        self.data = None
+        # The grammar is small enough to build on start, so ply is kept from
+        # writing parsetab.py and parser.out into the source tree.
+        self.parser = yacc.yacc(module=self, write_tables=False, debug=False)
         self.expression = None
-        self.result = np.nan
+        self.variables = None
+        self.functions = None
+        self.full_depth = False
 
     def parse(self, expression, data, key, dims):
         """Parse the expression and return the result
@@ -40,78 +47,61 @@ class Parser:
 
         Returns a numpy array of data.
         """
-        self.data = data
-        self.result = np.array(np.nan)  # populated by p_statement_expr()
-        self.key = key
-        self.dims = dims
-        self.expression = expression
-        self.parser.parse(expression)
-        self.data = None
-        self.key = None
-        self.dims = None
-        return self.result
+        return self.compile(expression).evaluate(data, key, dims)
 
-    def get_key_for_variable(self, variable):
-        """Using self.key and self.dims, determine the key for the particular
-        variable.
+    def compile(self, expression):
+        """Parse the expression into an Expression that can be evaluated
+        any number of times without parsing it again.
 
-        Params:
-        variable -- the xarray or netcdf variable
+        Parameters:
+        expression -- the string expression to parse
 
-        Returns a tuple of integers and/or slices
+        Returns an Expression.
         """
-        key = self.key
-        if not isinstance(key, tuple):
-            key = (key,)
-
-        d = dict(zip(self.dims, key))
+        self.expression = expression
+        self.variables = set()
+        self.functions = set()
+        self.full_depth = False
         try:
-            if hasattr(variable, "dims"):
-                # xarray calls it dims
-                key = [d[k] for k in variable.dims]
-            else:
-                key = [d[k] for k in variable.dimensions]
-        except KeyError:
-            raise SyntaxError
+            root = self.parser.parse(expression, lexer=self.lexer.lexer)
+        finally:
+            self.expression = None
 
-        return tuple(key)
-
-    def get_key_for_variable_full_depth(self, variable_key):
-        variable = self.data.variables[variable_key]
-
-        if "depth" in variable_key:
-            depth_levels = variable.shape[0]  # Expecting (depth shape)
-            return (slice(0, depth_levels),)
-
-        key = list(self.key)
-        # Expecting (time, depth, lat, lon) shape
-        depth_levels = variable.shape[1]
-        key.insert(1, slice(0, depth_levels))
+        if root is None:
+            # ply recovers from a SyntaxError raised by a rule (e.g. an unknown
+            # function) without a result; such expressions evaluate to NaN.
+            root = _Node("nan", lambda ctx: np.nan)
 
-        return tuple(key)
+        return Expression(
+            expression, root, self.variables, self.functions, self.full_depth
+        )
 
     # Similar to the Lexer, these p_*, methods cannot have proper python
     # docstrings, because it's used for the parsing specification.
+    #
+    # Each rule builds a _Node rather than computing its value, so that the
+    # parse happens once per expression instead of once per evaluation.
     def p_statement_expr(self, t):
         "statement : expression"
-        if not isinstance(t[1], np.ndarray):
-            t[1] = np.array(t[1])
-        self.result = t[1]
+        t[0] = t[1]
 
     def p_expression_variable(self, t):
         "expression : ID"
-        t[0] = self.data.variables[t[1]][
-            self.get_key_for_variable(self.data.variables[t[1]])
-        ]
+        name = t[1]
+        self.variables.add(name)
+        t[0] = _Node(name, lambda ctx: ctx.variable(name))
 
     def p_expression_variable_full_depth(self, t):
         """expression : LBRKT ID RBRKT"""
-
-        t[0] = self.data.variables[t[2]][self.get_key_for_variable_full_depth(t[2])]
+        name = t[2]
+        self.variables.add(name)
+        self.full_depth = True
+        t[0] = _Node(f"[{name}]", lambda ctx: ctx.variable_full_depth(name))
 
     def p_expression_uop(self, t):
         """expression : MINUS expression %prec UMINUS"""
-        t[0] = -t[2]
+        operand = t[2]
+        t[0] = _Node(f"(-{operand.text})", lambda ctx: -operand.evaluate(ctx))
 
     def p_expression_binop(self, t):
         """expression : expression PLUS expression
@@ -119,16 +109,36 @@ class Parser:
         | expression TIMES expression
         | expression DIVIDE expression
         | expression POWER NUMBER"""
-        if t[2] == "+":
-            t[0] = t[1] + t[3]
-        elif t[2] == "-":
-            t[0] = t[1] - t[3]
-        elif t[2] == "*":
-            t[0] = t[1] * t[3]
-        elif t[2] == "/":
-            t[0] = t[1] / t[3]
-        elif t[2] == "^":
-            t[0] = t[1] ** t[3]
+        left, op, right = t[1], t[2], t[3]
+        if op == "^":
+            right = _Node(repr(right), lambda ctx, exponent=right: exponent)
+
+        if op == "+":
+
+            def evaluate(ctx):
+                return left.evaluate(ctx) + right.evaluate(ctx)
+
+        elif op == "-":
+
+            def evaluate(ctx):
+                return left.evaluate(ctx) - right.evaluate(ctx)
+
+        elif op == "*":
+
+            def evaluate(ctx):
+                return left.evaluate(ctx) * right.evaluate(ctx)
+
+        elif op == "/":
+
+            def evaluate(ctx):
+                return left.evaluate(ctx) / right.evaluate(ctx)
+
+        elif op == "^":
+
+            def evaluate(ctx):
+                return left.evaluate(ctx) ** right.evaluate(ctx)
+
+        t[0] = _Node(f"({left.text}{op}{right.text})", evaluate)
 
     def p_expression_group(self, t):
         "expression : LPAREN expression RPAREN"
@@ -136,20 +146,31 @@ class Parser:
 
     def p_expression_number(self, t):
         "expression : NUMBER"
-        t[0] = t[1]
+        value = t[1]
+        t[0] = _Node(repr(value), lambda ctx: value)
 
     def p_expression_const(self, t):
         "expression : CONST"
-        t[0] = t[1]
+        value = t[1]
+        t[0] = _Node(repr(value), lambda ctx: value)
 
     def p_expression_function(self, t):
         "expression : ID LPAREN arguments RPAREN"
         fname = t[1]
         arg_list = t[3]
         if fname in dir(functions):
-            t[0] = getattr(functions, fname)(*arg_list)
+            fn = getattr(functions, fname)
         else:
             raise SyntaxError
+        self.functions.add(fname)
+
+        text = "{}({})".format(fname, ",".join(a.text for a in arg_list))
+        t[0] = _Node(
+            text,
+            lambda ctx: ctx.shared(
+                text, lambda: fn(*[a.evaluate(ctx) for a in arg_list])
+            ),
+        )
 
     def p_arguments(self, t):
         "arguments : argument"
@@ -168,3 +189,213 @@ class Parser:
         raise SyntaxError(
             "Syntax error in equation: {}...{}".format(self.expression, t)
         )
+
+
+class _Node:
+    """A node of a compiled expression. `text` is a canonical rendering of the
+    subexpression (used to recognize repeated subexpressions) and `evaluate`
+    computes its value in an _Evaluation.
+    """
+
+    __slots__ = ("text", "evaluate")
+
+    def __init__(self, text, evaluate):
+        self.text = text
+        self.evaluate = evaluate
+
+
+class Expression:
+    """A parsed expression, ready to be evaluated against a dataset."""
+
+    def __init__(self, expression, root, variables, fnames=(), full_depth=False):
+        self.expression = expression
+        # The names of the dataset variables used by the expression.
+        self.variables = frozenset(variables)
+        # The names of the functions it calls.
+        self.functions = frozenset(fnames)
+        # Whether it reads any variable over its full depth ([variable]).
+        self.full_depth = full_depth
+        self._root = root
+
+    def separable_dims(self, dims):
+        """Returns the dims along which the expression can be evaluated a piece
+        at a time, i.e. the dims along which a slice of the result only depends
+        on the same slice of the variables.
+
+        Expressions made of arithmetic and elementwise functions are separable
+        along every dim. Other functions (e.g. along a water column or the
+        horizontal grid) are only separable in time, and reductions like max
+        along none.
+        """
+        if self.functions & functions._REDUCTIONS:
+            return []
+
+        if not self.full_depth and self.functions <= functions._ELEMENTWISE:
+            return list(dims)
+
+        return [d for d in dims if str(d).startswith("time")]
+
+    def evaluate(self, data, key, dims, memo=None):
+        """Evaluate the expression
+
+        Parameters:
+        data -- the xarray or netcdf dataset to pull data from
+        key -- the key passed along from the __getitem__ call, a tuple of
+               integers and/or slices
+        dims -- the dimensions that correspond to the key, a list of strings
+        memo -- optional, a mapping (see new_memo) to share variable reads and
+                function results with other evaluations for the same request
+
+        Returns a numpy array of data.
+        """
+        if memo is None:
+            memo = {}
+
+        ctx = _Evaluation(data, key, dims, memo)
+        token = functions._memo.set(memo)
+        try:
+            result = self._root.evaluate(ctx)
+        except SyntaxError:
+            # Raised when a variable doesn't have one of the key's dimensions.
+            # Like a SyntaxError raised while parsing, this gives NaN.
+            result = np.nan
+        finally:
+            functions._memo.reset(token)
+
+        if not isinstance(result, np.ndarray):
+            result = np.array(result)
+
+        return result
+
+
+class _Evaluation:
+    """The state of a single evaluation of an Expression."""
+
+    def __init__(self, data, key, dims, memo):
+        self.data = data
+        self.key = key
+        self.dims = dims
+        self.memo = memo
+        self._memo_key = (_freeze(key), tuple(dims) if dims is not None else None)
+
+    def shared(self, text, compute):
+        """Returns the value of the subexpression `text`, computing it only if
+        it hasn't already been computed for the same key and dims.
+        """
+        memo_key = (text, self._memo_key)
+        try:
+            return self.memo[memo_key]
+        except KeyError:
+            pass
+
+        value = compute()
+        try:
+            self.memo[memo_key] = value
+        except ValueError:
+            # Too large for the memo.
+            pass
+
+        return value
+
+    def variable(self, name):
+        return self.shared(
+            name,
+            lambda: self.data.variables[name][
+                self.get_key_for_variable(self.data.variables[name])
+            ],
+        )
+
+    def variable_full_depth(self, name):
+        return self.shared(
+            f"[{name}]",
+            lambda: self.data.variables[name][
+                self.get_key_for_variable_full_depth(name)
+            ],
+        )
+
+    def get_key_for_variable(self, variable):
+        """Using self.key and self.dims, determine the key for the particular
+        variable.
+
+        Params:
+        variable -- the xarray or netcdf variable
+
+        Returns a tuple of integers and/or slices
+        """
+        key = self.key
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        d = dict(zip(self.dims, key))
+        try:
+            if hasattr(variable, "dims"):
+                # xarray calls it dims
+                key = [d[k] for k in variable.dims]
+            else:
+                key = [d[k] for k in variable.dimensions]
+        except KeyError:
+            raise SyntaxError
+
+        return tuple(key)
+
+    def get_key_for_variable_full_depth(self, variable_key):
+        variable = self.data.variables[variable_key]
+
+        if "depth" in variable_key:
+            depth_levels = variable.shape[0]  # Expecting (depth shape)
+            return (slice(0, depth_levels),)
+
+        key = list(self.key)
+        # Expecting (time, depth, lat, lon) shape
+        depth_levels = variable.shape[1]
+        key.insert(1, slice(0, depth_levels))
+
+        return tuple(key)
+
+
+def _freeze(key):
+    # Hashable version of a __getitem__ key (slices and arrays aren't hashable).
+    if isinstance(key, (tuple, list)):
+        return tuple(_freeze(k) for k in key)
+    if isinstance(key, slice):
+        return ("slice", key.start, key.stop, key.step)
+    if isinstance(key, np.ndarray):
+        return ("array", key.shape, key.dtype.str, key.tobytes())
+
+    return key
+
+
+def _nbytes(value) -> int:
+    if isinstance(value, tuple):
+        return sum(_nbytes(v) for v in value)
+
+    return max(1, getattr(value, "nbytes", 0))
+
+
+def new_memo(max_bytes=256 * 1024 * 1024):
+    """Returns a memo for Expression.evaluate, bounded to roughly max_bytes of
+    arrays. Evaluations sharing a memo (e.g. the calculated variables of one
+    request) read each underlying variable and compute each common
+    subexpression only once.
+    """
+    return LRUCache(maxsize=max_bytes, getsizeof=_nbytes)
+
+
+_parser = None
+_parser_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(expression):
+    """Returns the (cached) compiled Expression for the given expression string.
+
+    Building the parser runs ply's table generation, so a single parser is
+    shared by the whole process.
+    """
+    global _parser
+
+    with _parser_lock:
+        if _parser is None:
+            _parser = Parser()
+
+        return _parser.compile(expression)
@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, Hashable, Optional
+
+import netCDF4
+
+from oceannavigator.settings import get_settings
+
+
+class _PoolEntry:
+    """An opened dataset handle along with its bookkeeping."""
+
+    def __init__(self, key: Hashable, dataset) -> None:
+        self.key: Hashable = key
+        self.dataset = dataset
+        self.refcount: int = 0
+        self.opened_at: float = time.monotonic()
+        self.retired: bool = False
+        # Raw netCDF4 handles aren't thread-safe, so they're only handed out to
+        # the thread that currently holds them (see _shareable).
+        self.exclusive: bool = not _shareable(dataset)
+        self.owner: Optional[int] = None
+        # Index of the dataset's time variable, built by the first NetCDFData
+        # that needs it (see NetCDFData._time_index).
+        self.time_index = None
+
+    def busy(self) -> bool:
+        """Whether another thread holds this exclusive handle."""
+        return (
+            self.exclusive and self.refcount > 0 and self.owner != threading.get_ident()
+        )
+
+    def hold(self) -> "_PoolEntry":
+        self.refcount += 1
+        self.owner = threading.get_ident()
+        return self
+
+
+class DatasetPool:
+    """Process-wide pool of opened datasets.
+
+    Opening a dataset (open_mfdataset over the indexed files, merging the grid angle
+    and bathymetry files, decoding coordinates) is by far the most expensive part of
+    serving a tile or plot for a timestep that has already been seen. The pool keeps
+    those handles open and hands the same object out to every NetCDFData instance
+    that asks for the same key.
+
+    xarray datasets are shared by every thread, since xarray serializes the reads
+    of the underlying netCDF/HDF5 files. Raw netCDF4 handles (the FVCOM fallback)
+    aren't thread-safe, so while one thread holds such a handle other threads get
+    a private handle of their own, closed as soon as it's released.
+
+    Entries are reference counted: a handle is only closed once nobody is using it.
+    Idle entries are evicted least-recently-used first when the pool grows past
+    `max_size`, and entries older than `max_age` seconds are retired (no longer
+    handed out, closed once released) so that handles don't live forever.
+    """
+
+    def __init__(self, max_size: int = 16, max_age: float = 600) -> None:
+        self.max_size: int = max_size
+        self.max_age: float = max_age
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.RLock()
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def acquire(self, key: Hashable, opener: Callable) -> _PoolEntry:
+        """Returns a pool entry for the given key, opening the dataset with
+        `opener` if there is no usable entry. The caller must hand the entry
+        back with `release` once done with it.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                self._retire(entry)
+                entry = None
+
+            if entry is not None and not entry.busy():
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.hold()
+
+            self.misses += 1
+
+        # Open outside the lock so that a slow open doesn't block requests for
+        # other datasets.
+        dataset = opener()
+
+        with self._lock:
+            entry = _PoolEntry(key, dataset).hold()
+
+            existing = self._entries.get(key)
+            if existing is not None and existing.busy():
+                # A private handle, the pooled one is in use by another thread.
+                entry.retired = True
+                return entry
+
+            if existing is not None and not existing.retired:
+                # Someone else opened the same dataset in the meantime.
+                _close(dataset)
+                self._entries.move_to_end(key)
+                return existing.hold()
+
+            if self.max_size > 0:
+                self._entries[key] = entry
+                self._evict()
+            else:
+                entry.retired = True
+
+            return entry
+
+    def release(self, entry: _PoolEntry) -> None:
+        """Hands an entry back to the pool."""
+        with self._lock:
+            entry.refcount = max(entry.refcount - 1, 0)
+            if entry.refcount == 0:
+                entry.owner = None
+
+            if entry.refcount == 0 and entry.retired:
+                _close(entry.dataset)
+            else:
+                self._evict()
+
+    def clear(self) -> None:
+        """Retires every entry. Idle handles are closed immediately, handles in use
+        are closed when released.
+        """
+        with self._lock:
+            for entry in list(self._entries.values()):
+                self._retire(entry)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "in_use": sum(1 for e in self._entries.values() if e.refcount > 0),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _expired(self, entry: _PoolEntry) -> bool:
+        return time.monotonic() - entry.opened_at > self.max_age
+
+    def _retire(self, entry: _PoolEntry) -> None:
+        self._entries.pop(entry.key, None)
+        entry.retired = True
+        self.evictions += 1
+
+        if entry.refcount == 0:
+            _close(entry.dataset)
+
+    def _evict(self) -> None:
+        for entry in list(self._entries.values()):
+            if entry.refcount == 0 and self._expired(entry):
+                self._retire(entry)
+
+        # OrderedDict iterates from least to most recently used.
+        for entry in list(self._entries.values()):
+            if len(self._entries) <= self.max_size:
+                break
+            if entry.refcount == 0:
+                self._retire(entry)
+
+
+def _shareable(dataset) -> bool:
+    return not isinstance(dataset, netCDF4.Dataset)
+
+
+def _close(dataset) -> None:
+    try:
+        dataset.close()
+    except (AttributeError, RuntimeError, OSError):
+        pass
+
+
+@lru_cache()
+def get_dataset_pool() -> DatasetPool:
+    settings = get_settings()
+
+    return DatasetPool(settings.dataset_pool_size, settings.dataset_pool_max_age)
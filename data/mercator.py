@@ -57,7 +57,9 @@ class Mercator(Model):
 
     def __bounding_box(self, lat, lon, n=10):
 
-        y, x, _ = find_nearest_grid_point(lat, lon, self.latvar, self.lonvar, n)
+        y, x, _ = find_nearest_grid_point(
+            lat, lon, self.latvar, self.lonvar, n, dataset_key=self.nc_data.dataset_key
+        )
 
         def fix_limits(data, limit):
             mx = np.amax(data)
@@ -92,24 +94,11 @@ class Mercator(Model):
         )
 
         if len(data.shape) == 3:
-            output = []
             # multiple depths
-            for d in range(0, data.shape[2]):
-                grid_lat, grid_lon = np.meshgrid(masked_lat_in, masked_lon_in)
-                grid_lat.mask = grid_lon.mask = (
-                    data[:, :, d].view(np.ma.MaskedArray).mask.transpose()
-                )
-                input_def = pyresample.geometry.SwathDefinition(
-                    lons=grid_lon, lats=grid_lat
-                )
-
-                output.append(
-                    self.nc_data.interpolate(
-                        input_def, output_def, data[:, :, d].transpose()
-                    )
-                )
-
-            output = np.ma.array(output).transpose()
+            grid_lat, grid_lon = np.meshgrid(masked_lat_in, masked_lon_in)
+            output = self.nc_data.interpolate_levels(
+                grid_lon, grid_lat, output_def, data.transpose((1, 0, 2))
+            ).transpose()
         else:
             grid_lat, grid_lon = np.meshgrid(masked_lat_in, masked_lon_in)
             grid_lat.mask = grid_lon.mask = data.view(
@@ -139,19 +128,28 @@ class Mercator(Model):
     def get_raw_point(self, latitude, longitude, depth, timestamp, variable):
         miny, maxy, minx, maxx, radius = self.__bounding_box(latitude, longitude, 10)
 
-        if not hasattr(latitude, "__len__"):
-            latitude = np.array([latitude])
-            longitude = np.array([longitude])
+        return self.__raw_window(variable, depth, timestamp, miny, maxy, minx, maxx)
+
+    def get_raw_area(self, minlat, maxlat, minlon, maxlon, depth, timestamp, variable):
+        miny, maxy, minx, maxx = super()._bounds_window(
+            self.latvar, self.lonvar, minlat, maxlat, minlon, maxlon
+        )
 
+        return self.__raw_window(variable, depth, timestamp, miny, maxy, minx, maxx)
+
+    def __raw_window(self, variable, depth, timestamp, miny, maxy, minx, maxx):
+        """Reads the native grid cells of a variable, and their latitudes and
+        longitudes, in a (y, x) window.
+        """
         var = self.nc_data.get_dataset_variable(variable)
 
         time = self.nc_data.timestamp_to_time_index(timestamp)
 
         if depth == "bottom":
             if hasattr(time, "__len__"):
-                d = var[time[0], :, miny:maxy, minx:maxx]
+                d = np.asarray(var[time[0], :, miny:maxy, minx:maxx])
             else:
-                d = var[time, :, miny:maxy, minx:maxx]
+                d = np.asarray(var[time, :, miny:maxy, minx:maxx])
 
             reshaped = np.ma.masked_invalid(d.reshape([d.shape[0], -1]))
 
@@ -160,7 +158,7 @@ class Mercator(Model):
             indices = edges[1, 1, :]
 
             if hasattr(time, "__len__"):
-                data_in = var[time, :, miny:maxy, minx:maxx]
+                data_in = np.asarray(var[time, :, miny:maxy, minx:maxx])
                 data_in = data_in.reshape([data_in.shape[0], data_in.shape[1], -1])
                 data = []
                 for i, t in enumerate(time):
@@ -177,7 +175,9 @@ class Mercator(Model):
             else:
                 data = var[time, miny:maxy, minx:maxx]
 
-        lat_out, lon_out = np.meshgrid(self.latvar[miny:maxy], self.lonvar[minx:maxx])
+        lat_out, lon_out = np.meshgrid(
+            self.latvar[miny:maxy], self.lonvar[minx:maxx], indexing="ij"
+        )
 
         return (lat_out, lon_out, data)
 
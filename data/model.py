@@ -6,6 +6,10 @@ from scipy.interpolate import interp1d
 
 import data.geo as geo
 
+# Stations in the same cell of a grid with cells this size (in degrees) are
+# extracted together, which keeps the window read around them small.
+POINT_GROUP_SIZE = 2.0
+
 
 class Model(metaclass=abc.ABCMeta):
     """Abstract base class for models."""
@@ -72,6 +76,35 @@ class Model(metaclass=abc.ABCMeta):
     def get_raw_point(self, latitude, longitude, depth, time, variable):
         pass
 
+    def get_raw_area(self, minlat, maxlat, minlon, maxlon, depth, time, variable):
+        """Like get_raw_point, but returns the window of native grid cells that
+        covers every cell centred within the given bounds.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _bounds_window(latvar, lonvar, minlat, maxlat, minlon, maxlon):
+        """Returns the (miny, maxy, minx, maxx) slice bounds of the smallest
+        window of a (1D or 2D) lat/lon grid that contains every cell centred
+        within the bounds, or a single cell if there are none.
+        """
+        lat = numpy.asarray(latvar)
+        lon = ((numpy.asarray(lonvar) + 180) % 360) - 180
+
+        if lat.ndim == 1:
+            rows = (lat >= minlat) & (lat <= maxlat)
+            columns = (lon >= minlon) & (lon <= maxlon)
+        else:
+            inside = (lat >= minlat) & (lat <= maxlat)
+            inside &= (lon >= minlon) & (lon <= maxlon)
+            rows, columns = inside.any(axis=1), inside.any(axis=0)
+
+        if not rows.any() or not columns.any():
+            return 0, 1, 0, 1
+
+        y, x = numpy.flatnonzero(rows), numpy.flatnonzero(columns)
+        return int(y[0]), int(y[-1]) + 1, int(x[0]), int(x[-1]) + 1
+
     def _make_resample_data(self, lat_in, lon_in, lat_out, lon_out, data):
         """
         Note: `data` must be of shape (time, lat, lon) OR (time, depth, lat, lon).
@@ -140,11 +173,37 @@ class Model(metaclass=abc.ABCMeta):
         return numpy.reshape(a, area.shape[1:])
 
     def get_path_profile(self, path, variable, starttime, endtime=None, numpoints=100):
+        points, distances, _, (result,), depth = self.get_path_profiles(
+            path, [variable], starttime, endtime=endtime, numpoints=numpoints
+        )
+
+        return points, distances, result, depth
+
+    def get_path_profiles(
+        self, path, variables, starttime, endtime=None, numpoints=100
+    ):
+        """Extracts the profiles of several variables (e.g. the components of a
+        vector) along a path.
+
+        The path is sampled once for all of them, and variables on the same
+        grid share the neighbour search and weights (see get_profile).
+
+        Returns:
+            tuple -- The points along the path, their distances and bearings,
+            a list with the profiles of each variable (as get_path_profile
+            returns them), and the depths of the profiles.
+        """
         distances, times, lat, lon, bearings = geo.path_to_points(path, numpoints)
 
-        result, depth = self.get_profile(lat, lon, variable, starttime, endtime=endtime)
+        results = []
+        depth = None
+        for variable in variables:
+            result, depth = self.get_profile(
+                lat, lon, variable, starttime, endtime=endtime
+            )
+            results.append(result.transpose())
 
-        return numpy.array([lat, lon]), distances, result.transpose(), depth
+        return numpy.array([lat, lon]), distances, bearings, results, depth
 
     def get_profile_depths(self, latitude, longitude, time, variable, depths):
         profile, orig_dep = self.get_profile(latitude, longitude, variable, time)
@@ -192,3 +251,61 @@ class Model(metaclass=abc.ABCMeta):
 
     def get_timeseries_profile(self, latitude, longitude, starttime, endtime, variable):
         return self.get_profile(latitude, longitude, variable, starttime, endtime)
+
+    def get_timeseries_points(
+        self, latitudes, longitudes, depth, starttime, endtime, variable
+    ):
+        """Extracts the timeseries (or timeseries of profiles if depth is "all")
+        at each of the given stations.
+
+        Nearby stations share a single nearest grid point search, window read
+        and resampling (see get_timeseries_point and get_timeseries_profile)
+        instead of doing them once per station.
+
+        Returns:
+            tuple -- A masked array of shape (stations, time), or
+            (stations, time, depth) if depth is "all", and the depths of the
+            profiles if depth is "all", otherwise None.
+        """
+        latitudes = numpy.atleast_1d(numpy.asarray(latitudes, dtype=float))
+        longitudes = numpy.atleast_1d(numpy.asarray(longitudes, dtype=float))
+
+        time_slice = self.nc_data.make_time_slice(starttime, endtime)
+        num_times = time_slice.stop - time_slice.start
+
+        cells = numpy.floor(
+            numpy.stack([latitudes, (longitudes + 180.0) % 360.0]) / POINT_GROUP_SIZE
+        )
+        _, groups = numpy.unique(cells, axis=1, return_inverse=True)
+
+        result = None
+        depths = None
+        for group in numpy.unique(groups):
+            idx = numpy.flatnonzero(groups == group)
+
+            if depth == "all":
+                data, depths = self.get_timeseries_profile(
+                    latitudes[idx], longitudes[idx], starttime, endtime, variable
+                )
+                # (time, depth, stations) -> (stations, time, depth)
+                data = numpy.ma.reshape(data, (num_times, -1, idx.size))
+                data = numpy.ma.transpose(data, (2, 0, 1))
+                depths = numpy.atleast_2d(depths)[0]
+            else:
+                data = self.get_timeseries_point(
+                    latitudes[idx],
+                    longitudes[idx],
+                    depth,
+                    starttime,
+                    endtime,
+                    variable,
+                )
+                data = numpy.ma.reshape(data, (idx.size, num_times))
+
+            if result is None:
+                result = numpy.ma.masked_all(
+                    (latitudes.size,) + data.shape[1:], dtype=data.dtype
+                )
+            result[idx] = data
+
+        return result, depths
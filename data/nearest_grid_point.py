@@ -9,13 +9,29 @@ This module finds the indices of a point (or points) on a lat/lon grid that is
 closest to a specified lat/lon location.
 """
 
+import hashlib
+import os
+import threading
 from math import pi
+from pathlib import Path
 
 import numpy as np
+from cachetools import LRUCache
 from pykdtree.kdtree import KDTree
 
+from oceannavigator.dataset_config import DatasetConfig
+from oceannavigator.settings import get_settings
 
-def find_nearest_grid_point(lat, lon, latvar, lonvar, n=1):
+# In-memory grid indexes, keyed by dataset and lat/lon variable pair. Entries are
+# (KDTree, grid shape, triples) tuples and the cache is bounded by the size of the
+# triples array backing each tree.
+_grid_index_cache = LRUCache(
+    maxsize=512 * 1024 * 1024, getsizeof=lambda entry: entry[2].nbytes
+)
+_grid_index_lock = threading.Lock()
+
+
+def find_nearest_grid_point(lat, lon, latvar, lonvar, n=1, dataset_key=""):
     """Find the nearest grid point to a given lat/lon pair.
 
     Parameters
@@ -31,6 +47,10 @@ def find_nearest_grid_point(lat, lon, latvar, lonvar, n=1):
     n : int, optional
         Number of nearest grid points to return. Default is to return the
         single closest grid point.
+    dataset_key : str, optional
+        Key of the dataset the lat/lon variables belong to. When given, the
+        KD-tree built over the grid is cached (see ``get_grid_index``) so
+        subsequent lookups on the same grid skip tree construction.
 
     Returns
     -------
@@ -42,6 +62,47 @@ def find_nearest_grid_point(lat, lon, latvar, lonvar, n=1):
         - dist_sq: squared distance
     """
 
+    kdt, shape = get_grid_index(latvar, lonvar, dataset_key)
+    dist_sq, iy, ix = _find_index(lat, lon, kdt, shape, n)
+    # The results returned from _find_index are two-dimensional arrays (if
+    # n > 1) because it can handle the case of finding indices closest to
+    # multiple lat/lon locations (i.e., where lat and lon are arrays, not
+    # scalars). Currently, this function is intended only for a single lat/lon,
+    # so we redefine the results as one-dimensional arrays.
+    if n > 1:
+        return iy, ix, dist_sq
+    else:
+        return int(iy), int(ix), dist_sq
+
+
+def get_grid_index(latvar, lonvar, dataset_key=""):
+    """Returns the KD-tree and grid shape for a lat/lon mesh.
+
+    Without a dataset key the tree is built from scratch. Otherwise it is looked
+    up in an in-memory LRU cache keyed by (dataset_key, lat name, lon name, shape).
+    On a miss, the xyz triples the tree is built from are loaded as a memory-mapped
+    array from ``settings.grid_index_cache_dir`` (when configured), so a cold
+    worker only has to build the tree instead of recomputing the trigonometry.
+    Freshly computed triples are persisted there for the next worker. The files
+    are also keyed by the dataset's url and, when it is a local file, its
+    modification time and size. Loaded triples are spot checked against the
+    corners of the grid, so a remote dataset that is regridded without changing
+    shape doesn't keep using the old triples.
+
+    Parameters
+    ----------
+    latvar : xarray.DataArray
+        DataArray corresponding to latitude variable.
+    lonvar : xarray.DataArray
+        DataArray corresponding to longitude variable.
+    dataset_key : str, optional
+        Key of the dataset the lat/lon variables belong to.
+
+    Returns
+    -------
+    kdt, shape
+        The KDTree over the grid points and the (y, x) shape of the grid.
+    """
     # Note the use of the squeeze method: it removes single-dimensional entries
     # from the shape of an array. For example, in the GIOPS mesh file the
     # longitude of the U velocity points is defined as an array with shape
@@ -50,6 +111,51 @@ def find_nearest_grid_point(lat, lon, latvar, lonvar, n=1):
     latvar = latvar.squeeze()
     lonvar = lonvar.squeeze()
 
+    shape = _grid_shape(latvar, lonvar)
+
+    if not dataset_key:
+        return KDTree(_grid_triples(latvar, lonvar)), shape
+
+    key = (
+        dataset_key,
+        getattr(latvar, "name", None),
+        getattr(lonvar, "name", None),
+        shape,
+    )
+
+    with _grid_index_lock:
+        entry = _grid_index_cache.get(key)
+
+    if entry is None:
+        file_key = key + _grid_source(dataset_key)
+        triples = _load_grid_triples(file_key)
+        if triples is None or not _triples_match_grid(triples, latvar, lonvar):
+            triples = _grid_triples(latvar, lonvar)
+            _save_grid_triples(file_key, triples)
+
+        entry = (KDTree(triples), shape, triples)
+        with _grid_index_lock:
+            _grid_index_cache[key] = entry
+
+    return entry[0], entry[1]
+
+
+def clear_grid_index_cache():
+    """Empties the in-memory grid index cache. Files on disk are left alone."""
+    with _grid_index_lock:
+        _grid_index_cache.clear()
+
+
+def _grid_shape(latvar, lonvar):
+    if latvar.ndim == 1:
+        return (latvar.size, lonvar.size)
+    return tuple(latvar.shape)
+
+
+def _grid_triples(latvar, lonvar):
+    """Converts a lat/lon mesh into the cartesian xyz triples the KDTree is built
+    from.
+    """
     rad_factor = pi / 180.0
     latvals = latvar[:] * rad_factor
     lonvals = lonvar[:] * rad_factor
@@ -76,23 +182,79 @@ def find_nearest_grid_point(lat, lon, latvar, lonvar, n=1):
         # shape.
         shape = (slat.size, slon.size)
         slat = np.broadcast_to(slat.values[:, np.newaxis], shape)
-    else:
-        shape = latvar.shape
-    triples = np.array(
+    return np.array(
         [np.ravel(clat * clon), np.ravel(clat * slon), np.ravel(slat)]
     ).transpose()
 
-    kdt = KDTree(triples)
-    dist_sq, iy, ix = _find_index(lat, lon, kdt, shape, n)
-    # The results returned from _find_index are two-dimensional arrays (if
-    # n > 1) because it can handle the case of finding indices closest to
-    # multiple lat/lon locations (i.e., where lat and lon are arrays, not
-    # scalars). Currently, this function is intended only for a single lat/lon,
-    # so we redefine the results as one-dimensional arrays.
-    if n > 1:
-        return iy, ix, dist_sq
-    else:
-        return int(iy), int(ix), dist_sq
+
+def _grid_source(dataset_key):
+    """Returns the url of a dataset and, for local files, their modification
+    time and size. Never reads the grid itself.
+    """
+    try:
+        url = DatasetConfig(dataset_key).url
+    except (KeyError, OSError):
+        return ()
+
+    if isinstance(url, list):
+        url = url[0]
+
+    try:
+        st = os.stat(url)
+    except (OSError, TypeError):
+        return (url,)
+
+    return (url, st.st_mtime_ns, st.st_size)
+
+
+def _triples_match_grid(triples, latvar, lonvar):
+    """Checks the first and last persisted triples against the grid's corners."""
+    corners = [(0,) * latvar.ndim, (-1,) * latvar.ndim]
+    lat = np.radians([float(latvar[c]) for c in corners])
+    lon = np.radians([float(lonvar[c]) for c in corners])
+    expected = np.column_stack(
+        [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)]
+    )
+
+    return len(triples) > 0 and np.allclose(triples[[0, -1]], expected, atol=1e-5)
+
+
+def _grid_index_file(key):
+    cache_dir = get_settings().grid_index_cache_dir
+    if not cache_dir:
+        return None
+
+    hashed = hashlib.sha1(str(key).encode()).hexdigest()
+    return Path(cache_dir, f"{hashed}.npy")
+
+
+def _load_grid_triples(key):
+    f = _grid_index_file(key)
+    if f is None or not f.is_file():
+        return None
+
+    try:
+        return np.load(f, mmap_mode="r")
+    except (OSError, ValueError):
+        # Truncated or otherwise unreadable file, rebuild it.
+        return None
+
+
+def _save_grid_triples(key, triples):
+    f = _grid_index_file(key)
+    if f is None:
+        return
+
+    try:
+        f.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so concurrent workers never see a
+        # partially written index.
+        tmp = f.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as fh:
+            np.save(fh, triples)
+        os.replace(tmp, f)
+    except OSError:
+        pass
 
 
 def _find_index(lat0, lon0, kdt, shape, n=1):
@@ -2,13 +2,19 @@ from typing import Union
 
 import numpy as np
 import pyresample
+import xarray
 
 from data.calculated import CalculatedData
 from data.model import Model
 from data.nearest_grid_point import find_nearest_grid_point
 from data.netcdf_data import NetCDFData
+from data.resampling_plan import get_point_stencil
 from utils.errors import APIError
 
+# Largest number of (level, point, neighbour candidate) values interpolated at
+# once by Nemo.__stencil_resample.
+STENCIL_CHUNK_SIZE = 1 << 22
+
 
 class Nemo(Model):
     """Class used to access Nemo models."""
@@ -48,7 +54,9 @@ class Nemo(Model):
 
     def __bounding_box(self, lat, lon, latvar, lonvar, n=10):
         """Computes and returns points bounding lat, lon."""
-        y, x, d = find_nearest_grid_point(lat, lon, latvar, lonvar, n)
+        y, x, d = find_nearest_grid_point(
+            lat, lon, latvar, lonvar, n, dataset_key=self.nc_data.dataset_key
+        )
 
         def fix_limits(data, limit):
             mx = np.amax(data)
@@ -83,23 +91,10 @@ class Nemo(Model):
         )
 
         if len(data.shape) == 3:
-            output = []
             # multiple depths
-            for d in range(0, data.shape[2]):
-
-                masked_lon_in.mask = masked_lat_in.mask = (
-                    data[:, :, d].view(np.ma.MaskedArray).mask
-                )
-
-                input_def = pyresample.geometry.SwathDefinition(
-                    lons=masked_lon_in, lats=masked_lat_in, nprocs=8
-                )
-
-                output.append(
-                    self.nc_data.interpolate(input_def, output_def, data[:, :, d])
-                )
-
-            output = np.ma.array(output).transpose()
+            output = self.nc_data.interpolate_levels(
+                masked_lon_in, masked_lat_in, output_def, data
+            ).transpose()
 
         else:
             masked_lon_in.mask = masked_lat_in.mask = (
@@ -126,6 +121,58 @@ class Nemo(Model):
 
         return np.squeeze(output)
 
+    def __stencil_resample(self, lat_in, lon_in, lat_out, lon_out, var, index, y, x):
+        """Same as __resample(lat_in, lon_in, lat_out, lon_out, var[index + (y, x)])
+        for the (y, x) window of lat_in and lon_in, but only reads the grid
+        points within the radius of influence of the output points (see
+        data.resampling_plan.PointStencil), for every time and depth selected
+        by index.
+        """
+        lon_in, lat_in = pyresample.utils.check_and_wrap(
+            np.asarray(lon_in), np.asarray(lat_in)
+        )
+        stencil = get_point_stencil(
+            pyresample.geometry.SwathDefinition(lons=lon_in, lats=lat_in),
+            pyresample.geometry.SwathDefinition(
+                lons=np.ma.array(lon_out), lats=np.ma.array(lat_out)
+            ),
+            float(self.nc_data.radius),
+        )
+
+        rows, columns = np.unravel_index(stencil.columns, stencil.grid_shape)
+        stencil_index = (
+            xarray.DataArray(y.start + rows, dims="stencil"),
+            xarray.DataArray(x.start + columns, dims="stencil"),
+        )
+
+        # Read and interpolate a chunk of time steps at a time, so that long
+        # timeseries don't need all the neighbours of every point at once.
+        times = range(var.shape[0])[index[0]]
+        depths = [
+            len(range(n)[i])
+            for n, i in zip(var.shape[1:], index[1:])
+            if isinstance(i, slice)
+        ]
+        chunk = max(
+            STENCIL_CHUNK_SIZE // (int(np.prod(depths)) * stencil.index_array.size), 1
+        )
+
+        results = []
+        for start in range(0, len(times), chunk):
+            time_chunk = slice(
+                times[start], times[min(start + chunk, len(times)) - 1] + 1
+            )
+            data = var[(time_chunk,) + index[1:] + stencil_index].values
+            levels = data.shape[:-1]
+
+            result = self.nc_data.interpolate_stencil(
+                stencil, np.ma.masked_invalid(data.reshape((-1, stencil.columns.size)))
+            )
+            results.append(result.reshape(levels + (-1,)))
+
+        # (time, [depth,] points)
+        return np.squeeze(np.ma.concatenate(results))
+
     def __latlon_vars(self, variable):
         """Returns the xarray.DataArray for latitude and longitude variables in the dataset."""
         # Get DataArray
@@ -167,19 +214,31 @@ class Nemo(Model):
             latitude, longitude, latvar, lonvar, 10
         )
 
-        if not hasattr(latitude, "__len__"):
-            latitude = np.array([latitude])
-            longitude = np.array([longitude])
+        data = self.__raw_data(variable, depth, timestamp, miny, maxy, minx, maxx)
+
+        return (latvar[miny:maxy, minx:maxx], lonvar[miny:maxy, minx:maxx], data)
+
+    def get_raw_area(self, minlat, maxlat, minlon, maxlon, depth, timestamp, variable):
+        latvar, lonvar = self.__latlon_vars(variable)
+        miny, maxy, minx, maxx = super()._bounds_window(
+            latvar, lonvar, minlat, maxlat, minlon, maxlon
+        )
 
+        data = self.__raw_data(variable, depth, timestamp, miny, maxy, minx, maxx)
+
+        return (latvar[miny:maxy, minx:maxx], lonvar[miny:maxy, minx:maxx], data)
+
+    def __raw_data(self, variable, depth, timestamp, miny, maxy, minx, maxx):
+        """Reads the native grid cells of a variable in a (y, x) window."""
         var = self.nc_data.get_dataset_variable(variable)
 
         time = self.nc_data.timestamp_to_time_index(timestamp)
 
         if depth == "bottom":
             if hasattr(time, "__len__"):
-                d = var[time[0], :, miny:maxy, minx:maxx]
+                d = np.asarray(var[time[0], :, miny:maxy, minx:maxx])
             else:
-                d = var[time, :, miny:maxy, minx:maxx]
+                d = np.asarray(var[time, :, miny:maxy, minx:maxx])
 
             reshaped = np.ma.masked_invalid(d.reshape([d.shape[0], -1]))
 
@@ -188,7 +247,7 @@ class Nemo(Model):
             indices = edges[1, 1, :]
 
             if hasattr(time, "__len__"):
-                data_in = var[time, :, miny:maxy, minx:maxx]
+                data_in = np.asarray(var[time, :, miny:maxy, minx:maxx])
                 data_in = data_in.reshape([data_in.shape[0], data_in.shape[1], -1])
                 data = []
                 for i, t in enumerate(time):
@@ -205,7 +264,7 @@ class Nemo(Model):
             else:
                 data = var[time, miny:maxy, minx:maxx]
 
-        return (latvar[miny:maxy, minx:maxx], lonvar[miny:maxy, minx:maxx], data)
+        return data
 
     def get_point(
         self,
@@ -287,17 +346,31 @@ class Nemo(Model):
 
         else:
             if len(var.shape) == 4:
-                data = var[time_slice, int(depth), miny:maxy, minx:maxx]
+                index = (time_slice, int(depth))
             else:
-                data = var[time_slice, miny:maxy, minx:maxx]
-
-            res = self.__resample(
-                latvar[miny:maxy, minx:maxx],
-                lonvar[miny:maxy, minx:maxx],
-                latitude,
-                longitude,
-                data.values,
-            )
+                index = (time_slice,)
+
+            if isinstance(var, xarray.DataArray):
+                res = np.ma.transpose(
+                    self.__stencil_resample(
+                        latvar[miny:maxy, minx:maxx],
+                        lonvar[miny:maxy, minx:maxx],
+                        latitude,
+                        longitude,
+                        var,
+                        index,
+                        slice(miny, maxy),
+                        slice(minx, maxx),
+                    )
+                )
+            else:
+                res = self.__resample(
+                    latvar[miny:maxy, minx:maxx],
+                    lonvar[miny:maxy, minx:maxx],
+                    latitude,
+                    longitude,
+                    var[index + (slice(miny, maxy), slice(minx, maxx))].values,
+                )
 
             if return_depth:
                 depth_value = self.depths[int(depth)]
@@ -329,12 +402,24 @@ class Nemo(Model):
             latitude = np.array([latitude])
             longitude = np.array([longitude])
 
-        res = self.__resample(
-            latvar[miny:maxy, minx:maxx],
-            lonvar[miny:maxy, minx:maxx],
-            [latitude],
-            [longitude],
-            var[time_slice, :, miny:maxy, minx:maxx].values,
-        )
+        if isinstance(var, xarray.DataArray):
+            res = self.__stencil_resample(
+                latvar[miny:maxy, minx:maxx],
+                lonvar[miny:maxy, minx:maxx],
+                latitude,
+                longitude,
+                var,
+                (time_slice, slice(None)),
+                slice(miny, maxy),
+                slice(minx, maxx),
+            )
+        else:
+            res = self.__resample(
+                latvar[miny:maxy, minx:maxx],
+                lonvar[miny:maxy, minx:maxx],
+                [latitude],
+                [longitude],
+                var[time_slice, :, miny:maxy, minx:maxx].values,
+            )
 
         return res, np.squeeze([self.depths] * len(latitude))
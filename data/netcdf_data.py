@@ -1,4 +1,5 @@
 import datetime
+import itertools
 import uuid
 import warnings
 import zipfile
@@ -14,13 +15,15 @@ import pyresample
 import xarray
 import xarray.core.variable
 from babel.dates import format_date
-from cachetools import TTLCache
 
 import data.calculated
 import data.utils
 from data.data import Data
+from data.dataset_pool import get_dataset_pool
 from data.nearest_grid_point import find_nearest_grid_point
+from data.resampling_plan import get_resampling_plan
 from data.sqlite_database import SQLiteDatabase
+from data.timestamp_index import TimestampIndex, get_timestamp_index
 from data.variable import Variable
 from data.variable_list import VariableList
 from oceannavigator.dataset_config import DatasetConfig
@@ -36,15 +39,20 @@ class NetCDFData(Data):
         super().__init__(url)
         self.dataset: Union[xarray.Dataset, netCDF4.Dataset] = None
         self._variable_list: VariableList = None
-        self.__timestamp_cache: TTLCache = TTLCache(1, 3600)
+        self.__time_index: TimestampIndex = None
         self._grid_angle_file_url: str = kwargs.get("grid_angle_file_url", "")
         self._bathymetry_file_url: str = kwargs.get("bathymetry_file_url", "")
         self._time_variable: xarray.IndexVariable = None
         self._dataset_open: bool = False
+        self._pool_entry = None
         self._dataset_key: str = kwargs.get("dataset_key", "")
         self._dataset_config: DatasetConfig = (
             DatasetConfig(self._dataset_key) if self._dataset_key else None
         )
+        # Set by get_nc_file_list: the files holding each set of the requested
+        # variables that are stored together, and the dimension they're split on.
+        self._nc_file_groups: Union[List[List[str]], None] = None
+        self._nc_time_dim: Union[str, None] = None
         self._nc_files: Union[List, None] = self.get_nc_file_list(
             self._dataset_config, **kwargs
         )
@@ -53,6 +61,38 @@ class NetCDFData(Data):
         self.neighbours: int = kwargs.get("neighbours", 10)
 
     def __enter__(self):
+        self._pool_entry = get_dataset_pool().acquire(
+            self._pool_key(), self._open_dataset
+        )
+        self.dataset = self._pool_entry.dataset
+
+        self._dataset_open = True
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._dataset_open:
+            # The handle is shared with other requests through the dataset pool,
+            # which closes it once it is no longer used.
+            get_dataset_pool().release(self._pool_entry)
+            self._pool_entry = None
+            self._dataset_open = False
+
+    def _pool_key(self) -> tuple:
+        """Key identifying the opened dataset in the dataset pool. The file list
+        is resolved from the requested variables and timestamps, so requests for
+        the same timestep share the same handle.
+        """
+        return (
+            self._dataset_key,
+            tuple(self.url) if isinstance(self.url, list) else self.url,
+            tuple(self._nc_files) if self._nc_files is not None else None,
+            self._grid_angle_file_url,
+            self._bathymetry_file_url,
+            repr(getattr(self._dataset_config, "geo_ref", {})),
+        )
+
+    def _open_dataset(self) -> Union[xarray.Dataset, netCDF4.Dataset]:
         # Don't decode times since we do it anyways.
         decode_times = False
 
@@ -60,11 +100,9 @@ class NetCDFData(Data):
             if self._nc_files:
                 try:
                     if len(self._nc_files) > 1:
-                        self.dataset = xarray.open_mfdataset(
-                            self._nc_files, decode_times=decode_times
-                        )
+                        dataset = self.__open_nc_files(decode_times)
                     else:
-                        self.dataset = xarray.open_dataset(
+                        dataset = xarray.open_dataset(
                             self._nc_files[0],
                             decode_times=decode_times,
                         )
@@ -72,13 +110,12 @@ class NetCDFData(Data):
                     # xarray won't open FVCOM files due to dimension/coordinate/
                     # variable label duplication issue, so fall back to using
                     # netCDF4.Dataset()
-                    self.dataset = netCDF4.MFDataset(self._nc_files)
+                    dataset = netCDF4.MFDataset(self._nc_files)
             else:
-                self.dataset = xarray.Dataset()
+                dataset = xarray.Dataset()
 
         elif self.url.endswith(".zarr") if not isinstance(self.url, list) else False:
-            ds_zarr = xarray.open_zarr(self.url, decode_times=decode_times)
-            self.dataset = ds_zarr
+            dataset = xarray.open_zarr(self.url, decode_times=decode_times)
 
         else:
             try:
@@ -99,7 +136,7 @@ class NetCDFData(Data):
                     drop_variables=drop_variables,
                 )
                 fields = fields.merge(geo_refs)
-            self.dataset = fields
+            dataset = fields
 
         if self._grid_angle_file_url:
             angle_file = xarray.open_dataset(
@@ -109,22 +146,51 @@ class NetCDFData(Data):
                     self._dataset_config.lon_var_key,
                 ],
             )
-            self.dataset = self.dataset.merge(angle_file)
+            dataset = dataset.merge(angle_file)
             angle_file.close()
 
         if self._bathymetry_file_url:
             bathy_file = xarray.open_dataset(self._bathymetry_file_url)
-            self.dataset = self.dataset.merge(bathy_file)
+            dataset = dataset.merge(bathy_file)
             bathy_file.close()
 
-        self._dataset_open = True
+        return dataset
 
-        return self
+    def __open_nc_files(self, decode_times: bool) -> xarray.Dataset:
+        """Opens the indexed files as a single lazy dataset.
 
-    def __exit__(self, exc_type, exc_value, traceback):
-        if self._dataset_open:
-            self.dataset.close()
-            self._dataset_open = False
+        The files of a group hold consecutive time steps on the same grid, in
+        the order given by the index, so they're concatenated along time
+        without reading and aligning every file's coordinates (the coordinates
+        of the first file are used), and their metadata is read in parallel.
+        Only the data that is selected is ever read from each file. Groups of
+        files holding different variables are then merged.
+        """
+        if not self._nc_time_dim or not self._nc_file_groups:
+            return xarray.open_mfdataset(self._nc_files, decode_times=decode_times)
+
+        datasets = []
+        for group in self._nc_file_groups:
+            dataset = xarray.open_mfdataset(
+                group,
+                combine="nested",
+                concat_dim=self._nc_time_dim,
+                data_vars="minimal",
+                coords="minimal",
+                compat="override",
+                join="override",
+                parallel=len(group) > 1,
+                decode_times=decode_times,
+            )
+            # Variables stored in more than one group are only taken from the
+            # first one.
+            duplicates = [v for v in dataset.data_vars if any(v in d for d in datasets)]
+            datasets.append(dataset.drop_vars(duplicates))
+
+        if len(datasets) == 1:
+            return datasets[0]
+
+        return xarray.merge(datasets, combine_attrs="override")
 
     def __find_variable(self, candidates: list):
         """Finds a matching variable in the dataset given a list
@@ -183,9 +249,7 @@ class NetCDFData(Data):
             [int or ndarray] -- Time index(es).
         """
 
-        time_var = np.sort(self.time_variable.astype(int))
-
-        result = np.nonzero(np.isin(time_var, timestamp))[0].tolist()
+        result = self._time_index().index_of(timestamp).tolist()
 
         return result if len(result) > 1 else result[0]
 
@@ -316,30 +380,36 @@ class NetCDFData(Data):
         # calculated variables.
         if not entire_globe:
             # Find closest indices in dataset corresponding to each calculated point
+            lat_variable = self.get_dataset_variable(lat_var)
+            lon_variable = self.get_dataset_variable(lon_var)
             y0_index, x0_index, _ = find_nearest_grid_point(
                 bottom_left[0],
                 bottom_left[1],
-                self.get_dataset_variable(lat_var),
-                self.get_dataset_variable(lon_var),
+                lat_variable,
+                lon_variable,
+                dataset_key=self._dataset_key,
             )
             y1_index, x1_index, _ = find_nearest_grid_point(
-                            top_right[0],
-                            top_right[1],
-                            self.get_dataset_variable(lat_var),
-                            self.get_dataset_variable(lon_var),
-                        )
+                top_right[0],
+                top_right[1],
+                lat_variable,
+                lon_variable,
+                dataset_key=self._dataset_key,
+            )
             y2_index, x2_index, _ = find_nearest_grid_point(
-                            bottom_left[0],
-                            top_right[1],
-                            self.get_dataset_variable(lat_var),
-                            self.get_dataset_variable(lon_var),
-                        )
+                bottom_left[0],
+                top_right[1],
+                lat_variable,
+                lon_variable,
+                dataset_key=self._dataset_key,
+            )
             y3_index, x3_index, _ = find_nearest_grid_point(
-                            top_right[0],
-                            bottom_left[1],
-                            self.get_dataset_variable(lat_var),
-                            self.get_dataset_variable(lon_var),
-                        )
+                top_right[0],
+                bottom_left[1],
+                lat_variable,
+                lon_variable,
+                dataset_key=self._dataset_key,
+            )
 
             # Compute min/max for each slice in case the values are flipped
             # the netCDF4 module does not support unordered slices
@@ -401,14 +471,20 @@ class NetCDFData(Data):
                 subset = subset.drop_vars([variable])
 
         for variable in output_vars:
-            # if variable is a computed variable, overwrite it
+            # if variable is a computed variable, overwrite it. It's evaluated
+            # lazily, a chunk at a time, as the subset is written out.
             if isinstance(
                 self.get_dataset_variable(variable), data.calculated.CalculatedArray
             ):
                 subset = subset.assign(
                     **{
                         variable: self.get_dataset_variable(variable).isel(
-                            **{time_var: time_slice, y_coord: y_slice, x_coord: x_slice}
+                            lazy=True,
+                            **{
+                                time_var: time_slice,
+                                y_coord: y_slice,
+                                x_coord: x_slice,
+                            },
                         )
                     }
                 )
@@ -651,76 +727,148 @@ class NetCDFData(Data):
     def interpolate(self, input_def, output_def, data):
         """Interpolates data given input and output definitions
         and the selected interpolation algorithm.
+
+        The neighbour search between the two geometries is cached (see
+        data.resampling_plan), so only the weighting step is repeated when the
+        same grids are interpolated again for another time, depth or variable.
         """
 
+        resample_type, neighbours, weight = self._interpolation_method()
+
         # Ignore pyresample warnings
         with warnings.catch_warnings():
             warnings.simplefilter("ignore", RuntimeWarning)
             warnings.simplefilter("ignore", UserWarning)
 
-            # Interpolation with gaussian weighting
-            if self.interp == "gaussian":
-                return pyresample.kd_tree.resample_gauss(
-                    input_def,
-                    data,
-                    output_def,
-                    radius_of_influence=float(self.radius),
-                    sigmas=self.radius / 2,
-                    fill_value=None,
-                )
+            plan = get_resampling_plan(
+                input_def, output_def, float(self.radius), neighbours
+            )
+            result = plan.apply(
+                resample_type, data, weight_funcs=weight, fill_value=None
+            )
 
-            # Bilinear weighting
-            elif self.interp == "bilinear":
-                """
-                Weight function used to determine the effect of surrounding points
-                on a given point
-                """
-
-                def weight(r):
-                    r = np.clip(r, np.finfo(r.dtype).eps, np.finfo(r.dtype).max)
-                    return 1.0 / r
-
-                return pyresample.kd_tree.resample_custom(
-                    input_def,
-                    data,
-                    output_def,
-                    radius_of_influence=float(self.radius),
-                    neighbours=self.neighbours,
-                    fill_value=None,
-                    weight_funcs=weight,
-                )
+        if resample_type == "nn":
+            return np.ma.asarray(result)
+        return result
 
-            # Inverse-square weighting
-            elif self.interp == "inverse":
-                """
-                Weight function used to determine the effect of surrounding points
-                on a given point
-                """
-
-                def weight(r):
-                    r = np.clip(r, np.finfo(r.dtype).eps, np.finfo(r.dtype).max)
-                    return 1.0 / r**2
-
-                return pyresample.kd_tree.resample_custom(
-                    input_def,
-                    data,
-                    output_def,
-                    radius_of_influence=float(self.radius),
-                    neighbours=self.neighbours,
-                    fill_value=None,
-                    weight_funcs=weight,
-                )
+    def interpolate_levels(self, lons, lats, output_def, data):
+        """Interpolates a stack of levels (depths and/or times) sharing one grid.
 
-            # Nearest-neighbour interpolation (junk)
-            elif self.interp == "nearest":
-                return np.ma.asarray(
-                    pyresample.kd_tree.resample_nearest(
-                        input_def,
-                        data,
-                        output_def,
-                        radius_of_influence=float(self.radius),
-                    )
-                )
+        Equivalent to calling interpolate once per level with the level's mask
+        applied to the input lat/lon, but does a single neighbour search over
+        the points that are valid on any level and drops masked neighbours per
+        level by renormalizing the weights. Levels where that could give a
+        different answer (an output point whose full neighbour list contains a
+        masked point) are interpolated on their own.
+
+        Arguments:
+            * lons, lats -- 2D input grid coordinates.
+            * output_def -- pyresample.geometry.SwathDefinition of the output.
+            * data -- Masked array of shape lons.shape + (levels,).
+
+        Returns:
+            Masked array of shape (levels,) + output_def.shape.
+        """
+
+        resample_type, neighbours, weight = self._interpolation_method()
+
+        levels = data.shape[-1]
+        data = np.ma.asarray(data).reshape((-1, levels))
+        mask = np.ma.getmaskarray(data)
+
+        if mask.all():
+            return np.ma.masked_all((levels,) + output_def.shape, dtype=data.dtype)
+
+        lons = np.ma.getdata(lons)
+        lats = np.ma.getdata(lats)
+
+        def level_def(level_mask):
+            level_mask = level_mask.reshape(lons.shape)
+            return pyresample.geometry.SwathDefinition(
+                lons=np.ma.array(lons, mask=level_mask),
+                lats=np.ma.array(lats, mask=level_mask),
+            )
+
+        # Ignore pyresample warnings
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            warnings.simplefilter("ignore", UserWarning)
+
+            # Search over every point that is valid on at least one level
+            input_def = level_def(mask.all(axis=1))
+            plan = get_resampling_plan(
+                input_def, output_def, float(self.radius), neighbours
+            )
+            result, exact = plan.apply_levels(resample_type, data, weight_funcs=weight)
+
+        for level in np.flatnonzero(~exact):
+            result[level] = self.interpolate(
+                level_def(mask[:, level]), output_def, data[:, level]
+            )
+
+        return result
+
+    def interpolate_stencil(self, stencil, data):
+        """Interpolates data read at the columns of a PointStencil (see
+        data.resampling_plan), giving the same result as interpolate or
+        interpolate_levels would over the whole grid.
+
+        Arguments:
+            * stencil -- data.resampling_plan.PointStencil
+            * data -- Masked array of shape (levels, len(stencil.columns)).
+
+        Returns:
+            Masked array of shape (levels, target points).
+        """
+
+        resample_type, neighbours, weight = self._interpolation_method()
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return stencil.apply(resample_type, neighbours, data, weight_funcs=weight)
+
+    def _interpolation_method(self) -> tuple:
+        """Returns the pyresample resample type, number of neighbours and weight
+        function for the selected interpolation algorithm.
+        """
+
+        # Gaussian weighting
+        if self.interp == "gaussian":
+            sigma = float(self.radius / 2)
+
+            def weight(r):
+                return np.exp(-(r**2) / sigma**2)
+
+            return "custom", 8, weight
+
+        # Bilinear weighting
+        if self.interp == "bilinear":
+            """
+            Weight function used to determine the effect of surrounding points
+            on a given point
+            """
+
+            def weight(r):
+                r = np.clip(r, np.finfo(r.dtype).eps, np.finfo(r.dtype).max)
+                return 1.0 / r
+
+            return "custom", self.neighbours, weight
+
+        # Inverse-square weighting
+        if self.interp == "inverse":
+            """
+            Weight function used to determine the effect of surrounding points
+            on a given point
+            """
+
+            def weight(r):
+                r = np.clip(r, np.finfo(r.dtype).eps, np.finfo(r.dtype).max)
+                return 1.0 / r**2
+
+            return "custom", self.neighbours, weight
+
+        # Nearest-neighbour interpolation (junk)
+        if self.interp == "nearest":
+            return "nn", 1, None
 
         raise ValueError(f"Unknown interpolation method {self.interp}.")
 
@@ -809,6 +957,13 @@ class NetCDFData(Data):
 
         return y_dim, x_dim
 
+    @property
+    def dataset_key(self) -> str:
+        """
+        Key of the dataset in datasetconfig.json (empty if opened from a URL)
+        """
+        return self._dataset_key
+
     def get_dataset_variable(self, key: str) -> xarray.DataArray:
         """
         Returns the xarray.DataArray for a given variable key
@@ -955,19 +1110,23 @@ class NetCDFData(Data):
         Note: to get all timestamp values from a dataset,
         you must query the SQLiteDatabase.
         """
-        # If the timestamp cache is empty
-        if self.__timestamp_cache.get("timestamps") is None:
-            var = self.time_variable
-
-            # Convert timestamps to UTC
-            time_list = data.utils.time_index_to_datetime(
-                np.sort(var), var.attrs["units"]
-            )
-            timestamps = np.array(time_list)
-            timestamps.setflags(write=False)  # Make immutable
-            self.__timestamp_cache["timestamps"] = timestamps
+        # Converted to UTC once per opened dataset; the array is immutable.
+        return self._time_index().to_datetime()
+
+    def _time_index(self) -> TimestampIndex:
+        # The index of the time variable of the opened files, shared with the
+        # other users of the same pooled dataset.
+        if self.__time_index is None:
+            entry = self._pool_entry
+            if entry is not None and entry.time_index is not None:
+                self.__time_index = entry.time_index
+            else:
+                var = self.time_variable
+                self.__time_index = TimestampIndex(var.values, var.attrs["units"])
+                if entry is not None:
+                    entry.time_index = self.__time_index
 
-        return self.__timestamp_cache.get("timestamps")
+        return self.__time_index
 
     def get_nc_file_list(
         self, datasetconfig: DatasetConfig, **kwargs: dict
@@ -997,7 +1156,7 @@ class NetCDFData(Data):
                 return []
 
             timestamp = self.__get_requested_timestamps(
-                db,
+                self.url,
                 variables_to_load[0],
                 kwargs.get("timestamp", -1),
                 kwargs.get("endtime"),
@@ -1007,14 +1166,27 @@ class NetCDFData(Data):
             if not timestamp:
                 raise RuntimeError("Error finding timestamp(s) in database.")
 
-            file_list = db.get_netcdf_files(timestamp, variables_to_load)
-            if len(file_list) > 50:
-                file_list = np.array(file_list)
-                idx = np.linspace(0, file_list.size - 1, 50, dtype=int)
-                file_list = file_list[idx].tolist()
+            # Variables stored in the same files share a group.
+            groups = []
+            for variable in sorted(variables_to_load):
+                files = db.get_netcdf_files(timestamp, variable)
+                if files and files not in groups:
+                    groups.append(files)
+
+            file_list = list(dict.fromkeys(itertools.chain(*groups)))
             if not file_list:
                 raise RuntimeError("NetCDF file list is empty.")
 
+            self._nc_file_groups = groups
+            self._nc_time_dim = next(
+                (
+                    dim
+                    for dim in db.get_variable_dims(variables_to_load[0])
+                    if dim in ("time", "time_counter")
+                ),
+                None,
+            )
+
             return file_list
 
     def __get_variables_to_load(
@@ -1036,20 +1208,20 @@ class NetCDFData(Data):
         return list(variables_to_load)
 
     def __get_requested_timestamps(
-        self, db: SQLiteDatabase, variable: str, timestamp, endtime, nearest_timestamp
+        self, url: str, variable: str, timestamp, endtime, nearest_timestamp
     ) -> List[int]:
         # We assume timestamp and/or endtime have been converted
         # to the same time units as the requested dataset. Otherwise
         # this won't work.
-        if nearest_timestamp:
-            all_timestamps = db.get_timestamps(variable)
+        all_timestamps = get_timestamp_index(url, variable)
 
-            start = data.utils.find_le(all_timestamps, timestamp)
+        if nearest_timestamp:
+            start = all_timestamps.find_le(timestamp)
             if not endtime:
-                return [start]
+                return [start.item()]
 
-            end = data.utils.find_le(all_timestamps, endtime)
-            return db.get_timestamp_range(start, end, variable)
+            end = all_timestamps.find_le(endtime)
+            return all_timestamps.between(start, end).tolist()
 
         if timestamp > 0 and endtime is None:
             # We've received a specific timestamp (e.g. 21100345)
@@ -1058,24 +1230,22 @@ class NetCDFData(Data):
             return timestamp
 
         if timestamp < 0 and endtime is None:
-            all_timestamps = db.get_timestamps(variable)
-            return [all_timestamps[timestamp]]
+            return [all_timestamps[timestamp].item()]
 
         if timestamp > 0 and endtime > 0:
             # We've received a request for a time range
             # with specific timestamps given
-            return db.get_timestamp_range(timestamp, endtime, variable)
+            return all_timestamps.between(timestamp, endtime).tolist()
 
         # Otherwise assume negative values are indices into timestamp list
-        all_timestamps = db.get_timestamps(variable)
         len_timestamps = len(all_timestamps)
         if timestamp < 0 and endtime > 0:
             idx = data.utils.roll_time(timestamp, len_timestamps)
-            return db.get_timestamp_range(all_timestamps[idx], endtime, variable)
+            return all_timestamps.between(all_timestamps[idx], endtime).tolist()
 
         if timestamp > 0 and endtime < 0:
             idx = data.utils.roll_time(endtime, len_timestamps)
-            return db.get_timestamp_range(timestamp, all_timestamps[idx], variable)
+            return all_timestamps.between(timestamp, all_timestamps[idx]).tolist()
 
     def _construct_remote_ds(self, urls: list, decode_times: bool) -> xarray.Dataset:
         """Constructs dataset from multiple remote urls. This avoids memory errors due
@@ -1,9 +1,34 @@
+import numpy as np
 from sqlalchemy import Column, DateTime, Float, Integer, String
 from sqlalchemy.orm import relationship
 from sqlalchemy.schema import ForeignKey, Index
 
 from data.observational import Base
 
+# Stations are binned into CELL_SIZE degree cells, numbered row by row from
+# (-90, -180), so that the stations in a bounding box are a few ranges of the
+# indexed cell column.
+CELL_SIZE = 0.25
+CELL_ROWS = int(180 / CELL_SIZE)
+CELL_COLUMNS = int(360 / CELL_SIZE)
+
+
+def cell_row(latitude):
+    return np.clip(np.floor_divide(np.add(latitude, 90), CELL_SIZE), 0, CELL_ROWS - 1)
+
+
+def cell_column(longitude):
+    return np.clip(
+        np.floor_divide(np.add(longitude, 180), CELL_SIZE), 0, CELL_COLUMNS - 1
+    )
+
+
+def station_cell(latitude, longitude):
+    """Returns the cell number(s) of the given latitude(s) and longitude(s)."""
+    cell = (cell_row(latitude) * CELL_COLUMNS + cell_column(longitude)).astype(np.int64)
+
+    return int(cell) if cell.ndim == 0 else cell
+
 
 class Station(Base):
     __tablename__ = "stations"
@@ -25,6 +50,7 @@ class Station(Base):
     time = Column(DateTime, nullable=False)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
+    cell = Column(Integer, nullable=True)
 
     def __init__(self, **kwargs):
         super(Station, self).__init__(**kwargs)
@@ -34,6 +60,8 @@ class Station(Base):
         if self.longitude > 180 or self.longitude < -180:
             raise ValueError(f"Longitude {self.longitude} out of range (-180,180)")
 
+        self.cell = station_cell(self.latitude, self.longitude)
+
     def __repr__(self):
         return (
             f"Station(id={self.id}, name={self.name}, time={self.time}, "
@@ -43,3 +71,4 @@ class Station(Base):
 
 
 Index("idx_t_lat_lon", Station.time, Station.latitude, Station.longitude)
+Index("idx_stations_cell_time", Station.cell, Station.time)
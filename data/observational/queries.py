@@ -1,15 +1,35 @@
 import datetime
 import math
+import weakref
 from enum import Enum
 from typing import Callable, Dict, List, Optional, Tuple
 
-from sqlalchemy import and_, func
+import numpy as np
+from sqlalchemy import and_, func, or_
 from sqlalchemy.orm import Session, joinedload
 
+from oceannavigator.log import log
+
 from . import DataType, Platform, PlatformMetadata, Sample, Station, engine
+from .orm.station import CELL_COLUMNS, cell_column, cell_row
 
 EARTH_RADIUS = 6371.01
 
+# Bounding boxes that span more cell ranges than this are scanned as a single
+# range from their first to their last cell.
+MAX_CELL_RANGES = 32
+
+# Databases (engines) known to have a Station.cell for every station, and the
+# ones that have been reported as missing some.
+_indexed_databases: weakref.WeakSet = weakref.WeakSet()
+_unindexed_databases: weakref.WeakSet = weakref.WeakSet()
+
+# Thinned stations are spread over a grid whose cell size is refined (at most
+# THINNING_ITERATIONS times) until at least THINNING_TARGET * limit cells are
+# occupied.
+THINNING_ITERATIONS = 8
+THINNING_TARGET = 0.8
+
 
 def __db_funcs() -> Dict[str, Callable]:
     """
@@ -85,31 +105,22 @@ def get_platforms(
     )
 
     if latitude and longitude and radius:
-        radDist = radius / EARTH_RADIUS
-        radLat = math.radians(latitude)
-        radLon = math.radians(longitude)
-
-        if engine.dialect.name == "sqlite":
-            rc = engine.raw_connection()
-
-            # SQLite doesn't do trig, so we'll add the functions via Python
-            # It won't be as quick as doing the comparison in the database, but
-            # SQLite should only be used for testing purposes
-            rc.create_function("sin", 1, math.sin)
-            rc.create_function("cos", 1, math.cos)
-            rc.create_function("radians", 1, math.radians)
-            rc.create_function("acos", 1, math.acos)
+        # The bounding box is an index range scan; the exact distances of the
+        # stations in it are checked here rather than per row in SQL.
+        rows = query.with_entities(
+            Platform.id, Station.latitude, Station.longitude
+        ).all()
+        ids = np.array([r[0] for r in rows], dtype=np.int64)
+        inside = __within_radius(
+            latitude,
+            longitude,
+            radius,
+            [r[1] for r in rows],
+            [r[2] for r in rows],
+        )
 
-        query = query.filter(
-            func.acos(
-                (math.sin(radLat) * func.sin(func.radians(Station.latitude)))
-                + (
-                    math.cos(radLat)
-                    * func.cos(func.radians(Station.latitude))
-                    * func.cos(func.radians(Station.longitude) - radLon)
-                )
-            )
-            <= radDist
+        query = session.query(Platform).filter(
+            Platform.id.in_(np.unique(ids[inside]).tolist())
         )
 
     return query.distinct().all()
@@ -290,17 +301,33 @@ def __add_station_filters(
     starttime=None,
     endtime=None,
 ):
-    if minlat:
+    if None not in (minlat, maxlat, minlon, maxlon) and __cells_indexed(query.session):
+        query = query.filter(
+            or_(
+                *[
+                    Station.cell.between(start, end)
+                    for start, end in __cell_ranges(minlat, maxlat, minlon, maxlon)
+                ]
+            )
+        )
+
+    if minlat is not None:
         query = query.filter(Station.latitude >= minlat)
 
-    if maxlat:
+    if maxlat is not None:
         query = query.filter(Station.latitude <= maxlat)
 
-    if minlon:
-        query = query.filter(Station.longitude >= minlon)
+    if minlon is not None and maxlon is not None and minlon > maxlon:
+        # The box crosses the antimeridian.
+        query = query.filter(
+            or_(Station.longitude >= minlon, Station.longitude <= maxlon)
+        )
+    else:
+        if minlon is not None:
+            query = query.filter(Station.longitude >= minlon)
 
-    if maxlon:
-        query = query.filter(Station.longitude <= maxlon)
+        if maxlon is not None:
+            query = query.filter(Station.longitude <= maxlon)
 
     if starttime:
         query = query.filter(Station.time >= starttime)
@@ -311,6 +338,77 @@ def __add_station_filters(
     return query
 
 
+def __cells_indexed(session: Session) -> bool:
+    """
+    Whether every station in the database has its Station.cell. Stations
+    imported before the column existed have none until
+    scripts/index_station_cells.py has been run, and until then bounding boxes
+    are only filtered on latitude and longitude.
+    """
+    bind = session.get_bind()
+    if bind in _indexed_databases:
+        return True
+
+    if session.query(Station.id).filter(Station.cell.is_(None)).first() is not None:
+        if bind not in _unindexed_databases:
+            _unindexed_databases.add(bind)
+            log().warning(
+                "Some stations have no cell, bounding box queries will be slow "
+                "until scripts/index_station_cells.py has been run."
+            )
+        return False
+
+    # Stations are always created with their cell from now on.
+    _indexed_databases.add(bind)
+    return True
+
+
+def __cell_ranges(minlat, maxlat, minlon, maxlon) -> List[Tuple[int, int]]:
+    """
+    Returns the (inclusive) ranges of Station.cell covering the bounding box.
+    Boxes with minlon > maxlon cross the antimeridian.
+    """
+    if minlon <= maxlon:
+        columns = [(int(cell_column(minlon)), int(cell_column(maxlon)))]
+    else:
+        columns = [
+            (0, int(cell_column(maxlon))),
+            (int(cell_column(minlon)), CELL_COLUMNS - 1),
+        ]
+
+    ranges = []
+    for row in range(int(cell_row(minlat)), int(cell_row(maxlat)) + 1):
+        for first, last in columns:
+            start, end = row * CELL_COLUMNS + first, row * CELL_COLUMNS + last
+            if ranges and ranges[-1][1] + 1 >= start:
+                # Adjacent to the previous range, e.g. full rows.
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+
+    if len(ranges) > MAX_CELL_RANGES:
+        return [(ranges[0][0], ranges[-1][1])]
+
+    return ranges
+
+
+def __within_radius(latitude, longitude, radius, latitudes, longitudes) -> np.ndarray:
+    """
+    Returns a boolean mask of the latitudes and longitudes that are within
+    radius (km) of latitude, longitude along a great circle.
+    """
+    radLat = math.radians(latitude)
+    radLon = math.radians(longitude)
+    latitudes = np.radians(np.asarray(latitudes, dtype=np.float64))
+    longitudes = np.radians(np.asarray(longitudes, dtype=np.float64))
+
+    cos_distance = np.sin(radLat) * np.sin(latitudes) + np.cos(radLat) * np.cos(
+        latitudes
+    ) * np.cos(longitudes - radLon)
+
+    return np.arccos(np.clip(cos_distance, -1, 1)) <= radius / EARTH_RADIUS
+
+
 def __build_station_query(
     session=None,
     variable=None,
@@ -329,7 +427,12 @@ def __build_station_query(
     query = session.query(Station)
 
     # Use index hint
-    query = query.with_hint(Station, "USE INDEX (idx_stations_time)")
+    if None not in (minlat, maxlat, minlon, maxlon):
+        query = query.with_hint(
+            Station, "USE INDEX (idx_stations_time, idx_stations_cell_time)"
+        )
+    else:
+        query = query.with_hint(Station, "USE INDEX (idx_stations_time)")
 
     # Joins to Sample
     if variable is not None or mindepth is not None or maxdepth is not None:
@@ -337,7 +440,9 @@ def __build_station_query(
             query.join(Sample), variable=variable, mindepth=mindepth, maxdepth=maxdepth
         )
 
-    if minlat or maxlat or minlon or maxlon or starttime or endtime:
+    if any(v is not None for v in (minlat, maxlat, minlon, maxlon)) or (
+        starttime or endtime
+    ):
         query = __add_station_filters(
             query,
             minlat=minlat,
@@ -418,12 +523,12 @@ def __get_bounding_latlon(lat, lon, distance):
         maxLon = math.radians(lon) + deltaLon
         if maxLon > math.pi:
             maxLon -= 2.0 * math.pi
-        else:
-            # a pole is within the distance
-            minLat = max(minLat, -math.pi / 2.0)
-            maxLat = min(maxLat, math.pi / 2.0)
-            minLon = -math.pi
-            maxLon = math.pi
+    else:
+        # a pole is within the distance
+        minLat = max(minLat, -math.pi / 2.0)
+        maxLat = min(maxLat, math.pi / 2.0)
+        minLon = -math.pi
+        maxLon = math.pi
 
     return (
         math.degrees(minLat),
@@ -468,34 +573,193 @@ def get_stations_radius(
         meta_value=meta_value,
     )
 
-    radDist = radius / EARTH_RADIUS
-    radLat = math.radians(latitude)
-    radLon = math.radians(longitude)
+    stations = query.options(joinedload(Station.platform)).all()
+    inside = __within_radius(
+        latitude,
+        longitude,
+        radius,
+        [s.latitude for s in stations],
+        [s.longitude for s in stations],
+    )
+
+    return [s for s, keep in zip(stations, inside) if keep]
+
 
-    if engine.dialect.name == "sqlite":
-        rc = engine.raw_connection()
-
-        # SQLite doesn't do trig, so we'll add the functions via Python
-        # It won't be as quick as doing the comparison in the database, but
-        # SQLite should only be used for testing purposes
-        rc.create_function("sin", 1, math.sin)
-        rc.create_function("cos", 1, math.cos)
-        rc.create_function("radians", 1, math.radians)
-        rc.create_function("acos", 1, math.acos)
-
-    query = query.filter(
-        func.acos(
-            (math.sin(radLat) * func.sin(func.radians(Station.latitude)))
-            + (
-                math.cos(radLat)
-                * func.cos(func.radians(Station.latitude))
-                * func.cos(func.radians(Station.longitude) - radLon)
+def get_station_points(
+    session: Session,
+    limit: Optional[int] = None,
+    variable: Optional[str] = None,
+    mindepth: Optional[float] = None,
+    maxdepth: Optional[float] = None,
+    minlat: Optional[float] = None,
+    maxlat: Optional[float] = None,
+    minlon: Optional[float] = None,
+    maxlon: Optional[float] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    radius: Optional[float] = None,
+    starttime: Optional[datetime.datetime] = None,
+    endtime: Optional[datetime.datetime] = None,
+    platform_types: Optional[List[Platform.Type]] = None,
+    meta_key: Optional[str] = None,
+    meta_value: Optional[str] = None,
+) -> List[Tuple[int, Optional[str], float, float, Platform.Type]]:
+    """
+    Queries for the id, name, latitude, longitude and platform type of the
+    stations matching the optional query filters, within radius (km) of
+    latitude, longitude if given.
+
+    If more than `limit` stations match, they are thinned in the database to
+    one station per occupied cell of a lat/lon grid, with the cell size chosen
+    so that close to `limit` cells are occupied.
+    """
+    if latitude is not None and longitude is not None and radius:
+        minlat, maxlat, minlon, maxlon = __get_bounding_latlon(
+            latitude, longitude, radius
+        )
+
+    query = __build_station_query(
+        session=session,
+        variable=variable,
+        mindepth=mindepth,
+        maxdepth=maxdepth,
+        minlat=minlat,
+        maxlat=maxlat,
+        minlon=minlon,
+        maxlon=maxlon,
+        starttime=starttime,
+        endtime=endtime,
+        platform_types=platform_types,
+        meta_key=meta_key,
+        meta_value=meta_value,
+    )
+    if not platform_types:
+        query = query.join(Platform)
+
+    columns = (
+        Station.id,
+        Station.name,
+        Station.latitude,
+        Station.longitude,
+        Platform.type,
+    )
+    points = query.with_entities(*columns)
+    if limit:
+        points = points.limit(limit + 1)
+    rows = points.all()
+
+    if limit and len(rows) > limit:
+        # The grid covers the stations' extent, which may be much smaller than
+        # the query's (or the globe if no area was given).
+        extent = query.with_entities(
+            func.min(Station.latitude),
+            func.max(Station.latitude),
+            func.min(Station.longitude),
+            func.max(Station.longitude),
+        ).one()
+        thinned = __thin_stations(query, extent, limit)
+        rows = (
+            session.query(*columns)
+            .join(Platform, Station.platform_id == Platform.id)
+            .join(thinned, Station.id == thinned.c.id)
+            .all()
+        )
+
+    if latitude is not None and longitude is not None and radius:
+        inside = __within_radius(
+            latitude,
+            longitude,
+            radius,
+            [r[2] for r in rows],
+            [r[3] for r in rows],
+        )
+        rows = [r for r, keep in zip(rows, inside) if keep]
+
+    return rows
+
+
+def __thin_stations(query, extent, limit):
+    """
+    Returns a subquery of the ids of at most `limit` of the stations matched
+    by query, spread over their extent (minlat, maxlat, minlon, maxlon).
+
+    Stations are grouped by the cells of a grid, starting from one that has at
+    most `limit` cells over the extent. Clustered or linear stations (e.g. a
+    glider track) only occupy a few of them, so the cells are made smaller
+    until about `limit` of them are occupied. If that fails (e.g. many
+    stations at the same position) every n-th station id is kept instead.
+    """
+
+    def cells(size):
+        return (
+            func.floor(Station.latitude / size),
+            func.floor(Station.longitude / size),
+        )
+
+    size = __thinning_cell_size(*extent, limit)
+    best = None  # (size, occupied cells) of the finest grid with <= limit
+    coarsest_over = None  # the coarsest grid with more than limit
+    previous = None
+    dimension = 2.0
+    for _ in range(THINNING_ITERATIONS):
+        count = query.with_entities(*cells(size)).distinct().count()
+        if count <= limit:
+            if best is None or count > best[1]:
+                best = (size, count)
+            if count >= THINNING_TARGET * limit:
+                break
+        elif coarsest_over is None or size > coarsest_over:
+            coarsest_over = size
+
+        # The number of occupied cells grows like size ** -dimension, where
+        # the dimension is 2 for stations spread over an area and 1 for a line.
+        if previous is not None and 0 < previous[1] != count:
+            dimension = np.clip(
+                math.log(count / previous[1]) / math.log(previous[0] / size), 0.5, 2
             )
+        previous = (size, count)
+
+        next_size = size * (count / (THINNING_TARGET * limit)) ** (1 / dimension)
+        if best is not None and next_size >= best[0]:
+            next_size = math.sqrt(size * best[0])
+        if coarsest_over is not None and next_size <= coarsest_over:
+            next_size = math.sqrt(size * coarsest_over)
+        size = next_size
+
+    if best is not None and best[1] >= limit / 2:
+        return (
+            query.with_entities(func.min(Station.id).label("id"))
+            .group_by(*cells(best[0]))
+            .limit(limit)
+            .subquery()
         )
-        <= radDist
+
+    step = math.ceil(query.count() / limit)
+    return (
+        query.with_entities(Station.id.label("id"))
+        .filter(Station.id % step == 0)
+        .limit(limit)
+        .subquery()
     )
 
-    return query.options(joinedload("platform")).all()
+
+def __thinning_cell_size(minlat, maxlat, minlon, maxlon, limit) -> float:
+    # Size (in degrees) of the square cells of a grid over the area with at
+    # most `limit` cells, counting a partial cell at each edge:
+    # (height / size + 2) * (width / size + 2) = limit
+    height, width = maxlat - minlat, maxlon - minlon
+    if limit <= 4 or height + width <= 0:
+        return 360.0
+
+    if height * width == 0:
+        inverse = (limit - 4) / (2 * (height + width))
+    else:
+        inverse = (
+            -(height + width)
+            + math.sqrt((height + width) ** 2 + height * width * (limit - 4))
+        ) / (height * width)
+
+    return 1 / inverse
 
 
 def get_meta_keys(session: Session, platform_types: List[str]) -> List[str]:
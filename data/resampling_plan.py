@@ -0,0 +1,357 @@
+"""
+Resampling Plans
+================
+
+Swath-to-swath resampling in pyresample happens in two steps: a KD-tree query
+that finds the neighbours (and their distances) of every output point, and a
+cheap gather-and-weight step applying those neighbours to the data. The first
+step only depends on the geometry, so it is the same for every timestamp, depth
+and variable drawn on the same tile or map. This module caches it.
+"""
+
+import hashlib
+import threading
+
+import numpy as np
+import pyresample
+from cachetools import LRUCache
+
+# Neighbour info keyed by (source grid digest, target grid digest, radius,
+# neighbours). The cache is bounded by the size of the index and distance arrays.
+_plan_cache = LRUCache(maxsize=256 * 1024 * 1024, getsizeof=lambda plan: plan.nbytes)
+_plan_lock = threading.Lock()
+
+
+class ResamplingPlan:
+    """Neighbour info for a source/target geometry pair, as returned by
+    pyresample.kd_tree.get_neighbour_info.
+    """
+
+    def __init__(
+        self,
+        output_shape,
+        valid_input_index,
+        valid_output_index,
+        index_array,
+        distance_array,
+    ) -> None:
+        self.output_shape = output_shape
+        self.valid_input_index = valid_input_index
+        self.valid_output_index = valid_output_index
+        self.index_array = index_array
+        self.distance_array = distance_array
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            np.asarray(a).nbytes
+            for a in (
+                self.valid_input_index,
+                self.valid_output_index,
+                self.index_array,
+                self.distance_array,
+            )
+        )
+
+    def apply(self, resample_type, data, weight_funcs=None, fill_value=None):
+        """Resamples data defined on the plan's source grid onto its target grid.
+
+        Arguments are the same as pyresample.kd_tree.get_sample_from_neighbour_info.
+        """
+        return pyresample.kd_tree.get_sample_from_neighbour_info(
+            resample_type,
+            self.output_shape,
+            data,
+            self.valid_input_index,
+            self.valid_output_index,
+            self.index_array,
+            distance_array=self.distance_array,
+            weight_funcs=weight_funcs,
+            fill_value=fill_value,
+        )
+
+    def apply_levels(self, resample_type, data, weight_funcs=None):
+        """Resamples a stack of levels that share the plan's source grid but
+        each have their own mask.
+
+        Masked neighbours get zero weight and the remaining weights are
+        renormalized, which is what resampling each level with its mask folded
+        into the source geometry gives, unless the neighbour search for that
+        level would have found other points to replace the masked ones. That
+        can only happen where an output point's neighbour list is full and
+        contains a masked point; such levels are flagged as not exact.
+
+        Parameters
+        ----------
+        resample_type : str
+            "nn" or "custom".
+        data : numpy.ma.MaskedArray
+            Array of shape (source points, levels).
+        weight_funcs : callable, optional
+            Weight function of distance, required for "custom".
+
+        Returns
+        -------
+        result, exact
+            Masked array of shape (levels,) + output_shape, and a boolean array
+            telling for each level whether the result is exact.
+        """
+        levels = data.shape[1]
+        values = np.ma.getdata(data)[self.valid_input_index]
+        mask = np.ma.getmaskarray(data)[self.valid_input_index]
+        values = np.where(mask, 0, values)
+
+        index_array = self.index_array.reshape((self.index_array.shape[0], -1))
+        distance_array = self.distance_array.reshape(index_array.shape)
+
+        # Neighbours that weren't found are flagged with an out of bounds index
+        not_found = index_array == values.shape[0]
+        index_array = np.where(not_found, 0, index_array)
+        neighbour_masked = mask[index_array] & ~not_found[:, :, np.newaxis]
+
+        # Level mask affects the result where the neighbour list is full
+        exact = ~(neighbour_masked & ~not_found.any(axis=1)[:, np.newaxis, np.newaxis])
+        exact = exact.all(axis=(0, 1))
+
+        if resample_type == "nn":
+            result = values[index_array[:, 0]]
+            valid = ~(not_found[:, 0, np.newaxis] | neighbour_masked[:, 0])
+        else:
+            result = 0
+            norm = 0
+            # Accumulate in neighbour order, as pyresample does
+            for i in range(index_array.shape[1]):
+                distance = np.where(not_found[:, i], 1, distance_array[:, i])
+                weights = (
+                    weight_funcs(distance)[:, np.newaxis]
+                    * ~not_found[:, i, np.newaxis]
+                    * ~neighbour_masked[:, i]
+                )
+                result = result + weights * values[index_array[:, i]]
+                norm = norm + weights
+
+            valid = norm > 0
+            result = np.divide(result, norm, out=np.zeros_like(result), where=valid)
+
+        output_size = int(np.prod(self.output_shape))
+        full_result = np.ma.masked_all((output_size, levels), dtype=result.dtype)
+        full_result[self.valid_output_index] = np.ma.array(result, mask=~valid)
+
+        return full_result.T.reshape((levels,) + tuple(self.output_shape)), exact
+
+
+# Number of candidates first searched for around each point of a PointStencil.
+STENCIL_CANDIDATES = 256
+
+
+class PointStencil:
+    """The source points that can contribute to each of a few target points.
+
+    For every target point, every point of the source grid within the radius
+    of influence is kept as a candidate, sorted by distance. Whatever the mask
+    of the data, the neighbours a resampling would use are the nearest unmasked
+    candidates, so the data only has to be read at the candidates (`columns`)
+    to resample it, e.g. for every time and depth of a timeseries or profile.
+    """
+
+    def __init__(
+        self,
+        grid_shape,
+        valid_input_index,
+        valid_output_index,
+        index_array,
+        distance_array,
+    ) -> None:
+        flat_index = np.flatnonzero(valid_input_index)
+        valid_output_index = np.ravel(valid_output_index)
+
+        # Target points outside of the source grid have no candidates.
+        shape = (
+            valid_output_index.size,
+            np.size(index_array) // max(np.count_nonzero(valid_output_index), 1),
+        )
+        neighbour_index = np.full(shape, flat_index.size)
+        neighbour_index[valid_output_index] = np.reshape(index_array, (-1, shape[1]))
+        neighbour_distance = np.full(
+            shape, np.inf, dtype=np.asarray(distance_array).dtype
+        )
+        neighbour_distance[valid_output_index] = np.reshape(
+            distance_array, (-1, shape[1])
+        )
+        found = neighbour_index < flat_index.size
+
+        self.grid_shape = grid_shape
+        # Flat indexes (into the source grid) of the candidates of any target
+        # point, and for each target point the positions of its candidates in
+        # `columns` (-1 if there are fewer candidates).
+        self.columns, positions = np.unique(
+            flat_index[neighbour_index[found]], return_inverse=True
+        )
+        self.index_array = np.full(shape, -1)
+        self.index_array[found] = positions
+        self.distance_array = neighbour_distance
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            a.nbytes for a in (self.columns, self.index_array, self.distance_array)
+        )
+
+    def apply(self, resample_type, neighbours, data, weight_funcs=None):
+        """Resamples the data read at the stencil's columns.
+
+        Parameters
+        ----------
+        resample_type : str
+            "nn" or "custom".
+        neighbours : int
+            Number of neighbours to use for each target point.
+        data : numpy.ma.MaskedArray
+            Array of shape (levels, columns).
+        weight_funcs : callable, optional
+            Weight function of distance, required for "custom".
+
+        Returns
+        -------
+        numpy.ma.MaskedArray
+            Array of shape (levels, target points).
+        """
+        if not self.columns.size:
+            return np.ma.masked_all((data.shape[0], self.index_array.shape[0]))
+
+        found = self.index_array >= 0
+        index_array = np.where(found, self.index_array, 0)
+
+        # (levels, target points, candidates)
+        usable = ~np.ma.getmaskarray(data)[:, index_array] & found
+        values = np.where(usable, np.ma.getdata(data)[:, index_array], 0)
+
+        # The nearest `neighbours` usable candidates of each target point.
+        used = usable & (np.cumsum(usable, axis=-1) <= neighbours)
+
+        if resample_type == "nn":
+            first = np.argmax(used, axis=-1)[..., np.newaxis]
+            result = np.take_along_axis(values, first, axis=-1)[..., 0]
+            return np.ma.array(result, mask=~used.any(axis=-1))
+
+        weights = weight_funcs(np.where(found, self.distance_array, 1))
+
+        # Accumulate in neighbour order, as ResamplingPlan.apply_levels does,
+        # up to the farthest candidate that is used.
+        result = np.zeros(used.shape[:-1], dtype=np.result_type(values, weights))
+        norm = np.zeros_like(result)
+        used_candidates = np.flatnonzero(used.any(axis=(0, 1)))
+        for i in range(used_candidates[-1] + 1 if used_candidates.size else 0):
+            w = weights[:, i] * used[..., i]
+            result = result + w * values[..., i]
+            norm = norm + w
+        valid = norm > 0
+        result = np.divide(result, norm, out=np.zeros_like(result), where=valid)
+
+        return np.ma.array(result, mask=~valid)
+
+
+def get_point_stencil(input_def, output_def, radius):
+    """Returns the (possibly cached) PointStencil from a source grid to a few
+    target points.
+
+    Parameters
+    ----------
+    input_def : pyresample.geometry.SwathDefinition
+        Source geometry, without a mask.
+    output_def : pyresample.geometry.SwathDefinition
+        Target points.
+    radius : float
+        Radius of influence in metres.
+    """
+    key = ("stencil", _geometry_digest(input_def), _geometry_digest(output_def), radius)
+
+    with _plan_lock:
+        stencil = _plan_cache.get(key)
+    if stencil is not None:
+        return stencil
+
+    # Search for more candidates until every target point has fewer than that
+    # within the radius.
+    candidates = min(input_def.size, STENCIL_CANDIDATES)
+    while True:
+        neighbour_info = pyresample.kd_tree.get_neighbour_info(
+            input_def, output_def, radius, neighbours=candidates
+        )
+        valid_input_index, _, index_array, _ = neighbour_info
+        index_array = np.reshape(index_array, (-1, candidates))
+        full = (index_array[:, -1] < np.count_nonzero(valid_input_index)).any()
+        if not full or candidates == input_def.size:
+            break
+        candidates = min(input_def.size, candidates * 4)
+
+    stencil = PointStencil(input_def.shape, *neighbour_info)
+
+    with _plan_lock:
+        try:
+            _plan_cache[key] = stencil
+        except ValueError:
+            pass
+
+    return stencil
+
+
+def get_resampling_plan(input_def, output_def, radius, neighbours):
+    """Returns the (possibly cached) ResamplingPlan between two swath definitions.
+
+    Parameters
+    ----------
+    input_def : pyresample.geometry.SwathDefinition
+        Source geometry. Masked lat/lon points are excluded from the plan.
+    output_def : pyresample.geometry.SwathDefinition
+        Target geometry.
+    radius : float
+        Radius of influence in metres.
+    neighbours : int
+        Number of neighbours to consider for each output point.
+    """
+    key = (
+        _geometry_digest(input_def),
+        _geometry_digest(output_def),
+        radius,
+        neighbours,
+    )
+
+    with _plan_lock:
+        plan = _plan_cache.get(key)
+    if plan is not None:
+        return plan
+
+    plan = ResamplingPlan(
+        output_def.shape,
+        *pyresample.kd_tree.get_neighbour_info(
+            input_def, output_def, radius, neighbours=neighbours
+        ),
+    )
+
+    with _plan_lock:
+        try:
+            _plan_cache[key] = plan
+        except ValueError:
+            # Plan is larger than the whole cache
+            pass
+
+    return plan
+
+
+def clear_resampling_plan_cache() -> None:
+    with _plan_lock:
+        _plan_cache.clear()
+
+
+def _geometry_digest(geo_def) -> str:
+    """Hashes the coordinates and mask of a swath definition."""
+    h = hashlib.sha1()
+
+    for coords in (geo_def.lons, geo_def.lats):
+        coords = np.ma.asarray(coords)
+        h.update(str((coords.shape, coords.dtype)).encode())
+        h.update(np.ascontiguousarray(coords.data).tobytes())
+        h.update(np.packbits(np.ma.getmaskarray(coords)).tobytes())
+
+    return h.hexdigest()
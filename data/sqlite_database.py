@@ -1,12 +1,102 @@
 #!/usr/bin/env python
 
+import copy
+import functools
 import itertools
+import json
+import os
 import re
 import sqlite3
-from typing import List
+import threading
+from typing import Dict, List, Tuple
 
 from data.variable import Variable
 from data.variable_list import VariableList
+from oceannavigator.settings import get_settings
+
+
+class _IndexFile:
+    """Idle connections to, and memoized lookups from, one version (mtime and
+    size) of an index database. A rebuilt index gets a new _IndexFile.
+    """
+
+    def __init__(self, version: Tuple[int, int]) -> None:
+        self.version: Tuple[int, int] = version
+        self.retired: bool = False
+        self.connections: List[sqlite3.Connection] = []
+        self.memo: dict = {}
+        self.lock = threading.Lock()
+
+    def take(self, uri: str) -> sqlite3.Connection:
+        with self.lock:
+            if self.connections:
+                return self.connections.pop()
+
+        settings = get_settings()
+        # Connections are handed between the server's threads, but only used by
+        # one at a time.
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size = {settings.sqlite_mmap_size_mb << 20}")
+        conn.execute(f"PRAGMA cache_size = {-(settings.sqlite_cache_size_mb << 10)}")
+
+        return conn
+
+    def give(self, conn: sqlite3.Connection) -> None:
+        with self.lock:
+            if (
+                not self.retired
+                and len(self.connections) < get_settings().sqlite_pool_size
+            ):
+                self.connections.append(conn)
+                return
+
+        conn.close()
+
+    def retire(self) -> None:
+        with self.lock:
+            self.retired = True
+            connections, self.connections = self.connections, []
+
+        for conn in connections:
+            conn.close()
+
+
+_index_files: Dict[str, _IndexFile] = {}
+_index_files_lock = threading.Lock()
+
+
+def _get_index_file(url: str) -> _IndexFile:
+    stat = os.stat(url)
+    version = (stat.st_mtime_ns, stat.st_size)
+
+    with _index_files_lock:
+        index_file = _index_files.get(url)
+        if index_file is not None and index_file.version == version:
+            return index_file
+
+        _index_files[url] = _IndexFile(version)
+
+    if index_file is not None:
+        index_file.retire()
+
+    return _index_files[url]
+
+
+def _memoized(method):
+    """Caches the results of a lookup until the index database is rebuilt.
+    Callers get a (shallow) copy, so they can't modify the cached result.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        key = (method.__name__, *args)
+        memo = self._index_file.memo
+        if key not in memo:
+            memo[key] = method(self, *args)
+
+        return copy.copy(memo[key])
+
+    return wrapper
 
 
 class SQLiteDatabase:
@@ -17,6 +107,9 @@ class SQLiteDatabase:
     Note: databases are opened in READ-ONLY mode to prevent
     accidental writes. If you *really* need writes, this is not the
     class you're looking for. The URL parameter is treated as a URI.
+
+    Connections are pooled per database file and reused until the file is
+    modified, and variable lookups are memoized for as long.
     """
 
     def __init__(self, url: str):
@@ -25,15 +118,23 @@ class SQLiteDatabase:
         self.uri = f"file:{url}?mode=ro"
         self.conn = None  # sqlite connection handle
         self.c = None
+        self._index_file = None
 
     def __enter__(self):
-        self.conn = sqlite3.connect(self.uri, uri=True)
+        self._index_file = _get_index_file(self.url)
+        self.conn = self._index_file.take(self.uri)
         self.c = self.conn.cursor()
 
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        self.conn.close()
+        self.c.close()
+        if exc_type is not None and issubclass(exc_type, sqlite3.Error):
+            self.conn.close()
+        else:
+            self._index_file.give(self.conn)
+        self.conn = None
+        self.c = None
 
     def __flatten_list(self, some_list: list) -> list:
         return list(itertools.chain(*some_list))
@@ -49,7 +150,10 @@ class SQLiteDatabase:
             * [list] -- List of netCDF file paths corresponding to given timestamp(s) and variable.
         """
 
-        query = f"""
+        # The lists are passed as JSON arrays so that the statement is the same
+        # (and cached) for any number of timestamps and variables.
+        self.c.execute(
+            """
             SELECT DISTINCT
                 filepath
             FROM
@@ -58,12 +162,15 @@ class SQLiteDatabase:
                 JOIN Variables v ON tvf.variable_id = v.id
                 JOIN Timestamps t ON tvf.timestamp_id = t.id
             WHERE
-                variable in ({','.join([f"'{v}'" for v in variable])})
-                AND timestamp in ({','.join([str(t) for t in timestamp])})
+                variable IN (SELECT value FROM json_each(?))
+                AND timestamp IN (SELECT value FROM json_each(?))
             ORDER BY timestamp ASC;
-        """
-
-        self.c.execute(query)
+            """,
+            (
+                json.dumps([variable] if isinstance(variable, str) else list(variable)),
+                json.dumps([int(t) for t in timestamp]),
+            ),
+        )
 
         return self.__flatten_list(self.c.fetchall())
 
@@ -85,6 +192,7 @@ class SQLiteDatabase:
 
         return self.__flatten_list(self.c.fetchall())
 
+    @_memoized
     def get_variable_dims(self, variable: str) -> List[str]:
         """Retrieves the given variables dimensions.
 
@@ -115,6 +223,7 @@ class SQLiteDatabase:
 
         return self.__flatten_list(self.c.fetchall())
 
+    @_memoized
     def get_variable_units(self, variable: str) -> List[str]:
         """Retrieves the units for a given variable name.
 
@@ -275,6 +384,7 @@ class SQLiteDatabase:
 
         return self.__flatten_list(self.c.fetchall())
 
+    @_memoized
     def get_all_variables(self) -> VariableList:
         """Retrieves all variables from the open database (including depth, time, etc.)
 
@@ -0,0 +1,117 @@
+"""
+Timestamp Indexes
+=================
+
+Every tile, plot and timestamps request needs the sorted raw timestamps of a
+variable, and often their datetimes, a time index lookup or the nearest
+earlier timestamp. A TimestampIndex keeps them as a sorted, read-only NumPy
+array (with the datetimes converted once per time units), and
+get_timestamp_index shares one per (SQLite index, variable) across the whole
+process until the index file is rewritten.
+"""
+
+import os
+import threading
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+from cachetools import LRUCache
+
+import data.utils
+from data.sqlite_database import SQLiteDatabase
+
+
+class TimestampIndex:
+    """The sorted raw timestamps (e.g. 2031436800) of a variable."""
+
+    def __init__(self, values, units: str = None) -> None:
+        values = np.sort(np.asarray(values))
+        values.setflags(write=False)
+
+        self.values: np.ndarray = values
+        self.units: str = units
+        self._int_values: np.ndarray = None
+        self._datetimes: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.values.size
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def tolist(self) -> list:
+        return self.values.tolist()
+
+    def to_datetime(self, units: str = None) -> np.ndarray:
+        """Returns the (read-only) array of UTC datetimes of the timestamps,
+        converted on first use for the given (or the index's) time units.
+        """
+        units = units or self.units
+        with self._lock:
+            datetimes = self._datetimes.get(units)
+            if datetimes is None:
+                datetimes = np.empty(len(self), dtype=object)
+                if len(self):
+                    datetimes[:] = data.utils.time_index_to_datetime(self.values, units)
+                datetimes.setflags(write=False)
+                self._datetimes[units] = datetimes
+
+        return datetimes
+
+    def index_of(self, timestamp: Union[int, List]) -> np.ndarray:
+        """Returns the (ascending) indexes of the given timestamp(s). Timestamps
+        are compared as integers, and ones that aren't in the index are left
+        out.
+        """
+        if self._int_values is None:
+            self._int_values = self.values.astype(np.int64)
+
+        requested = np.unique(np.asarray(timestamp).astype(np.int64))
+        start = np.searchsorted(self._int_values, requested, "left")
+        counts = np.searchsorted(self._int_values, requested, "right") - start
+
+        # The ranges start[i]:start[i] + counts[i], concatenated.
+        offsets = np.repeat(start - np.cumsum(counts) + counts, counts)
+        return offsets + np.arange(counts.sum())
+
+    def find_le(self, timestamp):
+        """Returns the latest timestamp that is <= the given one, or the
+        earliest timestamp if they're all later (see data.utils.find_le).
+        """
+        i = np.searchsorted(self.values, timestamp, "right")
+        return self.values[i - 1] if i else self.values[0]
+
+    def between(self, start, end) -> np.ndarray:
+        """Returns the timestamps in [start, end]."""
+        return self.values[
+            np.searchsorted(self.values, start, "left") : np.searchsorted(
+                self.values, end, "right"
+            )
+        ]
+
+
+_indexes: LRUCache = LRUCache(maxsize=1024)
+_indexes_lock = threading.Lock()
+
+
+def get_timestamp_index(url: str, variable: str) -> TimestampIndex:
+    """Returns the (shared) index of the timestamps of a variable in the given
+    SQLite index database, reading them again only once the database file has
+    been modified.
+    """
+    stat = os.stat(url)
+    version: Tuple[int, int] = (stat.st_mtime_ns, stat.st_size)
+
+    with _indexes_lock:
+        cached = _indexes.get((url, variable))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    with SQLiteDatabase(url) as db:
+        index = TimestampIndex(db.get_timestamps(variable) or [])
+
+    with _indexes_lock:
+        _indexes[(url, variable)] = (version, index)
+
+    return index
@@ -1,16 +1,26 @@
+import json
+
 import numpy as np
 import xarray as xr
 from geojson import Feature, FeatureCollection, Point
 
 from data.utils import trunc
 
+# geojson.Point rounds coordinates to this many decimal places.
+COORDINATE_PRECISION = 6
+
+_FEATURE = (
+    '{"type": "Feature", "geometry": {"type": "Point", "coordinates": [%r, %r]}, '
+    '"properties": {%s"data": %r, %s"scale": %d}}'
+)
 
-async def data_array_to_geojson(
+
+def data_array_to_geojson(
     data_array: xr.DataArray,
     bearings: xr.DataArray,
     lat_var: xr.DataArray,
     lon_var: xr.DataArray,
-    scale: list,
+    scale: list = None,
 ) -> FeatureCollection:
     """
     Converts a given xarray.DataArray, along with lat and lon keys to a
@@ -40,7 +50,98 @@ async def data_array_to_geojson(
         FeatureCollection -- the subclassed `dict` with transformed collection of
         geojson features.
     """
+    attribs, columns = _to_columns(data_array, bearings, lat_var, lon_var, scale)
+
+    features = []
+    for i in range(len(columns["data"])):
+        props = {**attribs, "data": columns["data"][i]}
+        if "bearing" in columns:
+            props["bearing"] = columns["bearing"][i]
+        props["scale"] = columns["scale"][i]
+
+        features.append(
+            Feature(
+                geometry=Point((columns["lon"][i], columns["lat"][i])),
+                properties=props,
+            )
+        )
+
+    return FeatureCollection(features)
+
+
+def data_array_to_geojson_bytes(
+    data_array: xr.DataArray,
+    bearings: xr.DataArray,
+    lat_var: xr.DataArray,
+    lon_var: xr.DataArray,
+    scale: list = None,
+) -> bytes:
+    """
+    Same as data_array_to_geojson, but returns the encoded FeatureCollection
+    (identical to geojson.dumps of data_array_to_geojson's result) without
+    building a Feature and a Point for every vector.
+    """
+    attribs, columns = _to_columns(data_array, bearings, lat_var, lon_var, scale)
+
+    # The attribs are the same for every feature, so they're encoded once.
+    attribs = "".join(f"{json.dumps(k)}: {json.dumps(v)}, " for k, v in attribs.items())
+    coordinates = (
+        [round(v, COORDINATE_PRECISION) for v in columns["lon"]],
+        [round(v, COORDINATE_PRECISION) for v in columns["lat"]],
+    )
+    if "bearing" in columns:
+        bearings = [f'"bearing": {v!r}, ' for v in columns["bearing"]]
+    else:
+        bearings = [""] * len(columns["data"])
 
+    features = ", ".join(
+        [
+            _FEATURE % (lon, lat, attribs, value, bearing, scale)
+            for lon, lat, value, bearing, scale in zip(
+                *coordinates, columns["data"], bearings, columns["scale"]
+            )
+        ]
+    )
+
+    return f'{{"type": "FeatureCollection", "features": [{features}]}}'.encode()
+
+
+def data_array_to_columnar(
+    data_array: xr.DataArray,
+    bearings: xr.DataArray,
+    lat_var: xr.DataArray,
+    lon_var: xr.DataArray,
+    scale: list = None,
+) -> bytes:
+    """
+    Encodes the same points as data_array_to_geojson as a single JSON object of
+    parallel arrays, which is a fraction of the size of the FeatureCollection:
+
+    {"units": ..., "name": ..., "lon": [...], "lat": [...], "data": [...],
+     "bearing": [...], "scale": [...]}
+
+    `bearing` is only present if bearings are given.
+    """
+    attribs, columns = _to_columns(data_array, bearings, lat_var, lon_var, scale)
+
+    columns["lon"] = np.round(columns["lon"], COORDINATE_PRECISION).tolist()
+    columns["lat"] = np.round(columns["lat"], COORDINATE_PRECISION).tolist()
+
+    return json.dumps({**attribs, **columns}).encode()
+
+
+def _to_columns(
+    data_array: xr.DataArray,
+    bearings: xr.DataArray,
+    lat_var: xr.DataArray,
+    lon_var: xr.DataArray,
+    scale: list,
+):
+    """
+    Returns the attribs shared by every point and a dict of lists (lon, lat,
+    data, bearing and scale) with an element for each point that has a value
+    (and a bearing, if bearings are given), in row-major order.
+    """
     if data_array.ndim != 2:
         raise ValueError(f"Data is not a 2D field: {data_array.shape}")
 
@@ -48,9 +149,11 @@ async def data_array_to_geojson(
     # because that's the only type of float that json will serialize without a custom
     # serializer. Floats from netCDF4 datasets are often 32-bit.
     data = trunc(data_array).astype(float).values
+    valid = ~np.isnan(data)
 
     if bearings is not None:
         bearings = trunc(bearings).astype(float).values
+        valid &= ~np.isnan(bearings)
 
     units_key = next((s for s in data_array.attrs.keys() if "units" in s), None)
 
@@ -63,39 +166,22 @@ async def data_array_to_geojson(
         "name": data_array.attrs[name_key],
     }
 
-    def enumerate_nd_array(array: np.ndarray):
-        it = np.nditer(array, flags=["multi_index"], op_flags=["readonly"])
-        while not it.finished:
-            yield it[0], it.multi_index
-            it.iternext()
+    y, x = np.nonzero(valid)
+    data = data[y, x]
 
     if bearings is not None:
-        scale_data = np.ceil(10 * (data - scale[0]) / scale[1])
-        scale_data[scale_data > 9] = 9
-        scale_data[scale_data < 0] = 0
+        scale_data = np.clip(np.ceil(10 * (data - scale[0]) / scale[1]), 0, 9)
     else:
         scale_data = np.full(data.shape, 2)
 
-    features = []
-    for elem, multi_idx in enumerate_nd_array(data):
-        if np.isnan(elem):
-            continue
-
-        p = Point(
-            (
-                ((lon_var[multi_idx[1]].item() + 180.0) % 360.0) - 180.0,
-                lat_var[multi_idx[0]].item(),
-            )
-        )
-
-        props = {**attribs, "data": elem.item()}
-
-        if bearings is not None:
-            if np.isnan(bearings[multi_idx].item()):
-                continue
-            props["bearing"] = bearings[multi_idx].item()
-        props["scale"] = int(scale_data[multi_idx])
-
-        features.append(Feature(geometry=p, properties=props))
+    lon = np.asarray(lon_var, dtype=np.float64)[x]
+    columns = {
+        "lon": (((lon + 180.0) % 360.0) - 180.0).tolist(),
+        "lat": np.asarray(lat_var, dtype=np.float64)[y].tolist(),
+        "data": data.tolist(),
+    }
+    if bearings is not None:
+        columns["bearing"] = bearings[y, x].tolist()
+    columns["scale"] = scale_data.astype(int).tolist()
 
-    return FeatureCollection(features)
+    return attribs, columns
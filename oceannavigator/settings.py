@@ -1,6 +1,6 @@
 import os
 from functools import lru_cache
-from typing import List
+from typing import Dict, List
 
 from pydantic_settings import BaseSettings
 
@@ -12,6 +12,7 @@ class Settings(BaseSettings):
     git_hash: str = ""
     git_tag: str = ""
 
+    bathymetry_cache_dir: str = ""
     bathymetry_file: str = ""
     cache_dir: str = ""
     class4_fname_pattern: str = ""
@@ -21,14 +22,20 @@ class Settings(BaseSettings):
     dask_num_workers: int = 4
     dask_scheduler: str = ""
     dataset_config_file: str = ""
+    dataset_pool_max_age: int = 600
+    dataset_pool_size: int = 16
     debug: bool = False
     drifter_agg_url: str = ""
     drifter_catalog_url: str = ""
     drifter_url: str = ""
     etopo_file: str = ""
+    grid_index_cache_dir: str = ""
     log_level: str = "DEBUG"
     observation_agg_url: str = ""
     overlay_kml_dir: str = ""
+    render_process_context: str = "spawn"
+    render_process_workers: int = 4
+    render_thread_workers: int = 16
     sentry_env: str = ""
     sentry_traces_rate: int = 0
     shape_file_dir: str = ""
@@ -36,14 +43,26 @@ class Settings(BaseSettings):
     sqlalchemy_echo: bool = False
     sqlalchemy_pool_recycle: int = 50
     sqlalchemy_track_modifications: bool = False
+    sqlite_cache_size_mb: int = 16
+    sqlite_mmap_size_mb: int = 256
+    sqlite_pool_size: int = 8
     tile_cache_dir: str = ""
+    tile_cache_max_age: int = 0
+    tile_cache_max_size_mb: int = 10240
+    tile_cache_scan_interval: int = 60  # Seconds between scans of the whole cache
 
     backend_cors_origins_str: str = ""  # Should be a comma-separated list of origins
+    render_limits_str: str = ""  # Comma-separated list of kind:limit pairs
 
     @property
     def backend_cors_origins(self) -> List[str]:
         return [x.strip() for x in self.backend_cors_origins_str.split(",") if x]
 
+    @property
+    def render_limits(self) -> Dict[str, int]:
+        pairs = [x.split(":") for x in self.render_limits_str.split(",") if x]
+        return {kind.strip(): int(limit) for kind, limit in pairs}
+
     class Config:
         case_sentive: bool = False
         env_prefix: str = "onav_"
@@ -1,4 +1,5 @@
 import re
+import threading
 from pathlib import Path
 from io import BytesIO
 
@@ -6,6 +7,7 @@ import cmocean
 import matplotlib.colors as mcolors
 import matplotlib.pyplot as plt
 import numpy as np
+from cachetools import LRUCache
 
 import plotting
 
@@ -388,6 +390,79 @@ colormap_names = {
 }
 
 
+class ColormapLUT:
+    """
+    Precomputed uint8 RGBA lookup table for a colormap over a data range.
+
+    Gives the same result as
+    `(ScalarMappable(Normalize(vmin, vmax), cmap).to_rgba(data) * 255).astype(uint8)`
+    but maps the normalized data straight to bytes with a single `take`, instead
+    of going through several float RGBA arrays.
+    """
+
+    def __init__(self, cmap: mcolors.Colormap, vmin: float, vmax: float) -> None:
+        self.cmap = cmap
+        self.norm = mcolors.Normalize(vmin=vmin, vmax=vmax)
+        self.N = cmap.N
+
+        # Same layout as the colormap's internal table: N colours followed by the
+        # under, over and bad colours.
+        lut = np.vstack(
+            (
+                cmap(np.arange(cmap.N)),
+                cmap.get_under(),
+                cmap.get_over(),
+                cmap.get_bad(),
+            )
+        )
+        self.lut = (lut * 255).astype(np.uint8)
+
+    def __call__(self, data: np.ndarray, mask: np.ndarray = None) -> np.ndarray:
+        """
+        Returns the uint8 RGBA image of data. Masked or NaN values, and values
+        where the optional boolean `mask` is True, get the colormap's bad colour.
+        """
+        bad = np.ma.getmaskarray(data) | np.isnan(np.ma.getdata(data))
+        if mask is not None:
+            bad |= mask
+
+        xa = self.norm(np.ma.getdata(data)).data
+        xa *= self.N
+        # 1 (N after multiplication) is not out of range.
+        xa[xa == self.N] = self.N - 1
+
+        under = xa < 0
+        over = xa >= self.N
+        with np.errstate(invalid="ignore"):
+            index = xa.astype(np.intp)
+        index[under] = self.N
+        index[over] = self.N + 1
+        index[bad] = self.N + 2
+
+        return self.lut.take(index, axis=0, mode="clip")
+
+
+_luts = LRUCache(maxsize=256)
+_luts_lock = threading.Lock()
+
+
+def get_colormap_lut(cmap: mcolors.Colormap, vmin: float, vmax: float) -> ColormapLUT:
+    """
+    Returns the (cached) ColormapLUT for cmap over [vmin, vmax].
+    """
+    # Colormaps aren't hashable, but the ones we use are module-level instances
+    # and the cached LUT keeps a reference, so their id is stable.
+    key = (id(cmap), float(vmin), float(vmax))
+
+    with _luts_lock:
+        lut = _luts.get(key)
+        if lut is None or lut.cmap is not cmap:
+            lut = ColormapLUT(cmap, vmin, vmax)
+            _luts[key] = lut
+
+    return lut
+
+
 def plot_colormaps():
     fig, axes = plt.subplots(
         nrows=len(colormap_names), figsize=(11, 0.3 * len(colormap_names))
@@ -460,7 +460,7 @@ def bathymetry(latvar, lonvar, depthvar, points, n=200):
 
     x = latvar[idx_y].ravel()
     y = lonvar[idx_x].ravel()
-    z = depthvar[idx_y, idx_x]
+    z = depthvar[np.ix_(idx_y, idx_x)]
 
     coords = np.array(list(zip(itertools.product(x, y))))
     coords = coords.reshape(-1, 2)
@@ -5,10 +5,11 @@ import numpy as np
 import pyresample
 from pathlib import Path
 from cachetools import LRUCache
-from netCDF4 import Dataset
 from pyresample.utils import wrap_longitudes
 from scipy.ndimage import gaussian_filter
 
+from data.bathymetry import get_bathymetry_raster
+from data.resampling_plan import get_resampling_plan
 from oceannavigator.settings import get_settings
 
 _bathymetry_cache = LRUCache(maxsize=256 * 1024 * 1024, getsizeof=len)
@@ -28,53 +29,53 @@ def bathymetry(target_lat, target_lon, blur=None):
         try:
             data = np.load(CACHE_DIR + "/" + hashed + ".npy")
         except:
-            with Dataset(BATHYMETRY_FILE, "r") as ds:
-                lat = ds.variables["y"]
-                lon = ds.variables["x"]
-                z = ds.variables["z"]
+            raster = get_bathymetry_raster(BATHYMETRY_FILE)
+            lat = raster.coords["y"]
+            lon = raster.coords["x"]
 
-                def lat_index(v):
-                    return int(round((v - lat[0]) * 60.0))
+            def lat_index(v):
+                return int(round((v - lat[0]) * 60.0))
 
-                def lon_index(v):
-                    return int(round((v - lon[0]) * 60.0))
+            def lon_index(v):
+                return int(round((v - lon[0]) * 60.0))
 
-                lon_idx_min = target_lon.argmin()
-                lon_idx_max = target_lon.argmax()
+            lon_idx_min = target_lon.argmin()
+            lon_idx_max = target_lon.argmax()
 
-                target_lon = wrap_longitudes(target_lon)
+            target_lon = wrap_longitudes(target_lon)
 
-                minlat = lat_index(np.amin(target_lat))
-                maxlat = lat_index(np.amax(target_lat))
+            minlat = lat_index(np.amin(target_lat))
+            maxlat = lat_index(np.amax(target_lat))
 
-                minlon = lon_index(target_lon.ravel()[lon_idx_min])
-                maxlon = lon_index(target_lon.ravel()[lon_idx_max])
+            minlon = lon_index(target_lon.ravel()[lon_idx_min])
+            maxlon = lon_index(target_lon.ravel()[lon_idx_max])
 
-                if minlon > maxlon:
-                    in_lon = np.concatenate((lon[minlon:], lon[0:maxlon]))
-                    in_data = np.concatenate(
-                        (z[minlat:maxlat, minlon:], z[minlat:maxlat, 0:maxlon]), 1
-                    )
-                else:
-                    in_lon = lon[minlon:maxlon]
-                    in_data = z[minlat:maxlat, minlon:maxlon]
+            if minlon > maxlon:
+                in_lon = np.concatenate((lon[minlon:], lon[0:maxlon]))
+                in_data = np.concatenate(
+                    (
+                        raster.window(minlat, maxlat, minlon, None),
+                        raster.window(minlat, maxlat, 0, maxlon),
+                    ),
+                    1,
+                )
+            else:
+                in_lon = lon[minlon:maxlon]
+                in_data = raster.window(minlat, maxlat, minlon, maxlon)
 
-                res = in_data.transpose() * -1
+            res = in_data.transpose() * -1
 
-                lats, lons = np.meshgrid(lat[minlat:maxlat], in_lon)
+            lats, lons = np.meshgrid(lat[minlat:maxlat], in_lon)
 
             orig_def = pyresample.geometry.SwathDefinition(lons=lons, lats=lats)
             target_def = pyresample.geometry.SwathDefinition(
                 lons=target_lon.astype(np.float64), lats=target_lat.astype(np.float64)
             )
 
-            data = pyresample.kd_tree.resample_nearest(
-                orig_def,
-                res,
-                target_def,
-                radius_of_influence=500000,
-                fill_value=None,
-            )
+            # The neighbour search only depends on the grids, so the plan is
+            # shared with every other overlay drawn on the same target grid.
+            plan = get_resampling_plan(orig_def, target_def, 500000, 1)
+            data = np.ma.asarray(plan.apply("nn", res, fill_value=None))
 
             def do_save(filename, data):
                 np.save(filename, data.filled())
@@ -1,13 +1,17 @@
 import copy
+import hashlib
 import json
 import math
 import re
+import threading
 from operator import itemgetter
 
 import numpy as np
+import shapely
+from cachetools import LRUCache
 
 # from flask_babel import gettext
-from shapely.geometry import LinearRing, MultiPolygon, Point, Polygon
+from shapely.geometry import LinearRing, MultiPolygon, Polygon
 from shapely.ops import cascaded_union
 
 from data import open_dataset
@@ -15,6 +19,12 @@ from oceannavigator import DatasetConfig
 from utils.errors import ClientError, ServerError
 from utils.misc import list_areas
 
+STATISTICS = ["min", "max", "mean", "median", "stddev"]
+
+# Areas rasterized onto grids by area_mask, keyed by area and grid.
+_area_masks: LRUCache = LRUCache(maxsize=256)
+_area_masks_lock = threading.Lock()
+
 
 class Area:
     def __init__(self, query):
@@ -91,6 +101,29 @@ class Stats:
         else:
             self.area.stats = self.inner_area.stats
 
+    def depth_levels(self, dataset):
+        """Returns the requested depths (an index, a comma separated list of
+        indexes and/or "bottom") as (depth, label) pairs.
+        """
+        if not self.depth:
+            return [(0, "(@0 m)")]
+
+        depths = self.depth
+        if isinstance(depths, str):
+            depths = depths.split(",")
+        elif not isinstance(depths, list):
+            depths = [depths]
+
+        levels = []
+        for depth in depths:
+            if depth == "bottom":
+                levels.append(("bottom", "(@ Bottom)"))
+            else:
+                depth = int(np.clip(int(depth), 0, len(dataset.depths) - 1))
+                levels.append((depth, "(@%d m)" % np.round(dataset.depths[depth])))
+
+        return levels
+
     def get_values(self, area_info, dataset_name, variables):
         config = DatasetConfig(dataset_name)
         with open_dataset(config) as dataset:
@@ -103,100 +136,79 @@ class Stats:
             if time < 0:
                 time += len(dataset.nc_data.timestamps)
             time = np.clip(time, 0, len(dataset.nc_data.timestamps) - 1)
+            # time indexes the sorted timestamps, not the raw time variable.
+            timestamp = dataset.nc_data._time_index()[time]
 
-            depth = 0
-            depthm = 0
-
-            if self.depth:
-                if self.depth == "bottom":
-                    depth = "bottom"
-                    depthm = "Bottom"
-                if len(self.depth) > 0 and self.depth != "bottom":
-                    depth = int(self.depth)
-
-                    depth = np.clip(depth, 0, len(dataset.depths) - 1)
-                    depthm = dataset.depths[depth]
-
-            lat, lon = np.meshgrid(
-                np.linspace(area_info.bounds[0], area_info.bounds[2], 50),
-                area_info.spaced_points,
-            )
+            levels = self.depth_levels(dataset)
 
             output_fmtstr = "%6.5g"
-            for v_idx, v in enumerate(variables):
+            for v in variables:
                 var = dataset.variables[v]
 
                 variable_name = config.variable[var].name
                 variable_unit = config.variable[var].unit
 
-                lat, lon, d = dataset.get_raw_point(
-                    lat.ravel(), lon.ravel(), depth, time, v
-                )
-
-                lon[np.where(lon > 180)] -= 360
-
+                # Each read is a (depth, labels) pair; all the requested depth
+                # indexes are read at once.
                 if len(var.dimensions) == 3:
-                    variable_depth = ""
-                elif depth == "bottom":
-                    variable_depth = "(@ Bottom)"
+                    reads = [(0, [""])]
                 else:
-                    variable_depth = "(@%d m)" % np.round(depthm)
+                    indexes = [(d, label) for d, label in levels if d != "bottom"]
+                    reads = []
+                    if indexes:
+                        reads.append(tuple(map(list, zip(*indexes))))
+                    if len(indexes) < len(levels):
+                        reads.append(("bottom", ["(@ Bottom)"]))
+
+                for depth, labels in reads:
+                    # bounds are (minlat, minlon, maxlat, maxlon).
+                    cell_lat, cell_lon, d = dataset.get_raw_area(
+                        area_info.bounds[0],
+                        area_info.bounds[2],
+                        area_info.bounds[1],
+                        area_info.bounds[3],
+                        depth,
+                        timestamp,
+                        v,
+                    )
+                    cell_lat = np.asarray(cell_lat)
+                    cell_lon = np.asarray(cell_lon)
 
-                points = [Point(p) for p in zip(lat.values.ravel(), lon.values.ravel())]
+                    values = np.ma.masked_invalid(getattr(d, "values", d))
+                    values = values.reshape((len(labels),) + cell_lat.shape)
 
-                for i, a in enumerate(area_info.area_query):
-                    indices = np.where(
-                        map(
-                            lambda p, poly=area_info.area_polys[i]: poly.contains(p),
-                            points,
+                    for i, poly in enumerate(area_info.area_polys):
+                        statistics = area_statistics(
+                            values, area_mask(poly, cell_lat, cell_lon)
                         )
-                    )
 
-                    selection = np.ma.array(d.values.ravel()[indices])
-                    if len(selection) > 0 and not selection.mask.all():
-                        area_info.output[i]["variables"].append(
-                            {
-                                "name": (
-                                    "%s %s" % (variable_name, variable_depth)
-                                ).strip(),
-                                "unit": variable_unit,
-                                "min": output_fmtstr
-                                % (np.ma.amin(selection).astype(float)),
-                                "max": output_fmtstr
-                                % (np.ma.amax(selection).astype(float)),
-                                "mean": output_fmtstr
-                                % (np.ma.mean(selection).astype(float)),
-                                "median": output_fmtstr
-                                % (np.ma.median(selection).astype(float)),
-                                "stddev": output_fmtstr
-                                % (np.ma.std(selection).astype(float)),
-                                "num": "%d" % selection.count(),
-                            }
-                        )
-                    else:
-                        area_info.output[i]["variables"].append(
-                            {
-                                "name": (
-                                    "%s %s" % (variable_name, variable_depth)
-                                ).strip(),
-                                "unit": variable_unit,
-                                "min": "No Data",  # gettext("No Data"),
-                                "max": "No Data",  # gettext("No Data"),
-                                "mean": "No Data",  # gettext("No Data"),
-                                "median": "No Data",  # gettext("No Data"),
-                                "stddev": "No Data",  # gettext("No Data"),
-                                "num": "0",
-                            }
-                        )
-                        ClientError(
-                            # gettext(
-                            "there are no datapoints in the area you selected. \
-                            you may have selected a area on land or you may \
-                            have an ara that is smallenough to fit between \
-                            the datapoints try selection a different area or \
-                            a larger area"
-                            # )
-                        )
+                        for label, stat in zip(labels, statistics):
+                            name = ("%s %s" % (variable_name, label)).strip()
+                            if stat is None:
+                                area_info.output[i]["variables"].append(
+                                    {
+                                        "name": name,
+                                        "unit": variable_unit,
+                                        "min": "No Data",  # gettext("No Data"),
+                                        "max": "No Data",  # gettext("No Data"),
+                                        "mean": "No Data",  # gettext("No Data"),
+                                        "median": "No Data",  # gettext("No Data"),
+                                        "stddev": "No Data",  # gettext("No Data"),
+                                        "num": "0",
+                                    }
+                                )
+                            else:
+                                area_info.output[i]["variables"].append(
+                                    {
+                                        "name": name,
+                                        "unit": variable_unit,
+                                        **{
+                                            k: output_fmtstr % stat[k]
+                                            for k in STATISTICS
+                                        },
+                                        "num": "%d" % stat["num"],
+                                    }
+                                )
 
             area_info.stats = area_info.output
             return
@@ -211,6 +223,74 @@ class Stats:
         )
 
 
+def area_mask(poly, lat, lon) -> np.ndarray:
+    """Rasterizes an area (with (lat, lon) coordinates) onto a grid, returning
+    a read-only boolean mask of the grid cells whose centres are inside it.
+
+    The masks are cached by area and grid, so each area is only rasterized
+    once for every grid it's used on.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+
+    grid = hashlib.blake2b(digest_size=16)
+    grid.update(lat.tobytes())
+    grid.update(lon.tobytes())
+    key = (poly.wkb, lat.shape, grid.digest())
+
+    with _area_masks_lock:
+        mask = _area_masks.get(key)
+    if mask is not None:
+        return mask
+
+    lon = np.where(lon > 180, lon - 360, lon)
+
+    # Only the cells inside the area's bounding box need to be tested.
+    minlat, minlon, maxlat, maxlon = poly.bounds
+    candidates = (lat >= minlat) & (lat <= maxlat) & (lon >= minlon) & (lon <= maxlon)
+
+    mask = np.zeros(lat.shape, dtype=bool)
+    mask[candidates] = shapely.contains_xy(poly, lat[candidates], lon[candidates])
+    mask.setflags(write=False)
+
+    with _area_masks_lock:
+        _area_masks[key] = mask
+
+    return mask
+
+
+def area_statistics(values, mask) -> list:
+    """Computes the statistics of the cells inside a mask for each level of a
+    (levels, y, x) masked array.
+
+    Returns:
+        list -- For each level, a dict with the min, max, mean, median, stddev
+        and num of its cells in the mask, or None if none of them have data.
+    """
+    selection = np.ma.masked_invalid(values[:, mask])
+    counts = selection.count(axis=1)
+    if not counts.any():
+        return [None] * len(counts)
+
+    statistics = {
+        "min": np.ma.min(selection, axis=1),
+        "max": np.ma.max(selection, axis=1),
+        "mean": np.ma.mean(selection, axis=1),
+        "median": np.ma.median(selection, axis=1),
+        "stddev": np.ma.std(selection, axis=1),
+    }
+
+    return [
+        {
+            **{k: float(v[level]) for k, v in statistics.items()},
+            "num": int(count),
+        }
+        if count
+        else None
+        for level, count in enumerate(counts)
+    ]
+
+
 def get_names_rings(area):
     names = []
     all_rings = []
@@ -304,7 +384,7 @@ def wrap_computer_stats(query, dataset_name, lon_values):
 
     variables = query.get("variable")
 
-    if isinstance(variables, str) or isinstance(variables, unicode):
+    if isinstance(variables, str):
         variables = variables.split(",")
 
     area_data = Stats(query)
@@ -329,27 +409,6 @@ def wrap_computer_stats(query, dataset_name, lon_values):
         area_data.outter_area.area_query
     )
 
-    area_data.inner_area.width = (
-        area_data.inner_area.bounds[3] - area_data.inner_area.bounds[1]
-    )
-    area_data.outter_area.width = (
-        area_data.outter_area.bounds[3] - area_data.outter_area.bounds[1]
-    )
-
-    spacing = math.floor(
-        (
-            area_data.inner_area.width
-            / (area_data.inner_area.width + area_data.outter_area.width)
-        )
-        * 50
-    )
-    area_data.inner_area.spaced_points = np.linspace(
-        area_data.inner_area.bounds[1], area_data.inner_area.bounds[3], spacing
-    )
-    area_data.outter_area.spaced_points = np.linspace(
-        area_data.outter_area.bounds[1], area_data.outter_area.bounds[3], 50 - spacing
-    )
-
     area_data.get_values(area_data.inner_area, dataset_name, variables)
     area_data.get_values(area_data.outter_area, dataset_name, variables)
     area_data.combine_stats()
@@ -376,7 +435,7 @@ def computer_stats(area, query, dataset_name):
     area_data.set_lons(lon_values)
 
     variables = query.get("variable")
-    if isinstance(variables, str) or isinstance(variables, unicode):
+    if isinstance(variables, str):
         variables = variables.split(",")
 
     area_data.names, area_data.area.all_rings = get_names_rings(
@@ -386,9 +445,6 @@ def computer_stats(area, query, dataset_name):
     area_data.area.area_polys, area_data.area.output = fill_polygons(
         area_data.area.area_query
     )
-    area_data.area.spaced_points = np.linspace(
-        area_data.area.bounds[1], area_data.area.bounds[3], 50
-    )
 
     area_data.get_values(area_data.area, dataset_name, variables)
 
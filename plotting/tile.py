@@ -8,7 +8,6 @@ import numpy as np
 import xarray as xr
 from matplotlib.colorbar import ColorbarBase
 from matplotlib.ticker import ScalarFormatter
-from netCDF4 import Dataset
 from PIL import Image
 from pyproj import Proj
 from pyproj.transformer import Transformer
@@ -18,9 +17,12 @@ from skimage import measure
 import plotting.colormap as colormap
 import plotting.utils as utils
 from data import open_dataset
-from data.transformers.geojson import data_array_to_geojson
+from data.bathymetry import etopo_window
+from data.transformers.geojson import (
+    data_array_to_columnar,
+    data_array_to_geojson_bytes,
+)
 from oceannavigator import DatasetConfig
-from oceannavigator.settings import get_settings
 
 
 def deg2num(lat_deg, lon_deg, zoom):
@@ -104,6 +106,27 @@ def get_latlon_coords(projection, x, y, z):
     return lat, lon
 
 
+def get_metatile_latlon_coords(projection, x, y, z, nx, ny):
+    """
+    Returns the lat/lon coordinates of an nx by ny block of tiles whose top-left
+    tile is (x, y). Each tile occupies the same [x, y] ordered 256x256 block it
+    would have on its own, so a slice of the result matches a single tile exactly.
+    """
+    lat = np.empty((256 * nx, 256 * ny))
+    lon = np.empty((256 * nx, 256 * ny))
+
+    for i in range(nx):
+        for j in range(ny):
+            tile_lat, tile_lon = get_latlon_coords(projection, x + i, y + j, z)
+            if len(tile_lat.shape) == 1:
+                tile_lat, tile_lon = np.meshgrid(tile_lat, tile_lon)
+
+            lat[i * 256 : (i + 1) * 256, j * 256 : (j + 1) * 256] = tile_lat
+            lon[i * 256 : (i + 1) * 256, j * 256 : (j + 1) * 256] = tile_lon
+
+    return lat, lon
+
+
 def get_m_bounds(projection, x, y, z):
     if projection == "EPSG:3857":
         nw = num2deg(x, y, z)
@@ -226,12 +249,39 @@ def scale(args):
     return buf
 
 
-async def plot(projection: str, x: int, y: int, z: int, args: dict) -> BytesIO:
-    settings = get_settings()
+def plot(projection: str, x: int, y: int, z: int, args: dict) -> Image.Image:
+    tiles = plot_metatile(projection, x, y, z, 1, args)
 
-    lat, lon = get_latlon_coords(projection, x, y, z)
-    if len(lat.shape) == 1:
-        lat, lon = np.meshgrid(lat, lon)
+    return tiles[(x, y)]
+
+
+def metatile_bounds(x: int, y: int, z: int, size: int) -> tuple:
+    """
+    Returns the origin (x0, y0) and extent (nx, ny), in tiles, of the size x size
+    block containing tile (x, y). Blocks are aligned to multiples of `size` and
+    clipped to the tile grid.
+    """
+    n_tiles = 2**z
+    x0 = (x // size) * size
+    y0 = (y // size) * size
+
+    return x0, y0, min(size, n_tiles - x0), min(size, n_tiles - y0)
+
+
+def plot_metatile(
+    projection: str, x: int, y: int, z: int, size: int, args: dict
+) -> dict:
+    """
+    Renders the size x size block of tiles containing tile (x, y) in a single pass
+    (one dataset open, one resample and one bathymetry read) and slices it into
+    individual tiles. Blocks are aligned to multiples of `size` and clipped to the
+    tile grid.
+
+    Returns a dict mapping (x, y) tile indices to PIL Images.
+    """
+    x0, y0, nx, ny = metatile_bounds(x, y, z, size)
+
+    lat, lon = get_metatile_latlon_coords(projection, x0, y0, z, nx, ny)
 
     dataset_name = args.get("dataset")
     config = DatasetConfig(dataset_name)
@@ -278,26 +328,42 @@ async def plot(projection: str, x: int, y: int, z: int, args: dict) -> BytesIO:
         cmap = colormap.colormaps.get("speed")
 
     data = data.transpose()
-    xpx = x * 256
-    ypx = y * 256
 
     # Mask out any topography if we're below the vector-tile threshold
+    land = None
     if z < 8:
-        with Dataset(settings.etopo_file % (projection, z), "r") as dataset:
-            bathymetry = dataset["z"][ypx : (ypx + 256), xpx : (xpx + 256)]
-
+        bathymetry = etopo_window(projection, x0, y0, z, nx, ny)
         bathymetry = gaussian_filter(bathymetry, 0.5)
 
-        data[np.where(bathymetry > -depthm)] = np.ma.masked
+        land = bathymetry > -depthm
 
-    sm = matplotlib.cm.ScalarMappable(
-        matplotlib.colors.Normalize(vmin=scale[0], vmax=scale[1]), cmap=cmap
-    )
+    lut = colormap.get_colormap_lut(cmap, scale[0], scale[1])
+    img = lut(np.squeeze(data), land)
 
-    img = sm.to_rgba(np.ma.masked_invalid(np.squeeze(data)))
-    im = Image.fromarray((img * 255.0).astype(np.uint8))
+    tiles = {}
+    for i in range(nx):
+        for j in range(ny):
+            tiles[(x0 + i, y0 + j)] = Image.fromarray(
+                img[j * 256 : (j + 1) * 256, i * 256 : (i + 1) * 256]
+            )
+
+    return tiles
+
+
+def plot_metatile_png(
+    projection: str, x: int, y: int, z: int, size: int, args: dict
+) -> dict:
+    """
+    Same as plot_metatile, with the tiles encoded as PNG. Used when rendering in
+    another process, so that the encoding happens there too.
+    """
+    tiles = {}
+    for key, img in plot_metatile(projection, x, y, z, size, args).items():
+        buf = BytesIO()
+        img.save(buf, format="PNG", optimize=True)
+        tiles[key] = buf.getvalue()
 
-    return im
+    return tiles
 
 
 def get_quiver_slice(
@@ -321,7 +387,7 @@ def get_quiver_slice(
     return dim_slice
 
 
-async def quiver(
+def quiver(
     dataset_name: str,
     variable: str,
     time: str,
@@ -331,8 +397,18 @@ async def quiver(
     y: int,
     z: int,
     projection: str,
-):
+    quiver_format: str = "geojson",
+) -> bytes:
+    """Returns the encoded quiver vectors of the tile, either as a GeoJSON
+    FeatureCollection or, with quiver_format "columnar", as parallel arrays (see
+    data_array_to_columnar).
+    """
     config = DatasetConfig(dataset_name)
+    encode = (
+        data_array_to_columnar
+        if quiver_format == "columnar"
+        else data_array_to_geojson_bytes
+    )
 
     with open_dataset(config, variable=variable, timestamp=time) as ds:
         lat_var, lon_var = ds.nc_data.latlon_variables
@@ -370,7 +446,7 @@ async def quiver(
                         data_slice
                     ].squeeze(drop=True)
 
-            d = await data_array_to_geojson(
+            return encode(
                 data.squeeze(drop=True),
                 bearings,
                 lat_var[lat_slice],
@@ -378,20 +454,17 @@ async def quiver(
                 config.variable[variable].scale,
             )
 
-            return d
-    return {"type": "FeatureCollection", "features": []}
+    if quiver_format == "columnar":
+        return b'{"lon": [], "lat": [], "data": [], "scale": []}'
 
+    return b'{"type": "FeatureCollection", "features": []}'
 
-def topo(projection: str, x: int, y: int, z: int, shaded_relief: bool) -> BytesIO:
-    settings = get_settings()
 
+def topo(projection: str, x: int, y: int, z: int, shaded_relief: bool) -> BytesIO:
     lat, lon = get_latlon_coords(projection, x, y, z)
     if len(lat.shape) == 1:
         lat, lon = np.meshgrid(lat, lon)
 
-    xpx = x * 256
-    ypx = y * 256
-
     scale = [-4000, 1000]
     cmap = "BrBG_r"
 
@@ -400,9 +473,7 @@ def topo(projection: str, x: int, y: int, z: int, shaded_relief: bool) -> BytesI
     colors = np.vstack((water_colors, land_colors))
     cmap = matplotlib.colors.LinearSegmentedColormap.from_list("topo", colors)
 
-    data = None
-    with Dataset(settings.etopo_file % (projection, z), "r") as dataset:
-        data = dataset["z"][ypx : (ypx + 256), xpx : (xpx + 256)]
+    data = etopo_window(projection, x, y, z)
 
     shade = 0
     if shaded_relief:
@@ -437,19 +508,13 @@ def topo(projection: str, x: int, y: int, z: int, shaded_relief: bool) -> BytesI
     return buf
 
 
-async def bathymetry(projection: str, x: int, y: int, z: int) -> BytesIO:
-    settings = get_settings()
-
+def bathymetry(projection: str, x: int, y: int, z: int) -> bytes:
     lat, lon = get_latlon_coords(projection, x, y, z)
     if len(lat.shape) == 1:
         lat, lon = np.meshgrid(lat, lon)
 
-    xpx = x * 256
-    ypx = y * 256
-
-    with Dataset(settings.etopo_file % (projection, z), "r") as dataset:
-        data = dataset["z"][ypx : (ypx + 256), xpx : (xpx + 256)] * -1
-        data = data[::-1, :]
+    data = etopo_window(projection, x, y, z) * -1
+    data = data[::-1, :]
 
     LEVELS = [100, 200, 500, 1000, 2000, 3000, 4000, 5000, 6000]
 
@@ -482,6 +547,5 @@ async def bathymetry(projection: str, x: int, y: int, z: int) -> BytesIO:
         transparent=True,
     )
     plt.close(fig)
-    buf.seek(0)
 
-    return buf
+    return buf.getvalue()
@@ -85,28 +85,19 @@ class TimeseriesPlotter(PointPlotter):
             ):
                 self.depth = 0
 
-            point_data = []
-            depths = []
-            for p in self.points:
-                data = []
-                if self.depth == "all":
-                    d, depths = dataset.get_timeseries_profile(
-                        float(p[0]), float(p[1]), self.starttime, self.endtime, variable
-                    )
-                else:
-                    d, depths = dataset.get_timeseries_point(
-                        float(p[0]),
-                        float(p[1]),
-                        self.depth,
-                        self.starttime,
-                        self.endtime,
-                        variable,
-                        return_depth=True,
-                    )
-                data.append(d)
-                point_data.append(np.ma.array(data))
-
-            point_data = np.ma.array(point_data)
+            latitudes = [float(p[0]) for p in self.points]
+            longitudes = [float(p[1]) for p in self.points]
+
+            point_data, depths = dataset.get_timeseries_points(
+                latitudes,
+                longitudes,
+                self.depth,
+                self.starttime,
+                self.endtime,
+                variable,
+            )
+            # (points, 1, time[, depth])
+            point_data = point_data[:, np.newaxis]
 
             starttime_idx = dataset.nc_data.timestamp_to_time_index(self.starttime)
             endtime_idx = dataset.nc_data.timestamp_to_time_index(self.endtime)
@@ -136,26 +127,17 @@ class TimeseriesPlotter(PointPlotter):
                     dataset, vector_variables
                 )
 
-                d = []
-                vector_point_data = []
-                for vv in vector_variables:
-                    for p in self.points:
-                        vector_data = []
-
-                        d, _ = dataset.get_timeseries_point(
-                            float(p[0]),
-                            float(p[1]),
-                            self.depth,
-                            self.starttime,
-                            self.endtime,
-                            vv,
-                            return_depth=True,
-                        )
-
-                    vector_data.append(d)
-                    vector_point_data.append(np.ma.array(vector_data))
-
-                self.quiver_data = vector_point_data
+                self.quiver_data = [
+                    dataset.get_timeseries_points(
+                        latitudes,
+                        longitudes,
+                        self.depth,
+                        self.starttime,
+                        self.endtime,
+                        vv,
+                    )[0]
+                    for vv in vector_variables
+                ]
 
             self.times = times
             self.data = point_data
@@ -4,12 +4,12 @@ import numpy as np
 from geopy.distance import GeodesicDistance
 from matplotlib.ticker import ScalarFormatter, StrMethodFormatter
 from mpl_toolkits.axes_grid1 import make_axes_locatable
-from netCDF4 import Dataset
 from scipy.interpolate import interp1d
 
 import plotting.colormap as colormap
 import plotting.utils as utils
-from data import geo, open_dataset
+from data import open_dataset
+from data.bathymetry import get_bathymetry_raster
 from oceannavigator import DatasetConfig
 from oceannavigator.settings import get_settings
 from plotting.grid import bathymetry
@@ -79,19 +79,14 @@ class TransectPlotter(LinePlotter):
             # Load data sent from primary/Left Map
             if len(self.variables) > 1:
                 # Only velocity has 2 variables
-                v = []
-                for name in self.variables:
-                    v.append(dataset.variables[name])
-
-                distances, times, lat, lon, bearings = geo.path_to_points(
-                    self.points, 100
-                )
-                # Calculate vector components
-                transect_pts, distance, x, dep = dataset.get_path_profile(
-                    self.points, self.variables[0], self.time, numpoints=100
-                )
-                transect_pts, distance, y, dep = dataset.get_path_profile(
-                    self.points, self.variables[1], self.time, numpoints=100
+                (
+                    transect_pts,
+                    distance,
+                    bearings,
+                    (x, y),
+                    dep,
+                ) = dataset.get_path_profiles(
+                    self.points, self.variables[:2], self.time, numpoints=100
                 )
 
                 r = np.radians(np.subtract(90, bearings))
@@ -235,34 +230,16 @@ class TransectPlotter(LinePlotter):
                     (
                         climate_pts,
                         climate_distance,
-                        climate_x,
-                        cdep,
-                    ) = dataset.get_path_profile(
-                        self.points,
-                        self.compare["variables"][0],
-                        self.compare["time"],
-                        numpoints=100,
-                    )
-                    (
-                        climate_pts,
-                        climate_distance,
-                        climate_y,
+                        bearings,
+                        (climate_x, climate_y),
                         cdep,
-                    ) = dataset.get_path_profile(
+                    ) = dataset.get_path_profiles(
                         self.points,
-                        self.compare["variables"][0],
+                        self.compare["variables"][:2],
                         self.compare["time"],
                         numpoints=100,
                     )
 
-                    (
-                        climate_distances,
-                        ctimes,
-                        clat,
-                        clon,
-                        bearings,
-                    ) = geo.path_to_points(self.points, 100)
-
                     r = np.radians(np.subtract(90, bearings))
                     theta = np.arctan2(climate_y, climate_x) - r
                     mag = np.sqrt(climate_x**2 + climate_y**2)
@@ -285,13 +262,10 @@ class TransectPlotter(LinePlotter):
                     """
 
         # Bathymetry
-        with Dataset(settings.bathymetry_file, "r") as dataset:
-            bath_x, bath_y = bathymetry(
-                dataset.variables["y"],
-                dataset.variables["x"],
-                dataset.variables["z"],
-                self.points,
-            )
+        raster = get_bathymetry_raster(settings.bathymetry_file)
+        bath_x, bath_y = bathymetry(
+            raster.coords["y"], raster.coords["x"], raster.z, self.points
+        )
 
         self.bathymetry = {"x": bath_x, "y": bath_y}
 
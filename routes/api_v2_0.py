@@ -4,19 +4,17 @@ import gzip
 import json
 import os
 import pathlib
-import shutil
 import sqlite3
 from io import BytesIO
 
-import geojson
 import numpy as np
-import pandas as pd
+import shapely
 from dateutil.parser import parse as dateparse
 from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from PIL import Image
-from shapely.geometry import LinearRing, Point, Polygon
+from shapely.geometry import LinearRing, Polygon
 from sqlalchemy import exc, func
 from sqlalchemy.orm import Session
 
@@ -36,7 +34,8 @@ from data.observational import (
     engine,
 )
 from data.sqlite_database import SQLiteDatabase
-from data.utils import get_data_vars_from_equation, time_index_to_datetime
+from data.timestamp_index import TimestampIndex, get_timestamp_index
+from data.utils import get_data_vars_from_equation
 from oceannavigator.dataset_config import DatasetConfig
 from oceannavigator.log import log
 from oceannavigator.settings import get_settings
@@ -58,6 +57,9 @@ from plotting.track import TrackPlotter
 from plotting.transect import TransectPlotter
 from plotting.ts import TemperatureSalinityPlotter
 from utils.errors import ClientError
+from utils.render_executor import get_render_executor
+from utils.single_flight import SingleFlight
+from utils.tile_cache import TileCache, get_tile_cache
 
 FAILURE = ClientError("Bad API usage")
 MAX_CACHE = 315360000
@@ -72,6 +74,10 @@ router = APIRouter(
     responses={404: {"message": "Not found"}},
 )
 
+# Coalesce concurrent identical renders
+_tile_flights = SingleFlight()
+_plot_flights = SingleFlight()
+
 
 def get_db():
     try:
@@ -259,23 +265,24 @@ def timestamps(
     # Handle possible list of URLs for staggered grid velocity field datasets
     url = config.url if not isinstance(config.url, list) else config.url[0]
     if url.endswith(".sqlite3"):
-        with SQLiteDatabase(url) as db:
-            if variable in config.calculated_variables:
+        if variable in config.calculated_variables:
+            with SQLiteDatabase(url) as db:
                 data_vars = get_data_vars_from_equation(
                     config.calculated_variables[variable]["equation"],
                     [v.key for v in db.get_data_variables()],
                 )
-                vals = db.get_timestamps(data_vars[0])
-            else:
-                vals = db.get_timestamps(variable)
-            time_dim_units = config.time_dim_units
+            index = get_timestamp_index(url, data_vars[0])
+        else:
+            index = get_timestamp_index(url, variable)
+        time_dim_units = config.time_dim_units
     else:
         with open_dataset(config, variable=variable) as ds:
-            vals = list(map(int, ds.nc_data.time_variable.values))
+            index = TimestampIndex(ds.nc_data.time_variable.values.astype(int))
             time_dim_units = (
                 config.time_dim_units or ds.nc_data.time_variable.attrs["units"]
             )
-    converted_vals = time_index_to_datetime(vals, time_dim_units)
+    vals = index.tolist()
+    converted_vals = index.to_datetime(time_dim_units)
 
     result = []
     for idx, date in enumerate(converted_vals):
@@ -283,8 +290,6 @@ def timestamps(
             date = datetime.datetime(date.year, date.month, 15)
         result.append({"id": vals[idx], "value": date.isoformat()})
 
-    result = sorted(result, key=lambda k: k["id"])
-
     return jsonable_encoder(result)
 
 
@@ -644,7 +649,17 @@ async def plot(
             status_code=404, detail=f"Incorrect plot type ({plot_type}) provided."
         )
 
-    img, mime, filename = plotter.run()
+    async def render():
+        executor = get_render_executor()
+        if plot_type == "observation":
+            # The plotter holds a database session, keep it in this process.
+            return await executor.run_in_thread(plot_type, plotter.run)
+        return await executor.run_in_process(plot_type, plotter.run)
+
+    # Identical plots requested concurrently (e.g. several users opening the same
+    # shared link) are only rendered once.
+    flight_key = (plot_type, json.dumps(query, sort_keys=True), format, size, dpi)
+    img, mime, filename = await _plot_flights.do(flight_key, render)
 
     if img:
         response = make_response(img, mime)
@@ -781,64 +796,81 @@ async def data_tile(
     radius: int = Query(default=25, examples=[25]),
     neighbours: int = Query(default=10, examples=[10]),
     scale: str = Query(examples=["-5,30"]),
+    metatile: int = Query(
+        default=1,
+        ge=1,
+        le=8,
+        description="Render the NxN block of tiles containing this tile in one pass "
+        "and cache all of them.",
+        examples=[4],
+    ),
 ):
     """
     Produces the map data tiles
     """
 
-    settings = get_settings()
+    tile_cache = get_tile_cache()
+
+    def cache_key(tile_x: int, tile_y: int) -> str:
+        return _data_tile_cache_key(
+            interp,
+            radius,
+            neighbours,
+            projection,
+            dataset,
+            variable,
+            time,
+            depth,
+            scale,
+            zoom,
+            tile_x,
+            tile_y,
+        )
 
-    f = os.path.join(
-        settings.cache_dir,
-        "api",
-        "v2.0",
-        "tiles",
-        str(interp),
-        str(radius),
-        str(neighbours),
-        projection,
-        dataset,
-        variable,
-        str(time),
-        depth,
-        scale,
-        str(zoom),
-        str(x),
-        f"{y}.png",
-    )
+    key = cache_key(x, y)
+    f = tile_cache.get(key, ".png", dataset)
 
-    if os.path.isfile(f):
-        return FileResponse(
+    if f is not None:
+        return Response(
             f,
             media_type="image/png",
             headers={"Cache-Control": f"max-age={MAX_CACHE}"},
         )
 
-    if depth != "bottom" and depth != "all":
-        depth = int(depth)
+    args = {
+        "interp": interp,
+        "radius": radius * 1000,
+        "neighbours": neighbours,
+        "dataset": dataset,
+        "variable": variable,
+        "time": time,
+        "depth": depth if depth in ["bottom", "all"] else int(depth),
+        "scale": scale,
+    }
 
-    img = await plotting.tile.plot(
-        projection,
-        x,
-        y,
-        zoom,
-        {
-            "interp": interp,
-            "radius": radius * 1000,
-            "neighbours": neighbours,
-            "dataset": dataset,
-            "variable": variable,
-            "time": time,
-            "depth": depth,
-            "scale": scale,
-        },
-    )
+    async def render() -> dict:
+        pngs = await get_render_executor().run_in_process(
+            "data_tile",
+            plotting.tile.plot_metatile_png,
+            projection,
+            x,
+            y,
+            zoom,
+            metatile,
+            args,
+        )
 
-    buf = BytesIO()
-    img.save(buf, format="PNG", optimize=True)
-    buf.seek(0)
+        # Cache the whole block so the neighbouring requests are hits.
+        for (tile_x, tile_y), png in pngs.items():
+            tile_cache.put(cache_key(tile_x, tile_y), png, ".png", dataset)
 
-    return _cache_and_send_img(buf, f)
+        return pngs
+
+    # Concurrent requests for any tile of the same block share one render.
+    x0, y0, _, _ = plotting.tile.metatile_bounds(x, y, zoom, metatile)
+    pngs = await _tile_flights.do((cache_key(x0, y0), metatile), render)
+
+    return _send_img(pngs[(x, y)], f"{key}.png")
 
 
 @router.get(
@@ -856,52 +888,51 @@ async def quiver_tile(
     projection: str = Query(
         default="EPSG:3857", description="EPSG projection code.", examples=["EPSG:3857"]
     ),
+    format: e.QuiverFormat = Query(
+        default=e.QuiverFormat.geojson,
+        description=(
+            "geojson for a FeatureCollection of points, or columnar for a single "
+            "object of parallel lon, lat, data, bearing and scale arrays."
+        ),
+    ),
 ):
     """
-    Returns a geojson representation of requested model data.
-    """
+    Returns a geojson (or columnar JSON) representation of requested model data.
+    """
+
+    tile_cache = get_tile_cache()
+
+    key_parts = ("quiver", projection, dataset, variable, time, depth, density_adj)
+    if format != e.QuiverFormat.geojson:
+        key_parts += (format.value,)
+    key = TileCache.key(*key_parts, zoom, x, y)
+    cached = tile_cache.get(key, ".geojson", dataset)
+
+    if cached is not None:
+        log().info(f"Using cached {key}.geojson.")
+        return Response(cached, media_type="application/json")
+
+    async def render():
+        data = await get_render_executor().run_in_thread(
+            "quiver_tile",
+            plotting.tile.quiver,
+            dataset,
+            variable,
+            time,
+            depth,
+            density_adj,
+            x,
+            y,
+            zoom,
+            projection,
+            format.value,
+        )
 
-    settings = get_settings()
+        tile_cache.put(key, data, ".geojson", dataset)
 
-    cached_file_name = os.path.join(
-        settings.cache_dir,
-        "api",
-        "v2.0",
-        "tiles",
-        "quiver",
-        projection,
-        dataset,
-        variable,
-        str(time),
-        depth,
-        str(density_adj),
-        str(zoom),
-        str(x),
-        f"{y}.geojson",
-    )
+        return data
 
-    if os.path.isfile(cached_file_name):
-        log().info(f"Using cached {cached_file_name}.")
-        return FileResponse(cached_file_name, media_type="application/json")
-
-    data = await plotting.tile.quiver(
-        dataset,
-        variable,
-        time,
-        depth,
-        density_adj,
-        x,
-        y,
-        zoom,
-        projection,
-    )
-
-    path = pathlib.Path(cached_file_name).parent
-    path.mkdir(parents=True, exist_ok=True)
-    with open(cached_file_name, "w", encoding="utf-8") as f:
-        geojson.dump(data, f)
-
-    return data
+    return Response(await _tile_flights.do(key, render), media_type="application/json")
 
 
 @router.get("/tiles/topo/{zoom}/{x}/{y}")
@@ -927,27 +958,18 @@ def topography_tiles(
             headers={"Cache-Control": f"max-age={MAX_CACHE}"},
         )
 
-    f = os.path.join(
-        settings.cache_dir,
-        "api",
-        "v2.0",
-        "tiles",
-        "topo",
-        projection,
-        str(zoom),
-        str(x),
-        f"{y}.png",
-    )
+    key = TileCache.key("topo", projection, shaded_relief, zoom, x, y)
+    f = get_tile_cache().get(key, ".png")
 
-    if os.path.isfile(f):
-        return FileResponse(
+    if f is not None:
+        return Response(
             f,
             media_type="image/png",
             headers={"Cache-Control": f"max-age={MAX_CACHE}"},
         )
 
     img = plot_topography(projection, x, y, zoom, shaded_relief)
-    return _cache_and_send_img(img, f)
+    return _cache_and_send_img(img, key)
 
 
 @router.get("/tiles/bath/{zoom}/{x}/{y}")
@@ -972,27 +994,23 @@ async def bathymetry_tiles(
             headers={"Cache-Control": f"max-age={MAX_CACHE}"},
         )
 
-    f = os.path.join(
-        settings.cache_dir,
-        "api",
-        "v2.0",
-        "tiles",
-        "bath",
-        projection,
-        str(zoom),
-        str(x),
-        f"{y}.png",
-    )
+    key = TileCache.key("bath", projection, zoom, x, y)
+    f = get_tile_cache().get(key, ".png")
 
-    if os.path.isfile(f):
-        return FileResponse(
+    if f is not None:
+        return Response(
             f,
             media_type="image/png",
             headers={"Cache-Control": f"max-age={MAX_CACHE}"},
         )
 
-    img = await plot_bathymetry(projection, x, y, zoom)
-    return _cache_and_send_img(img, f)
+    async def render() -> bytes:
+        png = await get_render_executor().run_in_process(
+            "bathymetry_tile", plot_bathymetry, projection, x, y, zoom
+        )
+        return _cache_img(BytesIO(png), key)
+
+    return _send_img(await _tile_flights.do(key, render), f"{key}.png")
 
 
 @router.get("/mbt/{tiletype}/{zoom}/{x}/{y}")
@@ -1012,18 +1030,8 @@ def mbt(
     settings = get_settings()
 
     shape_file_dir = settings.shape_file_dir
-    requestf = pathlib.Path(
-        settings.cache_dir,
-        "api",
-        "v2.0",
-        "mbt",
-        projection,
-        tiletype,
-        str(zoom),
-        str(x),
-        str(y),
-    )
-    basedir = requestf.parents[0]
+    tile_cache = get_tile_cache()
+    key = TileCache.key("mbt", projection, tiletype, zoom, x, y)
 
     # Send blank tile if conditions aren't met
     blank_response = FileResponse(
@@ -1039,9 +1047,10 @@ def mbt(
         return blank_response
 
     # Send file if cached or select data in SQLite file
-    if requestf.is_file():
-        return FileResponse(
-            requestf.as_posix(),
+    requestf = tile_cache.get(key, "")
+    if requestf is not None:
+        return Response(
+            requestf,
             media_type="image/png",
             headers={"Cache-Control": f"max-age={MAX_CACHE}"},
         )
@@ -1055,20 +1064,34 @@ def mbt(
     if tile is None:
         return blank_response
 
-    # Write tile to cache and send file
-    basedir.mkdir(parents=True, exist_ok=True)
-    with open(requestf.as_posix() + ".pbf", "wb") as f:
-        f.write(tile[0])
-    with gzip.open(requestf.as_posix() + ".pbf", "rb") as gzipped:
-        with open(requestf, "wb") as tileout:
-            shutil.copyfileobj(gzipped, tileout)
-    return FileResponse(
-        requestf,
+    # Write tile to cache and send it
+    png = gzip.decompress(tile[0])
+    tile_cache.put(key, png, "")
+    return Response(
+        png,
         media_type="image/png",
         headers={"Cache-Control": f"max-age={MAX_CACHE}"},
     )
 
 
+@router.get("/tiles/cache/stats")
+def tile_cache_stats():
+    """
+    Returns the size and hit/miss/eviction counters of this worker's tile cache,
+    along with the number of tile renders in flight and coalesced
+    """
+    return JSONResponse({**get_tile_cache().stats(), **_tile_flights.stats()})
+
+
+@router.get("/render/stats")
+def render_stats():
+    """
+    Returns the queue depth, running count and wait time of each kind of render
+    work on this worker
+    """
+    return JSONResponse(get_render_executor().stats())
+
+
 @router.get("/observation/datatypes.json")
 def observation_datatypes(db: Session = Depends(get_db)):
     """
@@ -1241,33 +1264,36 @@ def observation_track(
     )
 
     if len(coordinates) > 1:
-        df = pd.DataFrame(np.array(coordinates), columns=["id", "type", "lon", "lat"])
-        df["id"] = df.id.astype(int)
-        df["lon"] = (df["lon"] + 360) % 360
-
-        vc = df.id.value_counts()
-        for p_id in vc.where(vc > 1).dropna().index:
-            d = {
-                "type": "Feature",
-                "geometry": {
-                    "type": "LineString",
-                    "coordinates": df[["lon", "lat"]][df.id == p_id].values.tolist(),
-                },
-                "properties": {
-                    "id": int(p_id),
-                    "type": df.type[df.id == p_id].values[0].name,
-                    "class": "observation",
-                },
-            }
-            data.append(d)
+        # Coordinates are ordered by platform, then time, so each track is a run
+        # of rows with the same platform id.
+        ids = np.array([c[0] for c in coordinates], dtype=np.int64)
+        lonlat = np.array([(c[2], c[3]) for c in coordinates], dtype=np.float64)
+        lonlat[:, 0] = (lonlat[:, 0] + 360) % 360
+
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        ends = np.r_[starts[1:], len(ids)]
+        for start, end in zip(starts, ends):
+            if end - start < 2:
+                continue
 
-    result = {
-        "type": "FeatureCollection",
-        "features": data,
-    }
+            data.append(
+                {
+                    "type": "Feature",
+                    "geometry": {
+                        "type": "LineString",
+                        "coordinates": lonlat[start:end].tolist(),
+                    },
+                    "properties": {
+                        "id": int(ids[start]),
+                        "type": coordinates[start][1].name,
+                        "class": "observation",
+                    },
+                }
+            )
 
-    return JSONResponse(
-        result,
+    return StreamingResponse(
+        _stream_feature_collection(data),
+        media_type="application/json",
         headers={"Cache-Control": f"max-age={MAX_CACHE}"},
     )
 
@@ -1320,7 +1346,6 @@ def observation_point(
             params[MAPPING[k]] = float(v)
 
     checkpoly = False
-    with_radius = False
     if "area" in query_dict:
         area = json.loads(query_dict.get("area"))
         if len(area) > 1:
@@ -1336,41 +1361,34 @@ def observation_point(
             params["latitude"] = area[0][0]
             params["longitude"] = area[0][1]
             params["radius"] = float(query_dict.get("radius", 10))
-            with_radius = True
-
-    if with_radius:
-        stations = ob_queries.get_stations_radius(session=db, **params)
-    else:
-        stations = ob_queries.get_stations(session=db, **params)
 
-    if len(stations) > 500:
-        stations = stations[:: round(len(stations) / 500)]
+    # Thinned to at most 500 stations by the database.
+    stations = ob_queries.get_station_points(db, limit=500, **params)
 
-    for s in stations:
-        if checkpoly and not poly.contains(Point(s.latitude, s.longitude)):
-            continue
+    if checkpoly and stations:
+        inside = shapely.contains_xy(
+            poly, [s[2] for s in stations], [s[3] for s in stations]
+        )
+        stations = [s for s, keep in zip(stations, inside) if keep]
 
+    for station_id, name, latitude, longitude, platform_type in stations:
         d = {
             "type": "Feature",
-            "geometry": {"type": "Point", "coordinates": [s.longitude, s.latitude]},
+            "geometry": {"type": "Point", "coordinates": [longitude, latitude]},
             "properties": {
-                "type": s.platform.type.name,
-                "id": s.id,
+                "type": platform_type.name,
+                "id": station_id,
                 "class": "observation",
             },
         }
-        if s.name:
-            d["properties"]["name"] = s.name
+        if name:
+            d["properties"]["name"] = name
 
         data.append(d)
 
-    result = {
-        "type": "FeatureCollection",
-        "features": data,
-    }
-
-    return JSONResponse(
-        result,
+    return StreamingResponse(
+        _stream_feature_collection(data),
+        media_type="application/json",
         headers={"Cache-Control": f"max-age={MAX_CACHE}"},
     )
 
@@ -1468,23 +1486,83 @@ def observation_variables(
     )
 
 
-def _cache_and_send_img(bytesIOBuff: BytesIO, f: str):
+def _data_tile_cache_key(
+    interp: str,
+    radius: int,
+    neighbours: int,
+    projection: str,
+    dataset: str,
+    variable: str,
+    time: int,
+    depth: str,
+    scale: str,
+    zoom: int,
+    x: int,
+    y: int,
+) -> str:
+    """
+    Returns the key of a data tile in the tile cache
+    """
+    return TileCache.key(
+        "data",
+        str(interp),
+        radius,
+        neighbours,
+        projection,
+        dataset,
+        variable,
+        time,
+        depth,
+        scale,
+        zoom,
+        x,
+        y,
+    )
+
+
+def _cache_img(bytesIOBuff: BytesIO, key: str, dataset: str = None) -> bytes:
     """
-    Caches a rendered image buffer on disk and sends it to the browser
+    Caches a rendered image buffer in the tile cache and returns the cached PNG
 
     bytesIOBuff: BytesIO object containing image data
-    f: filename of image to be cached
+    key: tile cache key of the image
+    dataset: key of the dataset the image was rendered from, if any
     """
-    p = pathlib.Path(f).parent
-    p.mkdir(parents=True, exist_ok=True)
-
     bytesIOBuff.seek(0)
     im = Image.open(bytesIOBuff)
-    im.save(f, format="PNG", optimize=True)
-    bytesIOBuff.seek(0)
+    png = BytesIO()
+    im.save(png, format="PNG", optimize=True)
+    get_tile_cache().put(key, png.getvalue(), ".png", dataset)
+
+    return png.getvalue()
 
+
+def _send_img(png: bytes, filename: str):
+    """
+    Sends PNG image data to the browser
+    """
     return StreamingResponse(
-        bytesIOBuff,
+        BytesIO(png),
         media_type="image/png",
-        headers={"Content-Disposition": f"attachment; filename=#{os.path.basename(f)}"},
+        headers={"Content-Disposition": f"attachment; filename=#{filename}"},
     )
+
+
+def _cache_and_send_img(bytesIOBuff: BytesIO, key: str, dataset: str = None):
+    """
+    Caches a rendered image buffer in the tile cache and sends it to the browser
+    """
+    return _send_img(_cache_img(bytesIOBuff, key, dataset), f"{key}.png")
+
+
+def _stream_feature_collection(features: list, batch_size: int = 1000):
+    """
+    Encodes a GeoJSON FeatureCollection of the given features a batch of
+    features at a time, so that the response can be streamed as it's encoded
+    """
+    yield '{"type": "FeatureCollection", "features": ['
+    for start in range(0, len(features), batch_size):
+        yield ("," if start else "") + ",".join(
+            json.dumps(f) for f in features[start : start + batch_size]
+        )
+    yield "]}"
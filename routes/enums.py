@@ -17,3 +17,8 @@ class InterpolationType(str, Enum):
     bilinear = "bilinear"
     inverse = "inverse"
     nearest = "nearest"
+
+
+class QuiverFormat(str, Enum):
+    geojson = "geojson"
+    columnar = "columnar"
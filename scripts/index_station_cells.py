@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+import os
+import sys
+
+import defopt
+import numpy as np
+from sqlalchemy import create_engine, inspect, select, text, update
+from sqlalchemy.orm import Session
+
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+
+from data.observational import Station
+from data.observational.orm.station import station_cell
+
+
+def main(uri: str, batch_size: int = 50000):
+    """Adds the spatial cell column and index to an existing stations table and
+    fills it in for stations imported before it existed.
+
+    :param str uri: Database URI
+    :param int batch_size: Number of stations updated per transaction
+    """
+    engine = create_engine(
+        uri,
+        connect_args={"connect_timeout": 10},
+        pool_recycle=3600,
+    )
+
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        if "cell" not in [c["name"] for c in inspector.get_columns("stations")]:
+            connection.execute(text("ALTER TABLE stations ADD COLUMN cell INTEGER"))
+
+        if "idx_stations_cell_time" not in [
+            i["name"] for i in inspector.get_indexes("stations")
+        ]:
+            connection.execute(
+                text("CREATE INDEX idx_stations_cell_time ON stations (cell, time)")
+            )
+
+    total = 0
+    with Session(engine) as session:
+        while True:
+            rows = session.execute(
+                select(Station.id, Station.latitude, Station.longitude)
+                .where(Station.cell.is_(None))
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            ids, latitudes, longitudes = (np.array(c) for c in zip(*rows))
+            cells = station_cell(latitudes, longitudes)
+
+            session.execute(
+                update(Station),
+                [{"id": i, "cell": c} for i, c in zip(ids.tolist(), cells.tolist())],
+            )
+            session.commit()
+
+            total += len(rows)
+            print(f"{total} stations indexed")
+
+
+if __name__ == "__main__":
+    defopt.run(main)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks data.calculated_parser.functions.potentialsubsurfacechannel against
+the per-profile implementation it replaced (scipy.signal.find_peaks and
+np.interp for every water column) on a synthetic (time, depth, y, x) cube, and
+checks that both give the same result.
+
+Run from the root of the repository:
+
+    python scripts/profiling_scripts/benchmark_pssc.py --shape 1 50 200 200
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import scipy.signal as spsignal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+import data.calculated_parser.functions as functions  # noqa: E402
+
+
+def synthetic_cube(shape, seed=0):
+    """Temperature and salinity profiles with a random warm subsurface layer,
+    rounded to get the flat peaks real model output has, and some land.
+    """
+    rng = np.random.default_rng(seed)
+    t, d, y, x = shape
+
+    depth = np.concatenate((np.linspace(0.5, 900, d - 3), [1100, 1500, 2000]))
+    z = depth[np.newaxis, :, np.newaxis, np.newaxis]
+    layer_depth = rng.uniform(50, 600, (t, 1, y, x))
+
+    temperature = (
+        10
+        + rng.normal(0, 1, (t, 1, y, x)) * np.exp(-z / 300)
+        + rng.uniform(-3, 3, (t, 1, y, x)) * np.exp(-((z - layer_depth) ** 2) / 2e4)
+        - 6 * (1 - np.exp(-z / 800))
+    )
+    temperature = np.round(temperature, 1)
+    salinity = np.full(shape, 35.0)
+
+    land = rng.random((1, 1, y, x)) < 0.1
+    temperature[np.broadcast_to(land, shape)] = np.nan
+    salinity[np.broadcast_to(land, shape)] = np.nan
+
+    latitude = np.broadcast_to(np.linspace(30, 60, y)[:, np.newaxis], (y, x))
+
+    return depth, latitude, np.squeeze(temperature), np.squeeze(salinity)
+
+
+def reference(depth, latitude, temperature, salinity, freq_cutoff=2755.03):
+    """The per-profile implementation, for comparison."""
+    depth = depth[depth < 1000]
+    depth_index = 1 if temperature.ndim == 4 else 0
+    temp = np.take(temperature, indices=range(len(depth)), axis=depth_index)
+    sal = np.take(salinity, indices=range(len(depth)), axis=depth_index)
+
+    profiles = np.moveaxis(functions.sspeed(depth, latitude, temp, sal), depth_index, 0)
+    result = np.zeros(profiles.shape[1:])
+
+    for index in np.ndindex(*profiles.shape[1:]):
+        profile = profiles[(slice(None),) + index]
+        minima = spsignal.find_peaks(-profile)[0]
+        maxima = spsignal.find_peaks(profile)[0]
+
+        # calculate_del_C
+        first_minimum = minima[0] if len(minima) > 0 else -1
+        first_maximum = maxima[0] if len(maxima) > 0 else -1
+        Cmin = profile[first_minimum] if first_minimum != -1 else np.nan
+        start = depth[first_maximum] if first_maximum != -1 else np.nan
+        Cmax = profile[first_maximum] if first_minimum != -1 else np.nan
+        end = np.interp(Cmax, profile, depth)
+        delC = Cmin / np.power(freq_cutoff * (end - start) / (0.2652 * Cmin), 2)
+
+        if len(minima) >= 2 and len(maxima) >= 1:
+            p1, p2 = 0, minima[0]
+            if len(maxima) >= 2:
+                p1, p3 = maxima[0], maxima[1]
+            else:
+                p3 = maxima[0]
+            if p3 > p2:
+                c1 = abs(profile[p1] - profile[p2])
+                c2 = abs(profile[p3] - profile[p2])
+                if c1 > delC and c2 > delC:
+                    result[index] = 1
+
+    return result
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--shape",
+        type=int,
+        nargs=4,
+        default=[1, 50, 200, 200],
+        metavar=("TIME", "DEPTH", "Y", "X"),
+    )
+    args = parser.parse_args()
+
+    cube = synthetic_cube(tuple(args.shape))
+
+    depth, latitude, temperature, salinity = cube
+    upper = depth < 1000
+    depth_index = 1 if temperature.ndim == 4 else 0
+
+    with np.errstate(all="ignore"):
+        expected, reference_time = timed(reference, *cube)
+        actual, vectorized_time = timed(functions.potentialsubsurfacechannel, *cube)
+        # Common to both implementations.
+        _, sound_speed_time = timed(
+            functions.sspeed,
+            depth[upper],
+            latitude,
+            np.compress(upper, temperature, axis=depth_index),
+            np.compress(upper, salinity, axis=depth_index),
+        )
+
+    print(f"shape:       {tuple(args.shape)}")
+    print(f"per-column:  {reference_time:.3f}s")
+    print(f"vectorized:  {vectorized_time:.3f}s")
+    print(f"sound speed: {sound_speed_time:.3f}s (included in both)")
+    print(
+        "speedup:     {:.1f}x ({:.1f}x excluding sound speed)".format(
+            reference_time / vectorized_time,
+            (reference_time - sound_speed_time)
+            / max(vectorized_time - sound_speed_time, 1e-9),
+        )
+    )
+    print(f"identical:   {np.array_equal(actual, expected)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,16 @@
+import json
+import unittest
+
+import geojson
+import numpy as np
 import xarray as xr
 from geojson import FeatureCollection
 
-from data.transformers.geojson import data_array_to_geojson
+from data.transformers.geojson import (
+    data_array_to_columnar,
+    data_array_to_geojson,
+    data_array_to_geojson_bytes,
+)
 
 
 class GeoJSONTest:
@@ -13,10 +22,10 @@ class GeoJSONTest:
     def tearDown(self) -> None:
         self.data_array.close()
 
-    async def test_data_array_to_geojson_builds_correct_feature_collection(
+    def test_data_array_to_geojson_builds_correct_feature_collection(
         self,
     ) -> None:
-        result = await data_array_to_geojson(
+        result = data_array_to_geojson(
             self.data_array.votemper[0, 0, :5, :5],
             None,
             self.data_array["latitude"][:5],
@@ -26,11 +35,71 @@ class GeoJSONTest:
         self.assertIsInstance(result, FeatureCollection)
         self.assertEqual(25, len(result["features"]))
 
-    async def test_data_array_to_geojson_raises_when_data_not_2d(self) -> None:
+    def test_data_array_to_geojson_raises_when_data_not_2d(self) -> None:
         with self.assertRaises(ValueError):
-            await data_array_to_geojson(
+            data_array_to_geojson(
                 self.data_array.votemper[:, 0, :5, :5],
                 None,
                 self.data_array["latitude"][:5],
                 self.data_array["longitude"][:5],
             )
+
+
+class TestGeoJSONEncoders(unittest.TestCase):
+    def setUp(self) -> None:
+        values = np.array([[1.23456, np.nan, 3.0], [-0.5, 0.25, 2.0]])
+        self.data_array = xr.DataArray(
+            values, attrs={"units": "m s-1", "long_name": 'Sea "water" velocity'}
+        )
+        self.bearings = xr.DataArray([[90.0, 180.0, np.nan], [0.0, 45.5, 270.0]])
+        self.lat = xr.DataArray(np.array([45.1234567, 46.0], np.float32))
+        self.lon = xr.DataArray(np.array([190.0, 300.5, 359.0], np.float32))
+
+    def test_bytes_match_feature_collection(self) -> None:
+        for bearings in [None, self.bearings]:
+            expected = geojson.dumps(
+                data_array_to_geojson(
+                    self.data_array, bearings, self.lat, self.lon, [0, 2]
+                )
+            )
+
+            result = data_array_to_geojson_bytes(
+                self.data_array, bearings, self.lat, self.lon, [0, 2]
+            )
+
+            self.assertEqual(result, expected.encode())
+
+    def test_skips_missing_values_and_bearings(self) -> None:
+        result = json.loads(
+            data_array_to_geojson_bytes(
+                self.data_array, self.bearings, self.lat, self.lon, [0, 2]
+            )
+        )
+
+        self.assertEqual(len(result["features"]), 4)
+        self.assertEqual(
+            result["features"][0]["properties"],
+            {
+                "units": "m s-1",
+                "name": 'Sea "water" velocity',
+                "data": 1.234,
+                "bearing": 90.0,
+                "scale": 7,
+            },
+        )
+        self.assertEqual(
+            result["features"][0]["geometry"]["coordinates"], [-170.0, 45.123455]
+        )
+
+    def test_columnar(self) -> None:
+        result = json.loads(
+            data_array_to_columnar(
+                self.data_array, self.bearings, self.lat, self.lon, [0, 2]
+            )
+        )
+
+        self.assertEqual(result["lon"], [-170.0, -170.0, -59.5, -1.0])
+        self.assertEqual(result["data"], [1.234, -0.5, 0.25, 2.0])
+        self.assertEqual(result["bearing"], [90.0, 0.0, 45.5, 270.0])
+        self.assertEqual(result["scale"], [7, 0, 2, 9])
+        self.assertEqual(result["units"], "m s-1")
@@ -1,15 +1,19 @@
 #!/usr/bin/env python
 import datetime
+import importlib.util
 import json
+import os
 import unittest
 from unittest.mock import MagicMock, PropertyMock, patch
 
+import pytest
 from fastapi.testclient import TestClient
 from pytest import approx
 
 import routes.enums as e
 from oceannavigator import create_app
 from oceannavigator.settings import get_settings
+from utils.render_executor import RenderExecutor
 
 
 class TestAPIv2:
@@ -242,6 +246,27 @@ class TestAPIv2:
         response = self.client.get(self.api_links["plot_transect_csv"])
         assert response.status_code == 200
 
+    @pytest.mark.skipif(
+        not os.path.isfile("tests/testdata/giops_test.nc")
+        or importlib.util.find_spec("osgeo") is None,
+        reason="Dependent on local resources.",
+    )
+    @patch("routes.api_v2_0.get_render_executor")
+    def test_plot_in_render_process(self, patch_executor):
+        executor = RenderExecutor(1, 1)
+        patch_executor.return_value = executor
+
+        try:
+            for link in ("plot_map", "plot_transect"):
+                response = self.client.get(self.api_links[link])
+                assert response.status_code == 200
+
+            assert executor._processes is not None
+            assert executor.stats()["map"]["completed"] == 1
+            assert executor.stats()["transect"]["completed"] == 1
+        finally:
+            executor.shutdown()
+
     def test_plot_timeseries_endpoint(self):
         response = self.client.get(self.api_links["plot_timeseries"])
         assert response.status_code == 200
@@ -324,11 +349,13 @@ class TestAPIv2:
         for resp in response:
             assert resp.status_code == 200
 
-    @patch("routes.api_v2_0._cache_and_send_img")
-    @patch("plotting.tile.plot")
-    def test_tile_endpoint(self, patch_tile, patch_cache_img):
-        patch_tile.save.return_value = None
-        patch_cache_img.return_value = None
+    @patch("routes.api_v2_0.get_tile_cache")
+    @patch("routes.api_v2_0.get_render_executor")
+    @patch("plotting.tile.plot_metatile_png")
+    def test_tile_endpoint(self, patch_tile, patch_executor, patch_tile_cache):
+        patch_tile.return_value = {(50, 40): b""}
+        patch_executor.return_value = RenderExecutor(1, 0)
+        patch_tile_cache.return_value.get.return_value = None
         response = self.client.get(
             "/api/v2.0/tiles/giops_real/votemper/2212704000/0/6/50/40"
             "?projection=EPSG:3857&scale=-5,30&interp=gaussian&radius=25&neighbours=10"
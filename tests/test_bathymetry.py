@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from netCDF4 import Dataset
+
+from data.bathymetry import BathymetryRaster
+
+
+class TestBathymetryRaster(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+        self.path = os.path.join(self.tmp.name, "etopo.nc")
+        self.z = np.arange(600 * 400, dtype=np.float32).reshape(600, 400)
+
+        with Dataset(self.path, "w") as ds:
+            ds.createDimension("y", 600)
+            ds.createDimension("x", 400)
+            ds.createVariable("y", "f8", ("y",))[:] = np.linspace(-90, 90, 600)
+            ds.createVariable("x", "f8", ("x",))[:] = np.linspace(-180, 180, 400)
+            z = ds.createVariable("z", "f4", ("y", "x"), zlib=True, fill_value=-1)
+            z[:] = self.z
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_window_matches_netcdf(self):
+        raster = BathymetryRaster(self.path, self.cache_dir)
+
+        with Dataset(self.path, "r") as ds:
+            expected = ds["z"][256:512, 0:256]
+
+        np.testing.assert_array_equal(raster.window(256, 512, 0, 256), expected)
+        np.testing.assert_array_equal(raster.coords["y"], np.linspace(-90, 90, 600))
+        self.assertEqual(raster.shape, (600, 400))
+
+    def test_converts_once(self):
+        BathymetryRaster(self.path, self.cache_dir)
+        (npy,) = Path(self.cache_dir).glob("*.npy")
+        mtime = npy.stat().st_mtime_ns
+
+        raster = BathymetryRaster(self.path, self.cache_dir)
+
+        self.assertIsInstance(raster.z, np.memmap)
+        self.assertEqual(list(Path(self.cache_dir).iterdir()), [npy])
+        self.assertEqual(npy.stat().st_mtime_ns, mtime)
+
+    def test_masks_fill_values(self):
+        with Dataset(self.path, "a") as ds:
+            ds["z"][0, 0:10] = np.ma.masked
+
+        window = BathymetryRaster(self.path, self.cache_dir).window(0, 1, 0, 20)
+
+        self.assertEqual(window.mask.sum(), 10)
+
+    def test_replaced_file_is_converted_again(self):
+        BathymetryRaster(self.path, self.cache_dir)
+
+        with Dataset(self.path, "a") as ds:
+            ds["z"][0, 0] = 42
+        os.utime(self.path, ns=(0, 0))
+
+        raster = BathymetryRaster(self.path, self.cache_dir)
+
+        self.assertEqual(raster.window(0, 1, 0, 1)[0, 0], 42)
+        self.assertEqual(len(list(Path(self.cache_dir).glob("*.npy"))), 2)
@@ -188,6 +188,58 @@ class TestCalculatedArray(unittest.TestCase):
         self.assertEqual(array[1, 0], 9)
         self.assertEqual(array[1, 1], 10)
 
+    def test_lazy(self):
+        values = np.arange(6 * 5 * 4, dtype=np.float32).reshape(6, 5, 4)
+        dataset = xr.Dataset(
+            {
+                "var": (("time", "y", "x"), values),
+                "var2": (("time", "y", "x"), values + 1),
+            }
+        ).chunk({"time": 2, "y": 3})
+        array = CalculatedArray(dataset, "var * 2 + var2", ["time", "y", "x"])
+
+        lazy = array.isel(lazy=True, time=slice(1, 6), y=slice(0, 5, 2))
+
+        self.assertIsNotNone(lazy.chunks)
+        self.assertEqual(lazy.chunks, ((2, 2, 1), (3,), (4,)))
+        self.assertEqual(lazy.dtype, np.float32)
+        np.testing.assert_array_equal(
+            lazy.values, array.isel(time=slice(1, 6), y=slice(0, 5, 2)).values
+        )
+
+    def test_lazy_integer_keys(self):
+        values = np.arange(6 * 5 * 4, dtype=np.float32).reshape(6, 5, 4)
+        dataset = xr.Dataset({"var": (("time", "y", "x"), values)}).chunk({"time": 2})
+        array = CalculatedArray(dataset, "var * 2", ["time", "y", "x"])
+
+        eager = array.isel(time=1, x=slice(0, 2))
+        lazy = array.isel(lazy=True, time=1, x=slice(0, 2))
+
+        self.assertEqual(lazy.shape, (5, 2))
+        self.assertEqual(lazy.dims, ("y", "x"))
+        np.testing.assert_array_equal(lazy.values, eager.values)
+
+        dataset = dataset.assign_coords(
+            time=np.arange(6), y=np.arange(5), x=np.arange(4)
+        )
+        array = CalculatedArray(dataset, "var * 2", ["time", "y", "x"])
+
+        self.assertEqual(array.isel(lazy=True, time=1).shape, array.isel(time=1).shape)
+
+    def test_lazy_chunks_only_separable_dims(self):
+        dataset = xr.Dataset(
+            {
+                "var": (("time", "y", "x"), np.ones((3, 4, 5))),
+                "lat": (("y", "x"), np.ones((4, 5))),
+            }
+        ).chunk({"time": 1, "y": 2})
+
+        lazy = CalculatedArray(
+            dataset, "gradient_x(var, lat, lat)", ["time", "y", "x"]
+        ).lazy((slice(None), slice(None), slice(None)))
+
+        self.assertEqual(lazy.chunks, ((1, 1, 1), (4,), (5,)))
+
     def assertIsNan(self, value):
         v = value
         return self.assertTrue(np.isnan(v))
@@ -93,3 +93,74 @@ class TestCalculatedParser(unittest.TestCase):
                 )
 
                 self.assertEqual(result.shape, case[1])
+
+    def test_compiled_expressions_are_cached(self):
+        first = data.calculated_parser.parser.compile_expression("votemper * 2")
+        second = data.calculated_parser.parser.compile_expression("votemper * 2")
+
+        self.assertIs(first, second)
+        self.assertEqual(first.variables, {"votemper"})
+
+    def test_separable_dims(self):
+        dims = ["time", "depth", "latitude", "longitude"]
+        cases = [
+            ["votemper * 2 + vosaline", dims],
+            ["density(depth, latitude, votemper, vosaline)", dims],
+            ["gradient_x(votemper, latitude, longitude)", ["time"]],
+            ["soniclayerdepth([depth], latitude, [votemper], [vosaline])", ["time"]],
+            ["votemper - max(votemper)", []],
+        ]
+
+        for case in cases:
+            expression = data.calculated_parser.parser.compile_expression(case[0])
+            self.assertEqual(
+                expression.separable_dims(dims), case[1], msg=f"Equation: {case[0]}"
+            )
+
+    def test_shared_memo(self):
+        ds = self._sound_speed_dataset()
+        key = (0, slice(0, 10), slice(0, 3), slice(0, 4))
+        dims = ["time", "depth", "y", "x"]
+        expressions = [
+            "soniclayerdepth(depth, latitude, votemper, vosaline)",
+            "deepsoundchannel(depth, latitude, votemper, vosaline)",
+        ]
+        expected = [
+            data.calculated_parser.parser.compile_expression(e).evaluate(ds, key, dims)
+            for e in expressions
+        ]
+
+        memo = data.calculated_parser.parser.new_memo()
+        with patch(
+            "data.calculated_parser.functions.sspeed",
+            wraps=data.calculated_parser.functions.sspeed,
+        ) as sspeed:
+            results = [
+                data.calculated_parser.parser.compile_expression(e).evaluate(
+                    ds, key, dims, memo
+                )
+                for e in expressions
+            ]
+
+        self.assertEqual(sspeed.call_count, 1)
+        for result, e in zip(results, expected):
+            np.testing.assert_array_equal(result, e)
+
+    def _sound_speed_dataset(self):
+        depth = np.linspace(0, 1000, 10)
+        temperature = (
+            10
+            + 3 * np.exp(-((depth - 150) ** 2) / 5e3)
+            - 8 * np.exp(-((depth - 600) ** 2) / 1e5)
+        )
+        return xr.Dataset(
+            {
+                "depth": ("depth", depth),
+                "latitude": (("y", "x"), np.full((3, 4), 45.0)),
+                "votemper": (
+                    ("time", "depth", "y", "x"),
+                    np.tile(temperature[None, :, None, None], (1, 1, 3, 4)),
+                ),
+                "vosaline": (("time", "depth", "y", "x"), np.full((1, 10, 3, 4), 35.0)),
+            }
+        )
@@ -2,6 +2,9 @@
 """
 import unittest
 
+import matplotlib
+import numpy as np
+
 import plotting.colormap
 
 
@@ -17,3 +20,25 @@ class TestColormap(unittest.TestCase):
     def test_find_colormap_default(self):
         cmap = plotting.colormap.find_colormap("foo")
         self.assertEqual(cmap, plotting.colormap.colormaps["mercator"])
+
+    def test_colormap_lut_matches_scalar_mappable(self):
+        cmap = plotting.colormap.colormaps["temperature"]
+        data = np.ma.masked_array(
+            np.linspace(-5, 35, 400).reshape(20, 20), mask=np.zeros((20, 20))
+        )
+        data[0, :5] = np.nan
+        data[1, :5] = np.ma.masked
+        data[2, :5] = 30
+        mask = np.zeros(data.shape, dtype=bool)
+        mask[3, :5] = True
+
+        sm = matplotlib.cm.ScalarMappable(
+            matplotlib.colors.Normalize(vmin=-2, vmax=30), cmap=cmap
+        )
+        expected = sm.to_rgba(np.ma.masked_invalid(np.ma.masked_where(mask, data)))
+        expected = (expected * 255.0).astype(np.uint8)
+
+        lut = plotting.colormap.get_colormap_lut(cmap, -2, 30)
+
+        np.testing.assert_array_equal(lut(data, mask), expected)
+        self.assertIs(plotting.colormap.get_colormap_lut(cmap, -2, 30), lut)
@@ -1,8 +1,10 @@
 #!/usr/bin/env python
 
 import unittest
+from unittest.mock import patch
 
 import numpy as np
+import scipy.signal
 import xarray as xr
 
 import data.calculated_parser.functions as funcs
@@ -63,3 +65,89 @@ class TestDataFunctions(unittest.TestCase):
             ),
             0,
         )
+
+    def test_first_two_peaks_matches_find_peaks(self):
+        rng = np.random.default_rng(0)
+        data = np.round(rng.normal(size=(30, 200)), 1)  # rounded to get plateaus
+        data[rng.random(data.shape) < 0.05] = np.nan
+
+        first, second, count = getattr(funcs, "__first_two_peaks")(data)
+
+        for i, column in enumerate(data.T):
+            peaks = scipy.signal.find_peaks(column)[0]
+            self.assertEqual(count[i], len(peaks))
+            self.assertEqual(first[i], peaks[0] if len(peaks) > 0 else -1)
+            self.assertEqual(second[i], peaks[1] if len(peaks) > 1 else -1)
+
+    def test_interp_columns_matches_interp(self):
+        rng = np.random.default_rng(0)
+        fp = np.linspace(0, 1000, 20)
+
+        for n in (3, 20):
+            xp = rng.normal(1500, 3, (n, 200))
+            xp[rng.random(xp.shape) < 0.05] = np.nan
+            x = np.concatenate((xp[0, :100], rng.normal(1500, 4, 100)))
+
+            actual = getattr(funcs, "__interp_columns")(x, xp, fp[:n])
+            expected = [np.interp(x[i], xp[:, i], fp[:n]) for i in range(200)]
+
+            np.testing.assert_array_equal(actual, expected)
+
+    def test_potentialsubsurfacechannel(self):
+        depth = np.linspace(0, 900, 31)
+        warm_layer = 6 * np.exp(-((depth - 300) ** 2) / 5e3)
+        temp = np.stack(
+            (
+                10 - 8 * (1 - np.exp(-depth / 200)) + warm_layer,
+                10 - 8 * (1 - np.exp(-depth / 200)),
+            ),
+            axis=1,
+        )
+        temp = np.repeat(temp[:, :, np.newaxis], 2, axis=2)
+        sal = np.full(temp.shape, 35.0)
+        lat = np.full((2, 2), 45.0)
+
+        actual = funcs.potentialsubsurfacechannel(depth, lat, temp, sal)
+
+        np.testing.assert_array_equal(actual, [[1.0, 1.0], [0.0, 0.0]])
+
+    def test_vorticity_matches_per_slice(self):
+        rng = np.random.default_rng(0)
+        lon, lat = np.meshgrid(np.linspace(-60, -50, 7), np.linspace(40, 50, 6))
+        u = xr.Variable(("time", "depth", "y", "x"), rng.random((2, 3, 6, 7)))
+        v = xr.Variable(("time", "depth", "y", "x"), rng.random((2, 3, 6, 7)))
+
+        actual = funcs.vorticity(u, v, lat, lon)
+
+        self.assertEqual(actual.shape, (2, 3, 6, 7))
+        for t in range(2):
+            for d in range(3):
+                np.testing.assert_array_equal(
+                    actual[t, d], funcs.vorticity(u[t, d], v[t, d], lat, lon)
+                )
+
+    def test_gradient_of_linear_field(self):
+        lon, lat = np.meshgrid(np.linspace(-60, -50, 11), np.linspace(0, 0.1, 3))
+        dx, _ = funcs.metpy.calc.lat_lon_grid_deltas(lon, lat)
+        field = np.cumsum(
+            np.concatenate((np.zeros((3, 1)), dx.magnitude), axis=1), axis=1
+        )
+        d = xr.Variable(("depth", "y", "x"), np.stack((field, 2 * field)))
+
+        actual = funcs.gradient_x(d, lat, lon)
+
+        np.testing.assert_allclose(actual[0], 1)
+        np.testing.assert_allclose(actual[1], 2)
+
+    def test_grid_deltas_are_cached(self):
+        lon, lat = np.meshgrid(np.linspace(-30, -20, 5), np.linspace(10, 20, 4))
+        h = xr.Variable(("time", "y", "x"), np.ones((2, 4, 5)))
+
+        with patch(
+            "metpy.calc.lat_lon_grid_deltas",
+            wraps=funcs.metpy.calc.lat_lon_grid_deltas,
+        ) as deltas:
+            funcs.geostrophic_x(h, lat, lon)
+            funcs.geostrophic_y(h * 2, lat, lon)
+
+        self.assertEqual(deltas.call_count, 1)
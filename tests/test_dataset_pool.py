@@ -0,0 +1,102 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+import netCDF4
+
+from data.dataset_pool import DatasetPool
+
+
+class TestDatasetPool(unittest.TestCase):
+    def test_acquire_reuses_open_dataset(self):
+        pool = DatasetPool(max_size=2)
+        opener = MagicMock()
+
+        entry = pool.acquire("giops", opener)
+        pool.release(entry)
+        entry_2 = pool.acquire("giops", opener)
+
+        self.assertIs(entry.dataset, entry_2.dataset)
+        opener.assert_called_once()
+        self.assertEqual(pool.stats()["hits"], 1)
+        self.assertEqual(pool.stats()["misses"], 1)
+
+    def test_evicts_least_recently_used_idle_entry(self):
+        pool = DatasetPool(max_size=1)
+
+        first = pool.acquire("giops", MagicMock)
+        pool.release(first)
+        second = pool.acquire("riops", MagicMock)
+
+        first.dataset.close.assert_called_once()
+        second.dataset.close.assert_not_called()
+        self.assertEqual(pool.stats()["evictions"], 1)
+
+    def test_does_not_close_dataset_in_use(self):
+        pool = DatasetPool(max_size=1)
+
+        first = pool.acquire("giops", MagicMock)
+        pool.acquire("riops", MagicMock)
+        first.dataset.close.assert_not_called()
+
+        pool.clear()
+        first.dataset.close.assert_not_called()
+
+        pool.release(first)
+        first.dataset.close.assert_called_once()
+
+    def test_expired_entry_is_reopened(self):
+        pool = DatasetPool(max_size=2, max_age=-1)
+        opener = MagicMock()
+
+        entry = pool.acquire("giops", opener)
+        pool.release(entry)
+        pool.acquire("giops", opener)
+
+        self.assertEqual(opener.call_count, 2)
+        entry.dataset.close.assert_called_once()
+
+    def test_netcdf4_handle_has_one_owner_thread(self):
+        pool = DatasetPool(max_size=2)
+
+        def opener():
+            return MagicMock(spec=netCDF4.Dataset)
+
+        entry = pool.acquire("fvcom", opener)
+        nested = pool.acquire("fvcom", opener)
+        self.assertIs(nested.dataset, entry.dataset)
+
+        other = []
+        thread = threading.Thread(
+            target=lambda: other.append(pool.acquire("fvcom", opener))
+        )
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(other[0].dataset, entry.dataset)
+        pool.release(other[0])
+        other[0].dataset.close.assert_called_once()
+
+        pool.release(nested)
+        pool.release(entry)
+        thread = threading.Thread(
+            target=lambda: other.append(pool.acquire("fvcom", opener))
+        )
+        thread.start()
+        thread.join()
+
+        self.assertIs(other[1].dataset, entry.dataset)
+        entry.dataset.close.assert_not_called()
+
+    def test_xarray_handle_is_shared_between_threads(self):
+        pool = DatasetPool(max_size=2)
+        entry = pool.acquire("giops", MagicMock)
+
+        other = []
+        thread = threading.Thread(
+            target=lambda: other.append(pool.acquire("giops", MagicMock))
+        )
+        thread.start()
+        thread.join()
+
+        self.assertIs(other[0].dataset, entry.dataset)
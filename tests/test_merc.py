@@ -139,6 +139,18 @@ class TestMercator(unittest.TestCase):
         self.assertEqual(len(data.values.ravel()), 156)
         self.assertAlmostEqual(data.values[4, 4], 298.8, places=1)
 
+    def test_get_raw_area(self):
+        nc_data = NetCDFData("tests/testdata/mercator_test.nc")
+        with Mercator(nc_data) as ds:
+            lat, lon, data = ds.get_raw_area(
+                10.0, 16.0, -152.0, -146.0, 0, 2119651200, "votemper"
+            )
+
+        self.assertEqual(data.shape, lat.shape)
+        self.assertTrue((lat >= 10).all() and (lat <= 16).all())
+        lon = ((lon + 180) % 360) - 180
+        self.assertTrue((lon >= -152).all() and (lon <= -146).all())
+
     def test_get_profile(self):
         nc_data = NetCDFData("tests/testdata/mercator_test.nc")
         with Mercator(nc_data) as ds:
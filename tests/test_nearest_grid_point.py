@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import xarray as xr
+
+import data.nearest_grid_point as ngp
+
+
+class TestNearestGridPoint(unittest.TestCase):
+    def setUp(self):
+        lat, lon = np.meshgrid(
+            np.linspace(40, 50, 21, dtype=np.float32),
+            np.linspace(-60, -40, 41, dtype=np.float32),
+            indexing="ij",
+        )
+        self.latvar = xr.DataArray(lat, dims=["y", "x"], name="nav_lat")
+        self.lonvar = xr.DataArray(lon, dims=["y", "x"], name="nav_lon")
+        ngp.clear_grid_index_cache()
+
+    def tearDown(self):
+        ngp.clear_grid_index_cache()
+
+    def test_find_nearest_grid_point(self):
+        iy, ix, _ = ngp.find_nearest_grid_point(45, -50, self.latvar, self.lonvar)
+
+        self.assertEqual((iy, ix), (10, 20))
+
+    def test_find_nearest_grid_point_cached_matches_uncached(self):
+        expected = ngp.find_nearest_grid_point(
+            [42.1, 47.3], [-55.2, -41.9], self.latvar, self.lonvar, n=4
+        )
+        actual = ngp.find_nearest_grid_point(
+            [42.1, 47.3],
+            [-55.2, -41.9],
+            self.latvar,
+            self.lonvar,
+            n=4,
+            dataset_key="giops_day",
+        )
+
+        for e, a in zip(expected, actual):
+            np.testing.assert_array_equal(e, a)
+
+    def test_get_grid_index_reuses_tree(self):
+        kdt, shape = ngp.get_grid_index(self.latvar, self.lonvar, "giops_day")
+        kdt_2, _ = ngp.get_grid_index(self.latvar, self.lonvar, "giops_day")
+
+        self.assertIs(kdt, kdt_2)
+        self.assertEqual(shape, (21, 41))
+
+    def test_get_grid_index_persists_triples(self):
+        with tempfile.TemporaryDirectory() as tmp, patch(
+            "data.nearest_grid_point.get_settings"
+        ) as settings:
+            settings.return_value.grid_index_cache_dir = tmp
+
+            ngp.get_grid_index(self.latvar, self.lonvar, "giops_day")
+            self.assertEqual(len(list(Path(tmp).glob("*.npy"))), 1)
+
+            ngp.clear_grid_index_cache()
+            with patch("data.nearest_grid_point._grid_triples") as grid_triples:
+                iy, ix, _ = ngp.find_nearest_grid_point(
+                    45, -50, self.latvar, self.lonvar, dataset_key="giops_day"
+                )
+                grid_triples.assert_not_called()
+
+        self.assertEqual((iy, ix), (10, 20))
+
+    def test_get_grid_index_ignores_triples_of_other_grid(self):
+        with tempfile.TemporaryDirectory() as tmp, patch(
+            "data.nearest_grid_point.get_settings"
+        ) as settings:
+            settings.return_value.grid_index_cache_dir = tmp
+
+            ngp.get_grid_index(self.latvar, self.lonvar, "giops_day")
+            ngp.clear_grid_index_cache()
+
+            # Regridded, with the same names and shape.
+            iy, ix, _ = ngp.find_nearest_grid_point(
+                45, -50, self.latvar + 1, self.lonvar, dataset_key="giops_day"
+            )
+
+            # The stale triples are rebuilt in place.
+            self.assertEqual(len(list(Path(tmp).glob("*.npy"))), 1)
+
+        self.assertEqual((iy, ix), (8, 20))
+
+    def test_get_grid_index_keys_triples_by_source_file(self):
+        with tempfile.TemporaryDirectory() as tmp, patch(
+            "data.nearest_grid_point.get_settings"
+        ) as settings, patch("data.nearest_grid_point.DatasetConfig") as config:
+            settings.return_value.grid_index_cache_dir = tmp
+            source = Path(tmp, "giops_day.nc")
+            source.write_bytes(b"")
+            config.return_value.url = str(source)
+
+            ngp.get_grid_index(self.latvar, self.lonvar, "giops_day")
+            ngp.clear_grid_index_cache()
+            ngp.get_grid_index(self.latvar, self.lonvar, "giops_day")
+            self.assertEqual(len(list(Path(tmp).glob("*.npy"))), 1)
+
+            ngp.clear_grid_index_cache()
+            os.utime(source, ns=(0, 0))
+            ngp.get_grid_index(self.latvar, self.lonvar, "giops_day")
+
+            self.assertEqual(len(list(Path(tmp).glob("*.npy"))), 2)
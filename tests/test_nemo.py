@@ -130,6 +130,23 @@ class TestNemo(unittest.TestCase):
         self.assertEqual(len(data.values.ravel()), 12)
         self.assertAlmostEqual(data.values[1, 1], 299.3, places=1)
 
+    def test_get_raw_area(self):
+        nc_data = NetCDFData("tests/testdata/nemo_test.nc")
+        with Nemo(nc_data) as ds:
+            lat, lon, data = ds.get_raw_area(
+                10.0, 16.0, -152.0, -146.0, 0, 2031436800, "votemper"
+            )
+            all_lat, all_lon = nc_data.latlon_variables
+
+        inside = (all_lat.values >= 10) & (all_lat.values <= 16)
+        inside &= (all_lon.values >= -152) & (all_lon.values <= -146)
+        lat, lon = lat.values, lon.values
+        self.assertEqual(data.shape, lat.shape)
+        self.assertEqual(
+            np.count_nonzero((lat >= 10) & (lat <= 16) & (lon >= -152) & (lon <= -146)),
+            np.count_nonzero(inside),
+        )
+
     def test_get_profile(self):
         nc_data = NetCDFData("tests/testdata/nemo_test.nc")
         with Nemo(nc_data) as ds:
@@ -196,6 +213,25 @@ class TestNemo(unittest.TestCase):
             self.assertEqual(r.shape[1], len(d))
             self.assertEqual(d[0], 0)
 
+    def test_get_path_profiles(self):
+        nc_data = NetCDFData("tests/testdata/nemo_test.nc")
+        path = [[13, -149], [14, -140], [15, -130]]
+        with Nemo(nc_data) as ds:
+            p, d, b, r, dep = ds.get_path_profiles(
+                path, ["votemper", "votemper"], 2031436800, numpoints=10
+            )
+            _, _, expected, _ = ds.get_path_profile(
+                path, "votemper", 2031436800, numpoints=10
+            )
+
+            self.assertEqual(len(r), 2)
+            self.assertEqual(p.shape[1], len(d))
+            self.assertEqual(len(b), len(d))
+            self.assertEqual(r[0].shape, (len(d), 50))
+            np.testing.assert_array_equal(r[0].mask, expected.mask)
+            np.testing.assert_allclose(r[0].compressed(), expected.compressed())
+            np.testing.assert_allclose(r[1].compressed(), expected.compressed())
+
     def test_get_timeseries_point(self):
         nc_data = NetCDFData("tests/testdata/nemo_test.nc")
         with Nemo(nc_data) as ds:
@@ -219,6 +255,63 @@ class TestNemo(unittest.TestCase):
             self.assertNotEqual(r[0, 0], r[1, 0])
             self.assertTrue(np.ma.is_masked(r[1, 49]))
 
+    def test_get_timeseries_profile_in_chunks(self):
+        nc_data = NetCDFData("tests/testdata/nemo_test.nc")
+        with Nemo(nc_data) as ds:
+            expected, _ = ds.get_timeseries_profile(
+                13.0, -149.0, 2031436800, 2034072000, "votemper"
+            )
+            with patch("data.nemo.STENCIL_CHUNK_SIZE", 1):
+                r, _ = ds.get_timeseries_profile(
+                    13.0, -149.0, 2031436800, 2034072000, "votemper"
+                )
+
+            np.testing.assert_array_equal(r.mask, expected.mask)
+            np.testing.assert_array_equal(r.compressed(), expected.compressed())
+
+    def test_get_timeseries_points(self):
+        nc_data = NetCDFData("tests/testdata/nemo_test.nc")
+        latitudes = [13.0, 5.0, 13.5]
+        longitudes = [-149.0, -150.0, -149.5]
+        with Nemo(nc_data) as ds:
+            r, d = ds.get_timeseries_points(
+                latitudes, longitudes, 0, 2031436800, 2034072000, "votemper"
+            )
+            self.assertEqual(r.shape, (3, 2))
+            self.assertIsNone(d)
+            for i in range(3):
+                np.testing.assert_allclose(
+                    r[i],
+                    ds.get_timeseries_point(
+                        latitudes[i],
+                        longitudes[i],
+                        0,
+                        2031436800,
+                        2034072000,
+                        "votemper",
+                    ),
+                )
+
+    def test_get_timeseries_points_profiles(self):
+        nc_data = NetCDFData("tests/testdata/nemo_test.nc")
+        with Nemo(nc_data) as ds:
+            r, d = ds.get_timeseries_points(
+                [13.0, 13.5],
+                [-149.0, -149.5],
+                "all",
+                2031436800,
+                2034072000,
+                "votemper",
+            )
+            p, _ = ds.get_timeseries_profile(
+                13.5, -149.5, 2031436800, 2034072000, "votemper"
+            )
+            self.assertEqual(r.shape, (2, 2, 50))
+            self.assertEqual(d.shape, (50,))
+            self.assertAlmostEqual(r[0, 0, 20], 296.466766, places=6)
+            np.testing.assert_array_equal(r[1].mask, p.mask)
+            np.testing.assert_allclose(r[1].compressed(), p.compressed())
+
     def test_get_profile_raises_when_surface_variable_requested(self):
         nc_data = NetCDFData("tests/testdata/salishseacast_ssh_test.nc")
         with Nemo(nc_data) as ds:
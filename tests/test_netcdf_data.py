@@ -4,6 +4,7 @@ import datetime
 import json
 import os
 import shutil
+import tempfile
 import unittest
 from unittest.mock import patch
 
@@ -430,3 +431,34 @@ class TestNetCDFData(unittest.TestCase):
             nc_data.interp = "fake_method"
             with self.assertRaises(ValueError):
                 nc_data.interpolate(None, None, None)
+
+    def test_enter_nc_file_groups_concatenates_along_time(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+
+        groups = {"votemper": [], "zos": []}
+        for i in range(3):
+            for variable in groups:
+                path = os.path.join(tmp.name, f"{variable}_{i}.nc")
+                xarray.Dataset(
+                    {variable: (["time_counter", "y"], numpy.full((2, 3), i))},
+                    coords={
+                        "time_counter": [2 * i, 2 * i + 1],
+                        # Coordinates that differ in the last digits between
+                        # files are taken from the first one.
+                        "nav_lat": (["y"], numpy.arange(3) + i * 1e-9),
+                    },
+                ).to_netcdf(path)
+                groups[variable].append(path)
+
+        nc_data = NetCDFData("tests/testdata/databases/test-nemo.sqlite3")
+        nc_data._nc_files = groups["votemper"] + groups["zos"]
+        nc_data._nc_file_groups = list(groups.values())
+        nc_data._nc_time_dim = "time_counter"
+        with nc_data:
+            dataset = nc_data.dataset
+
+            numpy.testing.assert_array_equal(dataset["time_counter"], range(6))
+            numpy.testing.assert_array_equal(dataset["nav_lat"], range(3))
+            numpy.testing.assert_array_equal(dataset["zos"][:, 0], [0, 0, 1, 1, 2, 2])
+            self.assertEqual(dataset["votemper"].shape, (6, 3))
@@ -0,0 +1,199 @@
+import datetime
+import unittest
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import Session
+
+from oceannavigator.settings import get_settings
+
+if not get_settings().sqlalchemy_database_uri:
+    # data.observational creates its engine on import.
+    pytest.skip("ONAV_SQLALCHEMY_DATABASE_URI is not set", allow_module_level=True)
+
+from data.observational import Base, Platform, Station  # noqa: E402
+from data.observational import queries as q  # noqa: E402
+from data.observational.orm.station import CELL_COLUMNS  # noqa: E402
+
+
+class StationsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.session = Session(self.engine)
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def add_stations(self, latitudes, longitudes, platform_type=Platform.Type.glider):
+        platform = Platform(type=platform_type, unique_id=str(platform_type))
+        self.session.add(platform)
+        self.session.flush()
+
+        time = datetime.datetime(2020, 1, 1)
+        self.session.add_all(
+            Station(
+                platform_id=platform.id,
+                time=time + datetime.timedelta(hours=i),
+                latitude=float(lat),
+                longitude=float(lon),
+            )
+            for i, (lat, lon) in enumerate(zip(latitudes, longitudes))
+        )
+        self.session.commit()
+
+
+class TestStationPoints(StationsTestCase):
+    def test_under_limit(self):
+        self.add_stations([44.0, 45.0], [-63.0, -62.0])
+
+        rows = q.get_station_points(self.session, limit=500)
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0][2:], (44.0, -63.0, Platform.Type.glider))
+
+    def test_thins_track(self):
+        # A glider track: a line of stations only occupies a few cells of a
+        # grid sized for its bounding box.
+        self.add_stations(np.linspace(40, 50, 5000), np.linspace(-70, -40, 5000))
+
+        rows = q.get_station_points(self.session, limit=500)
+
+        self.assertGreaterEqual(len(rows), 400)
+        self.assertLessEqual(len(rows), 500)
+        self.assertEqual(len({r[0] for r in rows}), len(rows))
+
+    def test_thins_across_antimeridian(self):
+        rng = np.random.default_rng(0)
+        self.add_stations(
+            rng.uniform(-10, 10, 4000),
+            np.concatenate(
+                (rng.uniform(178, 180, 2000), rng.uniform(-180, -178, 2000))
+            ),
+        )
+
+        rows = q.get_station_points(self.session, limit=500)
+
+        self.assertGreaterEqual(len(rows), 400)
+        self.assertLessEqual(len(rows), 500)
+        longitudes = np.array([r[3] for r in rows])
+        self.assertTrue((longitudes > 0).any() and (longitudes < 0).any())
+
+    def test_thins_same_position(self):
+        self.add_stations([44.0] * 2000, [-63.0] * 2000)
+
+        rows = q.get_station_points(self.session, limit=500)
+
+        self.assertEqual(len(rows), 500)
+
+    def test_thins_within_radius(self):
+        rng = np.random.default_rng(0)
+        self.add_stations(rng.uniform(43, 47, 3000), rng.uniform(-65, -61, 3000))
+
+        rows = q.get_station_points(
+            self.session, limit=100, latitude=45.0, longitude=-63.0, radius=100
+        )
+
+        self.assertGreater(len(rows), 50)
+        self.assertLessEqual(len(rows), 100)
+        for _, _, lat, lon, _ in rows:
+            self.assertLess(abs(lat - 45.0), 1)
+
+
+class TestThinningCellSize(unittest.TestCase):
+    def test_cells_within_limit(self):
+        thinning_cell_size = getattr(q, "__thinning_cell_size")
+
+        size = thinning_cell_size(40, 50, -70, -40, 500)
+
+        self.assertAlmostEqual((10 / size + 2) * (30 / size + 2), 500)
+        self.assertEqual(thinning_cell_size(40, 40, -70, -70, 500), 360.0)
+
+
+class TestStationFilters(StationsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_stations(
+            [0.1, 0.1, 0.1, 89.9], [179.95, -179.95, 0.0, 120.0], Platform.Type.argo
+        )
+
+    def test_antimeridian_box(self):
+        stations = q.get_stations(
+            self.session, minlat=0, maxlat=1, minlon=179, maxlon=-179
+        )
+
+        self.assertEqual(sorted(s.longitude for s in stations), [-179.95, 179.95])
+
+    def test_zero_bounds(self):
+        stations = q.get_stations(self.session, minlat=0, maxlat=1, minlon=0, maxlon=0)
+
+        self.assertEqual([s.longitude for s in stations], [0.0])
+
+    def test_radius(self):
+        stations = q.get_stations_radius(self.session, 0.1, 179.99, 20)
+
+        self.assertEqual(sorted(s.longitude for s in stations), [-179.95, 179.95])
+        self.assertEqual(
+            [
+                p.type
+                for p in q.get_platforms(
+                    self.session, latitude=0.1, longitude=179.99, radius=20
+                )
+            ],
+            [Platform.Type.argo],
+        )
+
+    def test_radius_around_pole(self):
+        stations = q.get_stations_radius(self.session, 89.99, 0, 50)
+
+        self.assertEqual([s.longitude for s in stations], [120.0])
+
+    def test_stations_without_cells(self):
+        # Imported before the cell column was added and not indexed yet.
+        self.session.execute(update(Station).values(cell=None))
+        self.session.commit()
+
+        stations = q.get_stations(
+            self.session, minlat=0, maxlat=1, minlon=179, maxlon=-179
+        )
+
+        self.assertEqual(len(stations), 2)
+        self.assertEqual(len(q.get_stations_radius(self.session, 0.1, 179.99, 20)), 2)
+
+
+class TestCellRanges(unittest.TestCase):
+    def setUp(self):
+        self.cell_ranges = getattr(q, "__cell_ranges")
+
+    def test_box(self):
+        row = 360 * CELL_COLUMNS
+        self.assertEqual(
+            self.cell_ranges(0, 0.4, 0, 0.4),
+            [
+                (row + 720, row + 721),
+                (row + CELL_COLUMNS + 720, row + CELL_COLUMNS + 721),
+            ],
+        )
+
+    def test_antimeridian(self):
+        row = 360 * CELL_COLUMNS
+        self.assertEqual(
+            self.cell_ranges(0, 0.1, 179.9, -179.9),
+            [(row, row), (row + CELL_COLUMNS - 1, row + CELL_COLUMNS - 1)],
+        )
+
+    def test_full_rows_are_merged(self):
+        self.assertEqual(
+            self.cell_ranges(0, 0.4, -180, 180),
+            [(360 * CELL_COLUMNS, 362 * CELL_COLUMNS - 1)],
+        )
+
+    def test_many_ranges_are_collapsed(self):
+        ranges = self.cell_ranges(0, 10, 0, 1)
+
+        self.assertEqual(len(ranges), 1)
+        self.assertEqual(
+            ranges[0], (360 * CELL_COLUMNS + 720, 400 * CELL_COLUMNS + 724)
+        )
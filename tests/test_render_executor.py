@@ -0,0 +1,109 @@
+import asyncio
+import os
+import threading
+import time
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.errors import ClientError
+from utils.render_executor import RenderExecutor
+
+
+def bad_query(message):
+    raise ClientError(message)
+
+
+def crash():
+    os._exit(1)
+
+
+class TestRenderExecutor(unittest.TestCase):
+    def test_run_in_thread(self):
+        executor = RenderExecutor(2, 0)
+
+        result = asyncio.run(executor.run_in_thread("quiver_tile", pow, 2, 10))
+
+        self.assertEqual(result, 1024)
+        self.assertEqual(executor.stats()["quiver_tile"]["completed"], 1)
+        executor.shutdown()
+
+    def test_run_in_process(self):
+        executor = RenderExecutor(1, 1)
+
+        result = asyncio.run(executor.run_in_process("data_tile", pow, 2, 10))
+
+        self.assertEqual(result, 1024)
+        executor.shutdown()
+
+    def test_unpicklable_work_runs_in_thread(self):
+        executor = RenderExecutor(1, 1)
+        lock = threading.Lock()
+
+        def render():
+            with lock:
+                return os.getpid()
+
+        result = asyncio.run(executor.run_in_process("map", render))
+
+        self.assertEqual(result, os.getpid())
+        self.assertIsNone(executor._processes)
+        executor.shutdown()
+
+    def test_limits_concurrency_per_kind(self):
+        executor = RenderExecutor(8, 0, limits={"hovmoller": 2})
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def render():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+
+        async def run():
+            await asyncio.gather(
+                *[executor.run_in_thread("hovmoller", render) for _ in range(6)]
+            )
+
+        asyncio.run(run())
+
+        self.assertEqual(max(peak), 2)
+        stats = executor.stats()["hovmoller"]
+        self.assertEqual(stats["completed"], 6)
+        self.assertEqual(stats["queued"], 0)
+        self.assertEqual(stats["running"], 0)
+        self.assertGreater(stats["wait_time"], 0)
+        executor.shutdown()
+
+    def test_failures_are_counted(self):
+        executor = RenderExecutor(1, 0)
+
+        with self.assertRaises(ZeroDivisionError):
+            asyncio.run(executor.run_in_thread("map", divmod, 1, 0))
+
+        self.assertEqual(executor.stats()["map"]["failed"], 1)
+        executor.shutdown()
+
+    def test_errors_from_process(self):
+        executor = RenderExecutor(1, 1)
+
+        with self.assertRaises(ClientError) as e:
+            asyncio.run(executor.run_in_process("map", bad_query, "bad query"))
+
+        self.assertEqual(e.exception.message, "bad query")
+        self.assertEqual(e.exception.status_code, 400)
+        self.assertEqual(asyncio.run(executor.run_in_process("map", pow, 2, 10)), 1024)
+        executor.shutdown()
+
+    def test_replaces_broken_process_pool(self):
+        executor = RenderExecutor(1, 1)
+
+        with self.assertRaises(BrokenProcessPool):
+            asyncio.run(executor.run_in_process("map", crash))
+
+        self.assertEqual(asyncio.run(executor.run_in_process("map", pow, 2, 10)), 1024)
+        self.assertEqual(executor.stats()["map"]["failed"], 1)
+        executor.shutdown()
@@ -0,0 +1,213 @@
+import itertools
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pyresample
+
+import data.resampling_plan as rp
+from data.netcdf_data import NetCDFData
+
+
+class TestResamplingPlan(unittest.TestCase):
+    def setUp(self):
+        lat, lon = np.meshgrid(
+            np.linspace(40, 50, 21), np.linspace(-60, -40, 41), indexing="ij"
+        )
+        self.data = np.ma.masked_greater(np.sin(lat) * np.cos(lon), 0.8)
+        lat = np.ma.array(lat, mask=self.data.mask)
+        lon = np.ma.array(lon, mask=self.data.mask)
+        self.input_def = pyresample.geometry.SwathDefinition(lons=lon, lats=lat)
+
+        lat_out, lon_out = np.meshgrid(
+            np.linspace(41, 49, 15), np.linspace(-58, -42, 17), indexing="ij"
+        )
+        self.output_def = pyresample.geometry.SwathDefinition(
+            lons=np.ma.array(lon_out), lats=np.ma.array(lat_out)
+        )
+
+        rp.clear_resampling_plan_cache()
+
+    def tearDown(self):
+        rp.clear_resampling_plan_cache()
+
+    def test_get_resampling_plan_reuses_plan(self):
+        plan = rp.get_resampling_plan(self.input_def, self.output_def, 50000.0, 8)
+        plan_2 = rp.get_resampling_plan(self.input_def, self.output_def, 50000.0, 8)
+        plan_3 = rp.get_resampling_plan(self.input_def, self.output_def, 50000.0, 4)
+
+        self.assertIs(plan, plan_2)
+        self.assertIsNot(plan, plan_3)
+
+    def test_get_resampling_plan_keyed_on_mask(self):
+        plan = rp.get_resampling_plan(self.input_def, self.output_def, 50000.0, 8)
+
+        lons = self.input_def.lons.copy()
+        lats = self.input_def.lats.copy()
+        lons.mask = lats.mask = np.ma.nomask
+        unmasked_def = pyresample.geometry.SwathDefinition(lons=lons, lats=lats)
+
+        self.assertIsNot(
+            plan, rp.get_resampling_plan(unmasked_def, self.output_def, 50000.0, 8)
+        )
+
+    def test_interpolate_matches_pyresample(self):
+        radius = 50000
+        nc_data = NetCDFData("", interp="gaussian", radius=radius)
+        expected = pyresample.kd_tree.resample_gauss(
+            self.input_def,
+            self.data,
+            self.output_def,
+            radius_of_influence=float(radius),
+            sigmas=radius / 2,
+            fill_value=None,
+        )
+        np.testing.assert_array_equal(
+            nc_data.interpolate(self.input_def, self.output_def, self.data), expected
+        )
+
+        nc_data.interp = "nearest"
+        expected = pyresample.kd_tree.resample_nearest(
+            self.input_def,
+            self.data,
+            self.output_def,
+            radius_of_influence=float(radius),
+        )
+        np.testing.assert_array_equal(
+            nc_data.interpolate(self.input_def, self.output_def, self.data), expected
+        )
+
+        def weight(r):
+            r = np.clip(r, np.finfo(r.dtype).eps, np.finfo(r.dtype).max)
+            return 1.0 / r**2
+
+        nc_data.interp = "inverse"
+        expected = pyresample.kd_tree.resample_custom(
+            self.input_def,
+            self.data,
+            self.output_def,
+            radius_of_influence=float(radius),
+            neighbours=nc_data.neighbours,
+            fill_value=None,
+            weight_funcs=weight,
+        )
+        np.testing.assert_array_equal(
+            nc_data.interpolate(self.input_def, self.output_def, self.data), expected
+        )
+
+    def test_interpolate_skips_neighbour_search_when_cached(self):
+        nc_data = NetCDFData("", interp="gaussian", radius=50000)
+        nc_data.interpolate(self.input_def, self.output_def, self.data)
+
+        with patch("pyresample.kd_tree.get_neighbour_info") as get_neighbour_info:
+            nc_data.interpolate(self.input_def, self.output_def, self.data * 2)
+            get_neighbour_info.assert_not_called()
+
+    def test_interpolate_levels_matches_per_level(self):
+        lats = self.input_def.lats.data
+        lons = self.input_def.lons.data
+
+        rng = np.random.default_rng(0)
+        levels = np.ma.masked_invalid(
+            np.stack(
+                [
+                    np.where(lats < 48 - d, np.sin(lats + d) * np.cos(lons), np.nan)
+                    for d in range(6)
+                ],
+                axis=-1,
+            )
+        )
+        levels[rng.random(levels.shape) < 0.05] = np.ma.masked
+
+        for interp, radius in itertools.product(
+            ["gaussian", "bilinear", "inverse", "nearest"], [50000, 200000]
+        ):
+            nc_data = NetCDFData("", interp=interp, radius=radius)
+
+            expected = []
+            for d in range(levels.shape[-1]):
+                level_mask = np.ma.getmaskarray(levels[:, :, d])
+                input_def = pyresample.geometry.SwathDefinition(
+                    lons=np.ma.array(lons, mask=level_mask),
+                    lats=np.ma.array(lats, mask=level_mask),
+                )
+                expected.append(
+                    nc_data.interpolate(input_def, self.output_def, levels[:, :, d])
+                )
+
+            actual = nc_data.interpolate_levels(lons, lats, self.output_def, levels)
+
+            np.testing.assert_array_equal(
+                np.ma.getmaskarray(actual), np.ma.getmaskarray(np.ma.array(expected))
+            )
+            np.testing.assert_allclose(
+                actual.filled(0), np.ma.array(expected).filled(0), rtol=1e-12
+            )
+
+    def test_interpolate_levels_single_search_for_shared_mask(self):
+        lats = self.input_def.lats.data
+        lons = self.input_def.lons.data
+        levels = np.ma.stack([self.data * d for d in range(4)], axis=-1)
+
+        nc_data = NetCDFData("", interp="gaussian", radius=50000)
+        with patch(
+            "pyresample.kd_tree.get_neighbour_info",
+            wraps=pyresample.kd_tree.get_neighbour_info,
+        ) as get_neighbour_info:
+            nc_data.interpolate_levels(lons, lats, self.output_def, levels)
+            self.assertEqual(get_neighbour_info.call_count, 1)
+
+    def test_interpolate_stencil_matches_interpolate_levels(self):
+        lats = self.input_def.lats.data
+        lons = self.input_def.lons.data
+        points = pyresample.geometry.SwathDefinition(
+            lons=np.ma.array([-50.1, -45.3, -58.7, 10.0]),
+            lats=np.ma.array([44.2, 47.9, 40.5, 10.0]),
+        )
+
+        levels = np.ma.masked_invalid(
+            np.stack(
+                [
+                    np.where(lats < 48 - d, np.sin(lats + d) * np.cos(lons), np.nan)
+                    for d in range(6)
+                ],
+                axis=-1,
+            )
+        )
+
+        for interp, radius in itertools.product(
+            ["gaussian", "bilinear", "inverse", "nearest"], [50000, 200000]
+        ):
+            nc_data = NetCDFData("", interp=interp, radius=radius)
+            expected = nc_data.interpolate_levels(lons, lats, points, levels)
+
+            stencil = rp.get_point_stencil(
+                pyresample.geometry.SwathDefinition(lons=lons, lats=lats),
+                points,
+                float(radius),
+            )
+            actual = nc_data.interpolate_stencil(
+                stencil, levels.reshape((-1, 6))[stencil.columns].T
+            )
+
+            self.assertLess(stencil.columns.size, lats.size)
+            np.testing.assert_array_equal(
+                np.ma.getmaskarray(actual), np.ma.getmaskarray(expected)
+            )
+            np.testing.assert_allclose(actual.filled(0), expected.filled(0), rtol=1e-12)
+
+    def test_point_stencil_searches_whole_radius(self):
+        lats = self.input_def.lats.data
+        lons = self.input_def.lons.data
+        grid_def = pyresample.geometry.SwathDefinition(lons=lons, lats=lats)
+        points = pyresample.geometry.SwathDefinition(
+            lons=np.ma.array([-50.1, -45.3]), lats=np.ma.array([44.2, 47.9])
+        )
+
+        stencil = rp.get_point_stencil(grid_def, points, 200000.0)
+        rp.clear_resampling_plan_cache()
+        with patch("data.resampling_plan.STENCIL_CANDIDATES", 4):
+            small_search = rp.get_point_stencil(grid_def, points, 200000.0)
+
+        self.assertGreater(stencil.index_array.shape[1], 4)
+        np.testing.assert_array_equal(small_search.columns, stencil.columns)
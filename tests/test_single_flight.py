@@ -0,0 +1,89 @@
+import asyncio
+import unittest
+
+from utils.single_flight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_computation(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def render():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return b"png"
+
+        async def run():
+            return await asyncio.gather(*[flights.do("tile", render) for _ in range(5)])
+
+        results = asyncio.run(run())
+
+        self.assertEqual(results, [b"png"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(
+            flights.stats(), {"in_flight": 0, "leaders": 1, "coalesced": 4}
+        )
+
+    def test_different_keys_are_not_coalesced(self):
+        flights = SingleFlight()
+
+        async def run():
+            return await asyncio.gather(
+                flights.do("a", lambda: asyncio.sleep(0, "a")),
+                flights.do("b", lambda: asyncio.sleep(0, "b")),
+            )
+
+        self.assertEqual(asyncio.run(run()), ["a", "b"])
+        self.assertEqual(flights.stats()["leaders"], 2)
+
+    def test_exception_is_shared(self):
+        flights = SingleFlight()
+
+        async def render():
+            await asyncio.sleep(0.01)
+            raise ValueError("bad tile")
+
+        async def run():
+            return await asyncio.gather(
+                flights.do("tile", render),
+                flights.do("tile", render),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(run())
+
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(flights.stats()["leaders"], 1)
+
+    def test_leader_cancellation_does_not_cancel_followers(self):
+        flights = SingleFlight()
+
+        async def render():
+            await asyncio.sleep(0.02)
+            return b"png"
+
+        async def run():
+            leader = asyncio.ensure_future(flights.do("tile", render))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flights.do("tile", render))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await follower
+
+        self.assertEqual(asyncio.run(run()), b"png")
+
+    def test_completed_flight_is_forgotten(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def render():
+            calls.append(1)
+            return len(calls)
+
+        async def run():
+            first = await flights.do("tile", render)
+            second = await flights.do("tile", render)
+            return first, second
+
+        self.assertEqual(asyncio.run(run()), (1, 2))
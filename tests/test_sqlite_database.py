@@ -1,5 +1,9 @@
 #!/usr/bin/env python
 
+import os
+import shutil
+import sqlite3
+import tempfile
 from unittest import TestCase
 
 from data.sqlite_database import SQLiteDatabase
@@ -130,6 +134,41 @@ class TestSqliteDatabase(TestCase):
             self.assertFalse(dims)
             self.assertFalse(units)
 
+    def test_connections_are_reused(self):
+        with SQLiteDatabase(self.historical_db) as db:
+            conn = db.conn
+
+        with SQLiteDatabase(self.historical_db) as db:
+            self.assertIs(db.conn, conn)
+
+    def test_memoized_results_are_copies(self):
+        with SQLiteDatabase(self.historical_db) as db:
+            db.get_all_variables().clear()
+            db.get_variable_dims("vo").clear()
+
+            self.assertEqual(len(db.get_all_variables()), 12)
+            self.assertEqual(len(db.get_variable_dims("vo")), 4)
+
+    def test_modified_database_is_reloaded(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            url = os.path.join(tmp, "Historical.sqlite3")
+            shutil.copy(self.historical_db, url)
+
+            with SQLiteDatabase(url) as db:
+                conn = db.conn
+                self.assertEqual(db.get_variable_units("zos"), "m")
+
+            with sqlite3.connect(url) as writer:
+                writer.execute(
+                    "UPDATE Variables SET units = 'cm' WHERE variable = 'zos'"
+                )
+            writer.close()
+            os.utime(url, ns=(0, 0))
+
+            with SQLiteDatabase(url) as db:
+                self.assertIsNot(db.conn, conn)
+                self.assertEqual(db.get_variable_units("zos"), "cm")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+import numpy as np
+from shapely.geometry import Point
+
+from plotting.stats import area_mask, area_statistics, fill_polygons
+
+
+class TestAreaMask(unittest.TestCase):
+    def setUp(self):
+        (self.poly,), _ = fill_polygons(
+            [
+                {
+                    "name": "area",
+                    "polygons": [[[40, -60], [50, -60], [50, -40], [40, -40]]],
+                    "innerrings": [],
+                }
+            ]
+        )
+        self.lat, self.lon = np.meshgrid(
+            np.linspace(35, 55, 41), np.linspace(-65, -35, 31), indexing="ij"
+        )
+
+    def test_matches_contains(self):
+        mask = area_mask(self.poly, self.lat, self.lon)
+
+        expected = [
+            self.poly.contains(Point(p))
+            for p in zip(self.lat.ravel(), self.lon.ravel())
+        ]
+        self.assertEqual(mask.shape, self.lat.shape)
+        np.testing.assert_array_equal(mask.ravel(), expected)
+        self.assertTrue(mask[20, 15])
+
+    def test_cached_per_grid(self):
+        mask = area_mask(self.poly, self.lat, self.lon)
+
+        self.assertIs(area_mask(self.poly, self.lat.copy(), self.lon.copy()), mask)
+        self.assertIsNot(area_mask(self.poly, self.lat, self.lon + 0.5), mask)
+        with self.assertRaises(ValueError):
+            mask[0, 0] = True
+
+    def test_wraps_longitudes(self):
+        np.testing.assert_array_equal(
+            area_mask(self.poly, self.lat, self.lon + 360),
+            area_mask(self.poly, self.lat, self.lon),
+        )
+
+
+class TestAreaStatistics(unittest.TestCase):
+    def test_statistics_per_level(self):
+        values = np.ma.masked_invalid(
+            [
+                [[1.0, 2.0, 3.0], [4.0, np.nan, 100.0]],
+                [[np.nan, np.nan, np.nan], [np.nan, np.nan, 100.0]],
+            ]
+        )
+        mask = np.array([[True, True, True], [True, True, False]])
+
+        surface, deep = area_statistics(values, mask)
+
+        self.assertEqual(surface["num"], 4)
+        self.assertEqual(surface["min"], 1.0)
+        self.assertEqual(surface["max"], 4.0)
+        self.assertEqual(surface["mean"], 2.5)
+        self.assertEqual(surface["median"], 2.5)
+        self.assertAlmostEqual(surface["stddev"], np.std([1, 2, 3, 4]))
+        self.assertIsNone(deep)
+
+    def test_empty_mask(self):
+        values = np.ma.ones((2, 2, 2))
+
+        self.assertEqual(area_statistics(values, np.zeros((2, 2), bool)), [None] * 2)
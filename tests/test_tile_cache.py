@@ -0,0 +1,110 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from utils.tile_cache import TileCache
+
+
+class TestTileCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.generations = {"giops_day": "1"}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_cache(self, max_size=1024, max_age=0, scan_interval=60):
+        return TileCache(
+            self.tmp.name,
+            max_size,
+            max_age,
+            generation_of=self.generations.get,
+            scan_interval=scan_interval,
+        )
+
+    def test_put_and_get(self):
+        cache = self.make_cache()
+        key = TileCache.key("data", "giops_day", "votemper", 0, 0, 4, 1, 2)
+
+        self.assertIsNone(cache.get(key, ".png", "giops_day"))
+
+        cache.put(key, b"tile", ".png", "giops_day")
+
+        self.assertEqual(cache.get(key, ".png", "giops_day"), b"tile")
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(cache.stats()["bytes"], 4)
+
+    def test_evicts_least_recently_used(self):
+        cache = self.make_cache(max_size=10)
+
+        cache.put("a" * 40, b"1234", ".png")
+        cache.put("b" * 40, b"1234", ".png")
+        cache.get("a" * 40, ".png")
+        cache.put("c" * 40, b"1234", ".png")
+
+        self.assertIsNotNone(cache.get("a" * 40, ".png"))
+        self.assertIsNone(cache.get("b" * 40, ".png"))
+        self.assertIsNotNone(cache.get("c" * 40, ".png"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.stats()["bytes"], 8)
+
+    def test_expires_superseded_generation(self):
+        cache = self.make_cache()
+        cache.put("a" * 40, b"old", ".png", "giops_day")
+        cache.put("b" * 40, b"topo", ".png")
+
+        self.generations["giops_day"] = "2"
+
+        self.assertIsNone(cache.get("a" * 40, ".png", "giops_day"))
+        self.assertIsNotNone(cache.get("b" * 40, ".png"))
+        self.assertFalse(Path(self.tmp.name, "giops_day", "1").exists())
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_expires_old_entries(self):
+        cache = self.make_cache(max_age=60)
+        cache.put("a" * 40, b"tile", ".png")
+
+        with patch("utils.tile_cache.time.time", return_value=1e12):
+            self.assertIsNone(cache.get("a" * 40, ".png"))
+
+    def test_rebuilds_index_from_disk(self):
+        cache = self.make_cache()
+        cache.put("a" * 40, b"tile", ".png", "giops_day")
+
+        cache = self.make_cache()
+
+        self.assertEqual(cache.stats()["bytes"], 4)
+        self.assertIsNotNone(cache.get("a" * 40, ".png", "giops_day"))
+
+    def test_adopts_files_from_other_processes(self):
+        cache = self.make_cache()
+        other = self.make_cache()
+        other.put("a" * 40, b"tile", ".png", "giops_day")
+
+        self.assertIsNotNone(cache.get("a" * 40, ".png", "giops_day"))
+
+    def test_file_removed_by_other_process_is_a_miss(self):
+        cache = self.make_cache()
+        path = Path(cache.put("a" * 40, b"tile", ".png", "giops_day"))
+
+        path.unlink()
+
+        self.assertIsNone(cache.get("a" * 40, ".png", "giops_day"))
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(cache.stats()["bytes"], 0)
+
+    def test_bounds_directory_shared_by_processes(self):
+        cache = self.make_cache(max_size=10, scan_interval=0)
+        other = self.make_cache(max_size=10, scan_interval=0)
+
+        cache.put("a" * 40, b"1234", ".png")
+        cache.put("b" * 40, b"1234", ".png")
+        other.put("c" * 40, b"1234", ".png")
+        other.put("d" * 40, b"1234", ".png")
+
+        files = [f for f in Path(self.tmp.name).rglob("*") if f.is_file()]
+        self.assertLessEqual(sum(f.stat().st_size for f in files), 10)
+        self.assertIsNotNone(other.get("d" * 40, ".png"))
+        self.assertIsNone(cache.get("a" * 40, ".png"))
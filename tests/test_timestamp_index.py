@@ -0,0 +1,74 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+
+from data.timestamp_index import TimestampIndex, get_timestamp_index
+
+
+class TestTimestampIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = TimestampIndex(
+            [2145052800, 2144966400, 2145225600, 2145139200],
+            "seconds since 1950-01-01 00:00:00",
+        )
+
+    def test_values_are_sorted_and_read_only(self):
+        np.testing.assert_array_equal(
+            self.index.values, [2144966400, 2145052800, 2145139200, 2145225600]
+        )
+        with self.assertRaises(ValueError):
+            self.index.values[0] = 0
+
+    def test_to_datetime_is_cached(self):
+        datetimes = self.index.to_datetime()
+
+        self.assertEqual(datetimes[0].isoformat(), "2017-12-21T00:00:00+00:00")
+        self.assertIs(self.index.to_datetime(), datetimes)
+        with self.assertRaises(ValueError):
+            datetimes[0] = None
+
+    def test_index_of(self):
+        self.assertEqual(self.index.index_of(2145139200).tolist(), [2])
+        self.assertEqual(
+            self.index.index_of([2145225600, 2144966400, 1]).tolist(), [0, 3]
+        )
+
+    def test_find_le(self):
+        self.assertEqual(self.index.find_le(2145139201), 2145139200)
+        self.assertEqual(self.index.find_le(2145139200), 2145139200)
+        self.assertEqual(self.index.find_le(0), 2144966400)
+
+    def test_between(self):
+        self.assertEqual(
+            self.index.between(2145000000, 2145139200).tolist(),
+            [2145052800, 2145139200],
+        )
+
+
+class TestGetTimestampIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.url = os.path.join(self.tmp.name, "Historical.sqlite3")
+        shutil.copy("tests/testdata/databases/Historical.sqlite3", self.url)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_shared_until_modified(self):
+        index = get_timestamp_index(self.url, "vo")
+
+        self.assertEqual(len(index), 7)
+        self.assertIs(get_timestamp_index(self.url, "vo"), index)
+
+        with sqlite3.connect(self.url) as conn:
+            conn.execute("DELETE FROM Timestamps WHERE timestamp = 2144966400")
+        os.utime(self.url, ns=(0, 0))
+
+        modified = get_timestamp_index(self.url, "vo")
+
+        self.assertIsNot(modified, index)
+        self.assertEqual(len(modified), 6)
@@ -7,7 +7,7 @@ from fastapi import HTTPException
 
 class ErrorBase(Exception):
     def __init__(self, message: str, status_code: int = None, link: str = ""):
-        super(ErrorBase, self).__init__()
+        super(ErrorBase, self).__init__(message)
 
         self.status_code: int = status_code if status_code is not None else 500
         self.message: str = message
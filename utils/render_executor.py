@@ -0,0 +1,172 @@
+import asyncio
+import multiprocessing
+import pickle
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache, partial
+from typing import Callable, Dict
+
+from oceannavigator.settings import get_settings
+
+
+class _KindStats:
+    def __init__(self) -> None:
+        self.queued: int = 0
+        self.running: int = 0
+        self.completed: int = 0
+        self.failed: int = 0
+        self.wait_time: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_time": round(self.wait_time, 3),
+        }
+
+
+class RenderExecutor:
+    """Runs blocking rendering work off the asyncio event loop.
+
+    NetCDF reads and the other mostly I/O-bound work go to a thread pool, while
+    pyresample and matplotlib work goes to a process pool (matplotlib isn't
+    thread-safe and both hold the GIL for most of their run time). With
+    `process_workers` set to 0 everything runs on the thread pool.
+
+    Every kind of work (e.g. "data_tile", "map", "hovmoller") has its own
+    concurrency limit, defaulting to the size of the pool it runs on. Requests
+    over the limit wait in a queue; `stats` reports the queue depth, the number
+    of running tasks and the cumulative time spent waiting for each kind.
+    """
+
+    def __init__(
+        self,
+        thread_workers: int,
+        process_workers: int,
+        limits: Dict[str, int] = None,
+        mp_context: str = "spawn",
+    ) -> None:
+        self.thread_workers: int = thread_workers
+        self.process_workers: int = process_workers
+        self.limits: Dict[str, int] = limits or {}
+        self._mp_context: str = mp_context
+
+        self._threads: ThreadPoolExecutor = ThreadPoolExecutor(
+            thread_workers, thread_name_prefix="render"
+        )
+        self._processes: ProcessPoolExecutor = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, _KindStats] = {}
+        self._lock = threading.Lock()
+
+    async def run_in_thread(self, kind: str, fn: Callable, *args, **kwargs):
+        """Runs fn(*args, **kwargs) on the thread pool."""
+        return await self._run(
+            kind, self._threads, self.thread_workers, fn, args, kwargs
+        )
+
+    async def run_in_process(self, kind: str, fn: Callable, *args, **kwargs):
+        """Runs fn(*args, **kwargs) on the process pool. Work that can't be
+        pickled (e.g. a plotter holding an open dataset or database session) runs
+        on the thread pool instead. The return value must be picklable.
+        """
+        if self.process_workers <= 0 or not _picklable(fn, args, kwargs):
+            return await self.run_in_thread(kind, fn, *args, **kwargs)
+
+        return await self._run(
+            kind, self._process_pool(), self.process_workers, fn, args, kwargs
+        )
+
+    def stats(self) -> Dict[str, dict]:
+        return {kind: s.as_dict() for kind, s in self._stats.items()}
+
+    def shutdown(self) -> None:
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(
+        self,
+        kind: str,
+        executor: Executor,
+        workers: int,
+        fn: Callable,
+        args: tuple,
+        kwargs: dict,
+    ):
+        semaphore = self._semaphores.get(kind)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.limits.get(kind, workers))
+            self._semaphores[kind] = semaphore
+        stats = self._stats.setdefault(kind, _KindStats())
+
+        queued_at = time.monotonic()
+        stats.queued += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            stats.queued -= 1
+        stats.wait_time += time.monotonic() - queued_at
+
+        stats.running += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                executor, partial(fn, *args, **kwargs)
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. it was killed for running out of memory), which
+            # leaves the pool unusable; later work goes to a new one.
+            stats.failed += 1
+            self._discard_process_pool(executor)
+            raise
+        except BaseException:
+            stats.failed += 1
+            raise
+        finally:
+            stats.running -= 1
+            semaphore.release()
+
+        stats.completed += 1
+        return result
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        # Started on first use so that processes that never render (and the test
+        # suite) don't pay for it.
+        with self._lock:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(
+                    self.process_workers,
+                    mp_context=multiprocessing.get_context(self._mp_context or None),
+                )
+            return self._processes
+
+    def _discard_process_pool(self, executor: Executor) -> None:
+        with self._lock:
+            if self._processes is not executor:
+                return
+            self._processes = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _picklable(*objs) -> bool:
+    try:
+        pickle.dumps(objs)
+    except Exception:
+        return False
+    return True
+
+
+@lru_cache()
+def get_render_executor() -> RenderExecutor:
+    settings = get_settings()
+
+    return RenderExecutor(
+        settings.render_thread_workers,
+        settings.render_process_workers,
+        settings.render_limits,
+        settings.render_process_context,
+    )
@@ -0,0 +1,50 @@
+import asyncio
+from functools import partial
+from typing import Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Coalesces concurrent identical computations.
+
+    The first caller for a key starts the computation; callers arriving with the
+    same key while it is still running await the same result (or exception)
+    instead of starting their own. The computation runs as its own task, so
+    it is neither cancelled nor restarted when the caller that started it goes
+    away (e.g. the browser drops the request) while others are still waiting.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+
+        self.leaders: int = 0
+        self.coalesced: int = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        """Returns the result of `await fn()`, sharing it with every concurrent
+        call made with the same key.
+        """
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(partial(self._done, key))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+
+        # Mark the exception as retrieved in case every waiter went away.
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,306 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Optional
+
+from oceannavigator.dataset_config import DatasetConfig
+from oceannavigator.settings import get_settings
+
+# Directory used for entries that don't belong to a dataset (topography,
+# bathymetry, mbtiles).
+_SHARED = "_shared"
+
+
+class _CacheEntry:
+    def __init__(self, path: Path, size: int, dataset: str, generation: str) -> None:
+        self.path: Path = path
+        self.size: int = size
+        self.dataset: str = dataset
+        self.generation: str = generation
+        self.created: float = time.time()
+
+
+class TileCache:
+    """Bounded, content-addressed on-disk cache for rendered tiles.
+
+    Entries are addressed by a digest of the parameters that produced them and
+    stored under `root/<dataset>/<generation>/<digest[:2]>/<digest><suffix>`. The
+    generation identifies the state of the dataset the tile was rendered from
+    (by default the modification time of its index database), so tiles rendered
+    before new forecast files were indexed are never served and are removed
+    together, one directory per superseded generation.
+
+    The cache is bounded by `max_size` bytes, evicting least-recently-used
+    entries first, and entries older than `max_age` seconds are dropped (0 means
+    no age limit). The index lives in memory and is rebuilt from disk on start;
+    files written by other processes sharing the same root are adopted the
+    first time they are looked up. Every `scan_interval` seconds a write also
+    rescans the whole root, so that `max_size` bounds the directory shared by
+    all the processes rather than the files each of them knows about.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_size: int,
+        max_age: float = 0,
+        generation_of: Callable[[str], str] = None,
+        scan_interval: float = 60,
+    ) -> None:
+        self.root: Path = Path(root)
+        self.max_size: int = max_size
+        self.max_age: float = max_age
+        self.scan_interval: float = scan_interval
+        self._last_scan: float = 0.0
+        self._generation_of = generation_of or dataset_generation
+        self._entries: OrderedDict = OrderedDict()
+        self._generations: Dict[str, str] = {}
+        self._lock = threading.RLock()
+
+        self.size: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+
+        self._scan()
+
+    @staticmethod
+    def key(*parts: Hashable) -> str:
+        """Returns the content address of the tile produced by `parts`."""
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def get(self, key: str, suffix: str, dataset: str = None) -> Optional[bytes]:
+        """Returns the content of the cached tile, or None on a miss.
+
+        The content is read here rather than handing out the path, which
+        another process could evict before the file is sent.
+        """
+        dataset = dataset or _SHARED
+        generation = self._current_generation(dataset)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._adopt(self._path(key, suffix, dataset, generation))
+
+            if entry is not None and (
+                entry.generation != generation or self._expired(entry)
+            ):
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+        try:
+            content = entry.path.read_bytes()
+        except OSError:
+            # Evicted by another process since it was indexed.
+            content = None
+
+        with self._lock:
+            if content is None:
+                if self._entries.get(key) is entry:
+                    self._remove(key)
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            return content
+
+    def put(self, key: str, content: bytes, suffix: str, dataset: str = None) -> str:
+        """Stores a rendered tile and returns its path."""
+        dataset = dataset or _SHARED
+        generation = self._current_generation(dataset)
+        path = self._path(key, suffix, dataset, generation)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}")
+        tmp.write_bytes(content)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = _CacheEntry(path, len(content), dataset, generation)
+            self.size += len(content)
+            self._evict()
+
+        if time.monotonic() - self._last_scan >= self.scan_interval:
+            self._scan()
+
+        return path.as_posix()
+
+    def expire_dataset(self, dataset: str) -> None:
+        """Drops every cached tile of a dataset."""
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.dataset == dataset:
+                    self._remove(key)
+                    self.expirations += 1
+            self._generations.pop(dataset, None)
+
+        shutil.rmtree(self.root.joinpath(dataset), ignore_errors=True)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _path(self, key: str, suffix: str, dataset: str, generation: str) -> Path:
+        return self.root.joinpath(dataset, generation, key[:2], key + suffix)
+
+    def _current_generation(self, dataset: str) -> str:
+        generation = "0" if dataset == _SHARED else self._generation_of(dataset)
+
+        with self._lock:
+            previous = self._generations.get(dataset)
+            self._generations[dataset] = generation
+            if previous == generation:
+                return generation
+
+            # First lookup or the dataset changed, everything rendered from
+            # another generation is stale.
+            for key, entry in list(self._entries.items()):
+                if entry.dataset == dataset and entry.generation != generation:
+                    self._remove(key)
+                    self.expirations += 1
+
+        for d in self.root.joinpath(dataset).glob("*"):
+            if d.name != generation:
+                shutil.rmtree(d, ignore_errors=True)
+
+        return generation
+
+    def _adopt(self, path: Path) -> Optional[_CacheEntry]:
+        """Indexes a file written by another process, if there is one."""
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+
+        dataset, generation = path.relative_to(self.root).parts[:2]
+        entry = _CacheEntry(path, stat.st_size, dataset, generation)
+        entry.created = stat.st_mtime
+
+        key = path.name.split(".")[0]
+        self._entries[key] = entry
+        self.size += entry.size
+        self._evict()
+
+        return entry if key in self._entries else None
+
+    def _scan(self) -> None:
+        """Indexes the files written by every process sharing the root and
+        forgets the ones they removed, then evicts down to max_size.
+        """
+        self._last_scan = time.monotonic()
+        started = time.time()
+        if not self.root.is_dir():
+            return
+
+        files = {}
+        for path in self.root.glob("*/*/*/*"):
+            if path.name.count(".") > 1:
+                # Leftover of an interrupted write
+                continue
+            try:
+                files[path] = path.stat()
+            except OSError:
+                continue
+
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.path not in files and entry.created < started:
+                    self._entries.pop(key)
+                    self.size -= entry.size
+
+            known = {entry.path for entry in self._entries.values()}
+            # Unknown files go to the least recently used end, oldest access
+            # first.
+            for path, stat in sorted(
+                files.items(), key=lambda f: f[1].st_atime, reverse=True
+            ):
+                key = path.name.split(".")[0]
+                if path in known or key in self._entries:
+                    continue
+                dataset, generation = path.relative_to(self.root).parts[:2]
+                entry = _CacheEntry(path, stat.st_size, dataset, generation)
+                entry.created = stat.st_mtime
+
+                self._entries[key] = entry
+                self._entries.move_to_end(key, last=False)
+                self.size += entry.size
+
+            self._evict()
+
+    def _expired(self, entry: _CacheEntry) -> bool:
+        return self.max_age > 0 and time.time() - entry.created > self.max_age
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+
+        self.size -= entry.size
+        try:
+            entry.path.unlink()
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        # OrderedDict iterates from least to most recently used.
+        for key, entry in list(self._entries.items()):
+            if self.size <= self.max_size and not self._expired(entry):
+                break
+            self._remove(key)
+            self.evictions += 1
+
+
+def dataset_generation(dataset: str) -> str:
+    """Returns a token that changes whenever new files are indexed for a dataset.
+
+    For datasets backed by an index database this is the database's modification
+    time. Other datasets (OpenDAP, plain NetCDF files) use the same for their
+    url when it is a local file, and never expire otherwise.
+    """
+    try:
+        url = DatasetConfig(dataset).url
+    except KeyError:
+        return "0"
+
+    if isinstance(url, list):
+        url = url[0]
+
+    try:
+        return str(os.stat(url).st_mtime_ns)
+    except (OSError, TypeError):
+        return "0"
+
+
+@lru_cache()
+def get_tile_cache() -> TileCache:
+    settings = get_settings()
+
+    return TileCache(
+        settings.tile_cache_dir or os.path.join(settings.cache_dir, "tiles"),
+        settings.tile_cache_max_size_mb * 1024 * 1024,
+        settings.tile_cache_max_age,
+        scan_interval=settings.tile_cache_scan_interval,
+    )